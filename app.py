@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, jsonify, flash, redirect, url_for, session
+from flask import Flask, render_template, request, jsonify, flash, redirect, url_for, session, Response, stream_with_context
 from werkzeug.exceptions import BadRequest, InternalServerError
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.prompts import PromptTemplate
@@ -6,18 +6,31 @@ from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import os
 import json
-import requests
 import logging
 import re
 import base64
 from io import BytesIO
-from PIL import Image
-import PyPDF2
-import docx
 import sqlite3
+import db
 from datetime import datetime
 import numpy as np
 from dateutil.relativedelta import relativedelta
+from llm_gateway import LLMGateway, make_cache, parses_as
+import metrics
+import geo_cache
+import branch_index
+import bill_analytics
+import bill_cache
+import pdf_text
+import upload_store
+import bill_amount
+import bill_import
+import documents
+import jobs
+import weather_cache
+import scheme_catalogue
+import structured_output
+import eligibility
 
 load_dotenv()
 
@@ -27,30 +40,7 @@ app.secret_key = os.getenv('SECRET_KEY', 'your-secret-key')
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-def init_db():
-    conn = sqlite3.connect('users.db')
-    c = conn.cursor()
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL
-        )
-    ''')
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS bills (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            bill_type TEXT NOT NULL,
-            amount REAL NOT NULL,
-            bill_date TEXT NOT NULL,
-            file_path TEXT
-        )
-    ''')
-    conn.commit()
-    conn.close()
-
-init_db()
+db.init_db()
 
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
@@ -66,6 +56,70 @@ llm = ChatGoogleGenerativeAI(
     max_output_tokens=1500
 )
 
+# All Gemini calls go through the gateway so repeated prompts are served from cache
+gateway = LLMGateway(
+    llm,
+    cache=make_cache(
+        os.getenv('LLM_CACHE_BACKEND', 'memory'),
+        path=os.getenv('LLM_CACHE_PATH', 'llm_cache.db'),
+        max_entries=int(os.getenv('LLM_CACHE_MAX_ENTRIES', 1024))
+    ),
+    ttl=int(os.getenv('LLM_CACHE_TTL', 6 * 3600))
+)
+
+DOCUMENT_LANGUAGES = {'en': 'English', 'hi': 'Hindi', 'kn': 'Kannada'}
+# Generate the other languages of a languages=requested analysis in the background
+DOCUMENT_PREFETCH_LANGUAGES = os.getenv('DOCUMENT_PREFETCH_LANGUAGES', '1') == '1'
+
+def wants_stream():
+    """Clients opt into token streaming with ?stream=1 or Accept: text/event-stream."""
+    return request.args.get('stream') == '1' or 'text/event-stream' in request.headers.get('Accept', '')
+
+def wants_async():
+    """Clients opt into a background job with ?async=1 or Prefer: respond-async."""
+    return request.args.get('async') == '1' or 'respond-async' in request.headers.get('Prefer', '')
+
+def job_accepted(job_id):
+    return jsonify({"job_id": job_id, "status_url": url_for('job_status', job_id=job_id)}), 202
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def sse_message(event, data):
+    """SSE text for a stream_flow() / partial_events() event."""
+    if event == 'token':
+        return sse_event('token', {"text": data})
+    if event == 'partial':
+        return sse_event('partial', data)
+    return sse_event('done', data[0])
+
+def sse_response(flow, schema=None):
+    """Stream a flow as server-sent events: one 'token' event per model chunk, then a
+    'done' event carrying the same payload the JSON endpoint would have returned.
+
+    With a structured_output schema the tokens are replaced by 'partial' events holding
+    the validated JSON result so far.
+    """
+    events = gateway.stream_flow(flow)
+    if schema is not None:
+        events = structured_output.partial_events(events, schema)
+    event, first = next(events)
+    if event == 'done':
+        # Flows that finish before the first token (bad input, model errors) answer as plain JSON
+        payload, status = first
+        return jsonify(payload), status
+
+    def generate():
+        yield sse_message(event, first)
+        for later_event, data in events:
+            yield sse_message(later_event, data)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 language_instructions = {
     "en-US": {
         "general": "You are a friendly financial advisor for Indian villagers with no prior financial knowledge. Provide simple, detailed, and patient responses in English related to financial planning, loans, investments, and banking, using examples relevant to rural life (e.g., farming loans, savings for crops). Explain basic concepts step-by-step, assuming the user knows nothing about finance. Do not answer queries unrelated to finance or loans; politely redirect to financial topics with encouragement to learn.",
@@ -119,48 +173,21 @@ def document_analyzer():
     lang = request.args.get('lang', 'en')
     return render_template('document_analyzer.html', lang=lang)
 
-@app.route('/check_eligibility', methods=['POST'])
-def check_eligibility():
+def check_eligibility_flow(data):
     try:
-        data = request.get_json()
         if not data:
-            return jsonify({"error": "No data provided"}), 400
-
-        required_fields = [
-            'age', 'monthlyIncome', 'existingLoans', 'existingLoanAmount',
-            'defaultHistory', 'loanAmount', 'loanPurpose', 'loanTenure'
-        ]
-        for field in required_fields:
-            if field not in data:
-                return jsonify({"error": f"Missing field: {field}"}), 400
+            return {"error": "No data provided"}, 400
 
         try:
-            age = int(data['age'])
-            monthly_income = int(data['monthlyIncome'])
-            existing_loan_amount = int(data['existingLoanAmount'])
-            loan_amount = int(data['loanAmount'])
-            loan_tenure = int(data['loanTenure'])
-        except (ValueError, TypeError):
-            return jsonify({"error": "Invalid numeric input"}), 400
-
-        if not (18 <= age <= 65):
-            logger.info(f"Rejected: Age {age} not between 18 and 65")
-            return jsonify({"status": "rejected", "reason": "Age must be between 18 and 65."}), 200
-        if monthly_income < 3000:
-            logger.info(f"Rejected: Monthly income {monthly_income} below ₹3,000")
-            return jsonify({"status": "rejected", "reason": "Monthly income must be at least ₹3,000."}), 200
-        if not (500 <= loan_amount <= 150000):
-            logger.info(f"Rejected: Loan amount {loan_amount} not between ₹500 and ₹150,000")
-            return jsonify({"status": "rejected", "reason": "Loan amount must be between ₹500 and ₹150,000."}), 200
-        if loan_amount <= 10000:
-            logger.info(f"Approved: Loan amount {loan_amount} ≤ ₹10,000")
-            return jsonify({"status": "approved", "reason": "Loan amount is ₹10,000 or less, automatically approved."}), 200
-        if existing_loan_amount > 3 * monthly_income:
-            logger.info(f"Pending: Existing loan amount {existing_loan_amount} exceeds 3x monthly income {monthly_income}")
-            return jsonify({"status": "pending", "reason": "Existing loan amount exceeds 3x monthly income. Additional review required."}), 200
-        if data['defaultHistory'] == 'yes':
-            logger.info(f"Rejected: Default history detected")
-            return jsonify({"status": "rejected", "reason": "History of loan default detected."}), 200
+            application = eligibility.parse_application(data)
+        except ValueError as e:
+            return {"error": str(e)}, 400
+
+        result = eligibility.evaluate([application])[0]
+        logger.info(f"Eligibility {result['status']} by {result['decided_by']}: {result['reason']}")
+        if not result.pop('review') or not eligibility.ELIGIBILITY_LLM_REVIEW:
+            return result, 200
+        metrics.incr('eligibility_llm_reviews')
 
         prompt_template = PromptTemplate(
             input_variables=["age", "monthlyIncome", "existingLoans", "existingLoanAmount", 
@@ -198,38 +225,75 @@ def check_eligibility():
         )
 
         prompt = prompt_template.format(
-            age=age,
-            monthlyIncome=monthly_income,
+            age=application['age'],
+            monthlyIncome=application['monthly_income'],
             existingLoans=data['existingLoans'],
-            existingLoanAmount=existing_loan_amount,
+            existingLoanAmount=application['existing_loan_amount'],
             defaultHistory=data['defaultHistory'],
-            loanAmount=loan_amount,
+            loanAmount=application['loan_amount'],
             loanPurpose=data['loanPurpose'],
-            loanTenure=loan_tenure
+            loanTenure=application['loan_tenure']
+        )
+        prompt += (
+            f"\nRepayment estimate at {eligibility.ELIGIBILITY_ANNUAL_RATE:.0%} a year: EMI ₹{result['emi']:,.0f}, "
+            f"debt-to-income {result['dti']:.0%} including existing loans. The scorecard found this applicant "
+            f"borderline (score {result['score']}), so weigh the loan purpose and repayment capacity.\n"
         )
 
         try:
             logger.debug(f"Sending eligibility prompt to Gemini: {prompt[:200]}...")
-            response = llm.invoke(prompt)
+            response = yield prompt, parses_as(structured_output.ELIGIBILITY)
             logger.debug(f"Gemini response: {response.content}")
 
             try:
-                result = json.loads(response.content)
-                logger.info(f"Gemini result: {result}")
-            except json.JSONDecodeError:
+                review = structured_output.parse(response.content, structured_output.ELIGIBILITY)
+                logger.info(f"Gemini result: {review}")
+                result.update(status=review['status'], reason=review['reason'], decided_by='llm')
+            except ValueError:
                 logger.warning("Invalid JSON response from Gemini")
-                result = {
-                    "status": "pending",
-                    "reason": "Unable to process eligibility. Please contact support."
-                }
+                result.update(status="pending", reason="Unable to process eligibility. Please contact support.")
         except Exception as e:
             logger.error(f"Gemini query error: {str(e)}")
-            result = {
-                "status": "pending",
-                "reason": "Unable to process eligibility due to server error. Please try again."
-            }
+            result.update(status="pending",
+                          reason="Unable to process eligibility due to server error. Please try again.")
 
-        return jsonify(result), 200
+        return result, 200
+
+    except Exception as e:
+        logger.error(f"Server error: {str(e)}")
+        return {"error": f"Server error: {str(e)}"}, 500
+
+@app.route('/check_eligibility', methods=['POST'])
+def check_eligibility():
+    if wants_stream():
+        return sse_response(check_eligibility_flow(request.get_json(silent=True)), structured_output.ELIGIBILITY)
+    payload, status = gateway.run(check_eligibility_flow(request.get_json(silent=True)))
+    return jsonify(payload), status
+
+@app.route('/check_eligibility_batch', methods=['POST'])
+def check_eligibility_batch():
+    try:
+        data = request.get_json(silent=True) or {}
+        applications = data.get('applications')
+        if not isinstance(applications, list) or not applications:
+            return jsonify({"error": "No applications provided"}), 400
+        if len(applications) > eligibility.ELIGIBILITY_BATCH_MAX:
+            return jsonify({"error": f"At most {eligibility.ELIGIBILITY_BATCH_MAX} applications per batch"}), 400
+
+        started = datetime.now()
+        results, parsed, rows = [None] * len(applications), [], []
+        for i, application in enumerate(applications):
+            try:
+                parsed.append(eligibility.parse_application(application if isinstance(application, dict) else {}))
+                rows.append(i)
+            except ValueError as e:
+                results[i] = {"index": i, "error": str(e)}
+        for i, result in zip(rows, eligibility.evaluate(parsed)):
+            results[i] = dict(result, index=i)
+
+        metrics.incr('eligibility_batch_applications', len(applications))
+        total_ms = round((datetime.now() - started).total_seconds() * 1000, 1)
+        return jsonify({"results": results, "total_ms": total_ms}), 200
 
     except Exception as e:
         logger.error(f"Server error: {str(e)}")
@@ -247,30 +311,36 @@ def find_banks():
             if field not in data or not data[field]:
                 return jsonify({"error": f"Missing or empty field: {field}"}), 400
 
-        address = f"{data['location']}, {data['district']}, {data['state']}, India"
-
-        geocode_url = f"https://maps.googleapis.com/maps/api/geocode/json?address={address}&key={GOOGLE_API_KEY}"
-        geocode_response = requests.get(geocode_url)
-        geocode_data = geocode_response.json()
+        # Serve from the offline branch directory when it covers the district
+        index = branch_index.get_index()
+        if index is not None:
+            branches, center = index.in_district(data['location'], data['district'], data['state'], k=5)
+            if branches:
+                return jsonify({
+                    "banks": [branch_index.to_bank(b) for b in branches],
+                    "center": center
+                }), 200
 
-        if geocode_data['status'] != 'OK' or not geocode_data['results']:
+        location = geo_cache.geocode(data['location'], data['district'], data['state'], GOOGLE_API_KEY)
+        if not location:
             return jsonify({
                 "error": "Unable to geocode address",
                 "banks": [],
                 "center": {"lat": 12.9716, "lng": 77.5946}
             }), 400
 
-        location = geocode_data['results'][0]['geometry']['location']
         lat, lng = location['lat'], location['lng']
 
-        places_url = (
-            f"https://maps.googleapis.com/maps/api/place/nearbysearch/json?"
-            f"location={lat},{lng}&radius=10000&type=bank&key={GOOGLE_API_KEY}"
-        )
-        places_response = requests.get(places_url)
-        places_data = places_response.json()
+        if index is not None:
+            branches = index.nearest(lat, lng, k=5, radius_km=10)
+            if branches:
+                return jsonify({
+                    "banks": [branch_index.to_bank(b) for b in branches],
+                    "center": {"lat": lat, "lng": lng}
+                }), 200
 
-        if places_data['status'] != 'OK':
+        banks = geo_cache.nearby_banks(lat, lng, GOOGLE_API_KEY, radius=10000, place_type='bank')
+        if banks is None:
             mock_banks = [
                 {
                     "name": "State Bank of India (Mock)",
@@ -290,39 +360,37 @@ def find_banks():
                 "center": {"lat": lat, "lng": lng}
             }), 200
 
-        banks = []
-        for place in places_data['results'][:5]:
-            banks.append({
-                "name": place['name'],
-                "address": place.get('vicinity', 'Address not available'),
-                "lat": place['geometry']['location']['lat'],
-                "lng": place['geometry']['location']['lng']
-            })
-
         return jsonify({
-            "banks": banks,
+            "banks": banks[:5],
             "center": {"lat": lat, "lng": lng}
         }), 200
 
     except Exception as e:
         return jsonify({"error": f"Server error: {str(e)}"}), 500
 
-@app.route('/find_lockers', methods=['POST'])
-def find_lockers():
+def find_lockers_flow(data):
     try:
-        data = request.get_json()
         if not data:
-            return jsonify({"error": "No data provided"}), 400
+            return {"error": "No data provided"}, 400
 
         required_fields = ['location', 'district', 'state']
         for field in required_fields:
             if field not in data or not data[field]:
-                return jsonify({"error": f"Missing or empty field: {field}"}), 400
+                return {"error": f"Missing or empty field: {field}"}, 400
 
         location = data['location'].strip().title()
         district = data['district'].strip().title()
         state = data['state'].strip().title()
 
+        index = branch_index.get_index()
+        if index is not None:
+            branches, center = index.in_district(location, district, state, k=5, lockers_only=True)
+            if branches:
+                return {
+                    "banks": [branch_index.to_bank(b) for b in branches],
+                    "center": center
+                }, 200
+
         prompt_template = PromptTemplate(
             input_variables=["location", "district", "state"],
             template=""" 
@@ -379,57 +447,76 @@ def find_lockers():
 
         try:
             logger.debug(f"Sending prompt to Gemini for lockers: {prompt[:200]}...")
-            response = llm.invoke(prompt)
+            response = yield prompt, parses_as(structured_output.LOCKERS)
             logger.debug(f"Raw Gemini response: {response.content}")
 
-            response_content = response.content.strip()
-            response_content = re.sub(r'^```json\s*|\s*```$', '', response_content).strip()
-            logger.debug(f"Cleaned Gemini response: {response_content}")
-
-            result = json.loads(response_content)
-            if not isinstance(result, dict) or 'banks' not in result or 'center' not in result:
-                logger.error("Invalid response format from Gemini")
-                return jsonify({
-                    "banks": [],
-                    "center": {"lat": 12.9716, "lng": 77.5946}
-                }), 200
-
-            required_fields = ['name', 'address', 'lat', 'lng']
-            valid_banks = []
-            for bank in result['banks']:
-                if isinstance(bank, dict) and all(field in bank for field in required_fields):
-                    valid_banks.append(bank)
-                else:
-                    logger.warning(f"Invalid bank object: {bank}")
-            result['banks'] = valid_banks
+            result = structured_output.parse(response.content, structured_output.LOCKERS)
+            if 'center' not in result:
+                result['center'] = {"lat": 12.9716, "lng": 77.5946}
 
         except (json.JSONDecodeError, ValueError) as e:
             logger.error(f"Error parsing Gemini response: {str(e)}")
-            return jsonify({
+            return {
                 "banks": [],
                 "center": {"lat": 12.9716, "lng": 77.5946}
-            }), 200
+            }, 200
         except Exception as e:
             logger.error(f"Gemini query error: {str(e)}")
-            return jsonify({"error": f"Server error: {str(e)}"}), 500
+            return {"error": f"Server error: {str(e)}"}, 500
 
-        return jsonify(result), 200
+        return result, 200
 
     except Exception as e:
         logger.error(f"Server error: {str(e)}")
-        return jsonify({"error": f"Server error: {str(e)}"}), 500
+        return {"error": f"Server error: {str(e)}"}, 500
 
-@app.route('/find_schemes', methods=['POST'])
-def find_schemes():
+@app.route('/find_lockers', methods=['POST'])
+def find_lockers():
+    if wants_stream():
+        return sse_response(find_lockers_flow(request.get_json(silent=True)), structured_output.LOCKERS)
+    payload, status = gateway.run(find_lockers_flow(request.get_json(silent=True)))
+    return jsonify(payload), status
+
+def catalogue_lookup(kind, key, data):
+    """Answer /find_schemes or /find_insurance from scheme_catalogue.
+
+    A district the LLM has not been asked about yet gets a background enrichment job;
+    its schemes are written back and included from the next request on.
+    """
     try:
-        data = request.get_json()
         if not data:
-            return jsonify({"error": "No data provided"}), 400
+            return {"error": "No data provided"}, 400
 
         required_fields = ['location', 'district', 'state']
         for field in required_fields:
             if field not in data or not data[field]:
-                return jsonify({"error": f"Missing or empty field: {field}"}), 400
+                return {"error": f"Missing or empty field: {field}"}, 400
+
+        district = data['district'].strip().title()
+        state = data['state'].strip().title()
+
+        catalogue = scheme_catalogue.get_catalogue()
+        results = catalogue.search(kind, district, state, query=data.get('query'),
+                                   category=data.get('category'), language=data.get('language'))
+        enrichment_pending = scheme_catalogue.needs_enrichment(kind, district, state)
+        if enrichment_pending:
+            jobs.submit(f"enrich_{key}", {"location": district, "district": district, "state": state})
+        metrics.incr(f"{key}_catalogue_hits")
+        return {key: results, "enrichment_pending": enrichment_pending}, 200
+
+    except Exception as e:
+        logger.error(f"Server error: {str(e)}")
+        return {"error": f"Server error: {str(e)}"}, 500
+
+def enrich_schemes_flow(data):
+    try:
+        if not data:
+            return {"error": "No data provided"}, 400
+
+        required_fields = ['location', 'district', 'state']
+        for field in required_fields:
+            if field not in data or not data[field]:
+                return {"error": f"Missing or empty field: {field}"}, 400
 
         location = data['location'].strip().title()
         district = data['district'].strip().title()
@@ -495,28 +582,12 @@ def find_schemes():
 
         try:
             logger.debug(f"Sending prompt to Gemini: {prompt[:200]}...")
-            response = llm.invoke(prompt)
+            response = yield prompt, parses_as(structured_output.SCHEMES)
             logger.debug(f"Raw Gemini response: {response.content}")
 
-            response_content = response.content.strip()
-            response_content = re.sub(r'^```json\s*|\s*```$', '', response_content).strip()
-            logger.debug(f"Cleaned Gemini response: {response_content}")
-
-            schemes = json.loads(response_content)
-            if not isinstance(schemes, list):
-                logger.error("Gemini response is not a list")
-                schemes = []
-
-            required_fields = ['name', 'description', 'eligibility', 'link', 'states', 'districts', 'launch_date']
-            valid_schemes = []
-            for scheme in schemes:
-                if isinstance(scheme, dict) and all(field in scheme for field in required_fields):
-                    valid_schemes.append(scheme)
-                else:
-                    logger.warning(f"Invalid scheme object: {scheme}")
-            schemes = valid_schemes
-
+            schemes = structured_output.parse(response.content, structured_output.SCHEMES)
             schemes.sort(key=lambda x: x['launch_date'], reverse=True)
+            scheme_catalogue.write_back('scheme', district, state, schemes)
 
         except (json.JSONDecodeError, ValueError) as e:
             logger.error(f"Error parsing Gemini response: {str(e)}")
@@ -525,45 +596,89 @@ def find_schemes():
             logger.error(f"Gemini query error: {str(e)}")
             schemes = []
 
-        return jsonify({"schemes": schemes}), 200
+        return {"schemes": schemes}, 200
 
     except Exception as e:
         logger.error(f"Server error: {str(e)}")
-        return jsonify({"error": f"Server error: {str(e)}"}), 500
+        return {"error": f"Server error: {str(e)}"}, 500
 
-@app.route('/analyze_document', methods=['POST'])
-def analyze_document():
+@app.route('/find_schemes', methods=['POST'])
+def find_schemes():
+    payload, status = catalogue_lookup('scheme', 'schemes', request.get_json(silent=True))
+    return jsonify(payload), status
+
+def analyze_document_flow(files, form):
     try:
-        if 'file' not in request.files:
-            return jsonify({"error": "No file provided"}), 400
+        if 'file' not in files:
+            return {"error": "No file provided"}, 400
 
-        file = request.files['file']
-        document_type = request.form.get('document_type', 'other')
-        language = request.form.get('language', 'en')
+        file = files['file']
+        document_type = form.get('document_type', 'other')
+        language = form.get('language', 'en')
+        # languages=requested: only the requested language now, the others later
+        single = form.get('languages') == 'requested'
 
         if not file.filename:
-            return jsonify({"error": "No file selected"}), 400
+            return {"error": "No file selected"}, 400
 
         # Validate file type
-        allowed_extensions = {'pdf', 'jpg', 'jpeg', 'png', 'doc', 'docx'}
-        if file.filename.rsplit('.', 1)[-1].lower() not in allowed_extensions:
-            return jsonify({"error": "Unsupported file type. Use PDF, JPG, PNG, DOC, or DOCX."}), 400
-
-        # Basic content extraction (simulated OCR for images/PDFs, direct for DOCX)
-        content = ""
-        if file.filename.endswith('.pdf'):
-            pdf_reader = PyPDF2.PdfReader(file)
-            for page in pdf_reader.pages:
-                content += page.extract_text() or ""
-        elif file.filename.endswith(('.jpg', '.jpeg', '.png')):
-            image = Image.open(file)
-            content = f"Sample {document_type} document content extracted from image."
-        elif file.filename.endswith(('.doc', '.docx')):
-            doc = docx.Document(file)
-            content = "\n".join([para.text for para in doc.paragraphs])
-
-        if not content.strip():
-            content = f"Placeholder content for {document_type} document."
+        if not documents.allowed_file(file.filename):
+            return {"error": "Unsupported file type. Use PDF, JPG, PNG, DOC, or DOCX."}, 400
+
+        digest = upload_store.content_hash(file)
+        return (yield from document_analysis_flow(
+            file.filename, digest, lambda: documents.extract_text(file.filename, file), document_type, language,
+            single
+        ))
+
+    except Exception as e:
+        logger.error(f"Server error: {str(e)}")
+        return {"error": f"Server error: {str(e)}"}, 500
+
+def document_content(filename, digest, extract, document_type):
+    # Basic content extraction (simulated OCR for images/PDFs, direct for DOCX)
+    content = upload_store.cached_text(digest, extract)
+    if filename.endswith(('.jpg', '.jpeg', '.png')):
+        content = f"Sample {document_type} document content extracted from image."
+
+    if not content.strip():
+        content = f"Placeholder content for {document_type} document."
+    return content
+
+def document_analysis_flow(filename, digest, extract, document_type, language, single=False):
+    """Analysis of one uploaded document; extract() is only called when its text is not cached.
+
+    With single=True only the requested language is generated; the response carries a
+    document_id for GET /document_analysis/<document_id>, and the other languages are
+    queued in the background when DOCUMENT_PREFETCH_LANGUAGES is set.
+    """
+    if single:
+        payload, status = yield from document_language_flow(filename, digest, extract, document_type, language)
+        if status != 200:
+            return payload, status
+        pending = [lang for lang in DOCUMENT_LANGUAGES if lang != language]
+        if DOCUMENT_PREFETCH_LANGUAGES:
+            for lang in pending:
+                jobs.submit('analyze_document_language', {
+                    "digest": digest,
+                    "filename": filename,
+                    "document_type": document_type,
+                    "language": lang
+                })
+        return dict(payload, document_id=digest, pending_languages=pending), 200
+
+    try:
+        # A file seen before reuses its analysis, or at least its extracted text
+        result_kind = f"analysis:{document_type}:{language}"
+        analysis = upload_store.cached_llm_result(digest, result_kind)
+        if analysis is not None:
+            return {"analysis": analysis}, 200
+        analysis = {lang: upload_store.get_result(digest, f"analysis_{lang}:{document_type}") for lang in DOCUMENT_LANGUAGES}
+        if all(result is not None for result in analysis.values()):
+            metrics.incr('upload_llm_calls_avoided')
+            return {"analysis": analysis}, 200
+
+        content = document_content(filename, digest, extract, document_type)
 
         # Define prompt template
         prompt_template = PromptTemplate(
@@ -612,31 +727,182 @@ def analyze_document():
         prompt = prompt_template.format(
             content=content[:1000],
             document_type=document_type,
-            language={'en': 'English', 'hi': 'Hindi', 'kn': 'Kannada'}[language]
+            language=DOCUMENT_LANGUAGES[language]
         )
 
         try:
             logger.debug(f"Sending prompt to Gemini: {prompt[:200]}...")
-            response = llm.invoke(prompt)
+            response = yield prompt, parses_as(structured_output.DOCUMENT_ANALYSIS)
             logger.debug(f"Raw Gemini response: {response.content}")
 
-            response_content = response.content.strip()
-            response_content = re.sub(r'^```json\s*|\s*```$', '', response_content).strip()
-            logger.debug(f"Cleaned Gemini response: {response_content}")
+            analysis = structured_output.parse(response.content, structured_output.DOCUMENT_ANALYSIS)
+            if not all(lang in analysis for lang in ['en', 'hi', 'kn']):
+                logger.error("Invalid analysis response format")
+                return {"error": "Invalid analysis response"}, 500
+            upload_store.put_result(digest, result_kind, analysis)
+
+        except (json.JSONDecodeError, ValueError) as e:
+            logger.error(f"Error parsing Gemini response: {str(e)}")
+            return {"error": "Failed to parse analysis response"}, 500
+        except Exception as e:
+            logger.error(f"Gemini query error: {str(e)}")
+            return {"error": f"Analysis error: {str(e)}"}, 500
+
+        return {"analysis": analysis}, 200
+
+    except Exception as e:
+        logger.error(f"Server error: {str(e)}")
+        return {"error": f"Server error: {str(e)}"}, 500
+
+def document_language_flow(filename, digest, extract, document_type, language):
+    """One language's analysis, cached per (document, document_type, language).
+
+    A third of the output of the trilingual prompt, so it returns sooner and is not cut
+    off by max_output_tokens. A cached trilingual analysis of the file is reused.
+    """
+    try:
+        result_kind = f"analysis_{language}:{document_type}"
+        analysis = upload_store.cached_llm_result(digest, result_kind)
+        if analysis is not None:
+            return {"analysis": {language: analysis}}, 200
+        for lang in DOCUMENT_LANGUAGES:
+            analysis = upload_store.cached_llm_result(digest, f"analysis:{document_type}:{lang}")
+            if analysis is not None and language in analysis:
+                return {"analysis": {language: analysis[language]}}, 200
+
+        content = document_content(filename, digest, extract, document_type)
 
-            analysis = json.loads(response_content)
-            if not isinstance(analysis, dict) or not all(lang in analysis for lang in ['en', 'hi', 'kn']):
+        prompt_template = PromptTemplate(
+            input_variables=["content", "document_type", "language"],
+            template=""" 
+            You are a financial document analysis assistant for India. Analyze the provided document content and provide guidance for filling it out correctly. The document type is '{document_type}' and the output must be in '{language}'.
+
+            Document Content:
+            {content}
+
+            Instructions:
+            - Analyze the document content and identify its purpose and requirements.
+            - Provide the following in '{language}':
+              - Summary: A brief description of the document's purpose (1-2 sentences).
+              - Required Information: A list of 3-5 key fields or details needed to complete the document.
+              - Filing Instructions: A list of 3-5 steps to correctly fill out or submit the document.
+              - Important Notes: Any additional guidance or requirements (e.g., supporting documents, mandatory fields).
+            - Return a single JSON object with the keys summary, required_info, instructions and notes, written in '{language}' only.
+            - Ensure the JSON is valid and properly formatted.
+            - Do not include markdown or extra text, only the JSON object.
+
+            Example Output (for English):
+            {{
+                "summary": "This is a loan application form requiring personal and financial details.",
+                "required_info": ["Name and address", "Monthly income", "Loan amount", "Purpose of loan", "Repayment period"],
+                "instructions": ["Fill in personal details in BLOCK LETTERS", "Provide accurate income", "State loan purpose clearly", "Include bank details", "Sign the form"],
+                "notes": "Attach Aadhaar/PAN, address proof, and income proof. All fields marked with * are mandatory."
+            }}
+            """
+        )
+
+        prompt = prompt_template.format(
+            content=content[:1000],
+            document_type=document_type,
+            language=DOCUMENT_LANGUAGES[language]
+        )
+
+        try:
+            logger.debug(f"Sending prompt to Gemini: {prompt[:200]}...")
+            response = yield prompt, parses_as(structured_output.DOCUMENT_ANALYSIS_LANGUAGE)
+            logger.debug(f"Raw Gemini response: {response.content}")
+
+            analysis = structured_output.parse(response.content, structured_output.DOCUMENT_ANALYSIS_LANGUAGE)
+            if 'summary' not in analysis:
                 logger.error("Invalid analysis response format")
-                return jsonify({"error": "Invalid analysis response"}), 500
+                return {"error": "Invalid analysis response"}, 500
+            upload_store.put_result(digest, result_kind, analysis)
 
         except (json.JSONDecodeError, ValueError) as e:
             logger.error(f"Error parsing Gemini response: {str(e)}")
-            return jsonify({"error": "Failed to parse analysis response"}), 500
+            return {"error": "Failed to parse analysis response"}, 500
         except Exception as e:
             logger.error(f"Gemini query error: {str(e)}")
-            return jsonify({"error": f"Analysis error: {str(e)}"}), 500
+            return {"error": f"Analysis error: {str(e)}"}, 500
 
-        return jsonify({"analysis": analysis}), 200
+        return {"analysis": {language: analysis}}, 200
+
+    except Exception as e:
+        logger.error(f"Server error: {str(e)}")
+        return {"error": f"Server error: {str(e)}"}, 500
+
+def cached_text_only(digest):
+    """extract() for a document known only by hash: its text must already be cached."""
+    def extract():
+        raise LookupError("Document text is not cached")
+    return extract
+
+def analyze_document_job(job):
+    extract = lambda: documents.extract_text(job['filename'], job['path'])
+    return gateway.run(document_analysis_flow(
+        job['filename'], job['digest'], extract, job['document_type'], job['language'], job.get('single', False)
+    ))
+
+def analyze_document_language_job(job):
+    return gateway.run(document_language_flow(
+        job['filename'], job['digest'], cached_text_only(job['digest']), job['document_type'], job['language']
+    ))
+
+@app.route('/analyze_document', methods=['POST'])
+def analyze_document():
+    file = request.files.get('file')
+    # Invalid uploads fall through to the synchronous flow, which reports the error
+    if wants_async() and file and file.filename and documents.allowed_file(file.filename):
+        digest, path = upload_store.save(file)
+        return job_accepted(jobs.submit('analyze_document', {
+            "digest": digest,
+            "path": path,
+            "filename": file.filename,
+            "document_type": request.form.get('document_type', 'other'),
+            "language": request.form.get('language', 'en'),
+            "single": request.form.get('languages') == 'requested'
+        }))
+    payload, status = gateway.run(analyze_document_flow(request.files, request.form))
+    return jsonify(payload), status
+
+@app.route('/document_analysis/<digest>')
+def document_analysis(digest):
+    """Another language of an analysed document, generated on demand if not cached yet."""
+    language = request.args.get('language', 'en')
+    if language not in DOCUMENT_LANGUAGES:
+        return jsonify({"error": "Unsupported language"}), 400
+    if upload_store.get_result(digest, 'text') is None:
+        return jsonify({"error": "Document not found"}), 404
+    filename = request.args.get('filename', '')
+    document_type = request.args.get('document_type', 'other')
+    payload, status = gateway.run(document_language_flow(
+        filename, digest, cached_text_only(digest), document_type, language
+    ))
+    return jsonify(payload), status
+
+@app.route('/analyze_documents', methods=['POST'])
+def analyze_documents():
+    try:
+        files = [file for file in request.files.getlist('files') if file.filename]
+        if not files:
+            return jsonify({"error": "No files provided"}), 400
+        if len(files) > documents.DOCUMENT_BATCH_MAX_FILES:
+            return jsonify({"error": f"At most {documents.DOCUMENT_BATCH_MAX_FILES} files per batch"}), 400
+
+        document_type = request.form.get('document_type', 'other')
+        language = request.form.get('language', 'en')
+        if language not in ('en', 'hi', 'kn'):
+            return jsonify({"error": "Unsupported language"}), 400
+
+        single = request.form.get('languages') == 'requested'
+
+        def analyze(filename, digest, extract):
+            return gateway.run(document_analysis_flow(filename, digest, extract, document_type, language, single))
+
+        started = datetime.now()
+        results = documents.analyze_batch([(file.filename, file.read()) for file in files], analyze)
+        total_ms = round((datetime.now() - started).total_seconds() * 1000, 1)
+        return jsonify({"results": results, "total_ms": total_ms}), 200
 
     except Exception as e:
         logger.error(f"Server error: {str(e)}")
@@ -647,17 +913,15 @@ def financial_assistant():
     lang = request.args.get('lang', 'en')
     return render_template('financial_assistant.html', lang=lang)
 
-@app.route('/financial_assistant', methods=['POST'])
-def financial_assistant_post():
+def financial_assistant_flow(data):
     try:
-        data = request.get_json()
         if not data:
-            return jsonify({"error": "No data provided"}), 400
+            return {"error": "No data provided"}, 400
 
         required_fields = ['query', 'language']
         for field in required_fields:
             if field not in data or not data[field]:
-                return jsonify({"error": f"Missing or empty field: {field}"}), 400
+                return {"error": f"Missing or empty field: {field}"}, 400
 
         query = data['query'].strip()
         language = data['language'].strip().lower()
@@ -696,7 +960,7 @@ def financial_assistant_post():
 
         try:
             logger.debug(f"Sending prompt to Gemini: {prompt[:200]}...")
-            response = llm.invoke(prompt)
+            response = yield prompt, None
             logger.debug(f"Gemini response: {response.content}")
 
             answer = response.content.strip()
@@ -708,11 +972,18 @@ def financial_assistant_post():
             logger.error(f"Gemini query error: {str(e)}")
             answer = "Error processing query. Please try again later."
 
-        return jsonify({"response": answer}), 200
+        return {"response": answer}, 200
 
     except Exception as e:
         logger.error(f"Server error: {str(e)}")
-        return jsonify({"error": f"Server error: {str(e)}"}), 500
+        return {"error": f"Server error: {str(e)}"}, 500
+
+@app.route('/financial_assistant', methods=['POST'])
+def financial_assistant_post():
+    if wants_stream():
+        return sse_response(financial_assistant_flow(request.get_json(silent=True)))
+    payload, status = gateway.run(financial_assistant_flow(request.get_json(silent=True)))
+    return jsonify(payload), status
 
 # Chatbot Routes
 @app.route('/chatbot')
@@ -724,12 +995,10 @@ def chatbot():
         logger.error(f"Error rendering chatbot page: {e}")
         return jsonify({"error": "Failed to load the chatbot page"}), 500
 
-@app.route('/chat', methods=['POST'])
-def chat():
+def chat_flow(data):
     try:
-        if not request.is_json:
+        if data is None:
             raise BadRequest("Request must be JSON")
-        data = request.json
         user_input = data.get('message')
         language = data.get('language', 'en-US')
         context = data.get('context', 'general')
@@ -771,7 +1040,7 @@ def chat():
 
         try:
             logger.debug(f"Sending prompt to Gemini: {prompt[:200]}...")
-            response = llm.invoke(prompt)
+            response = yield prompt, None
             logger.debug(f"Gemini response: {response.content}")
 
             bot_response = response.content.strip()
@@ -783,31 +1052,36 @@ def chat():
             logger.error(f"Gemini query error: {str(e)}")
             bot_response = "Error processing query. Please try again later."
 
-        return jsonify({'response': bot_response}), 200
+        return {'response': bot_response}, 200
 
     except BadRequest as e:
         logger.warning(f"Bad request: {e}")
-        return jsonify({'error': str(e)}), 400
+        return {'error': str(e)}, 400
     except Exception as e:
         logger.error(f"Server error in chat route: {e}")
-        return jsonify({'error': 'Internal server error'}), 500
+        return {'error': 'Internal server error'}, 500
+
+@app.route('/chat', methods=['POST'])
+def chat():
+    if wants_stream():
+        return sse_response(chat_flow(request.get_json(silent=True)))
+    payload, status = gateway.run(chat_flow(request.get_json(silent=True)))
+    return jsonify(payload), status
 
 @app.route('/insurance')
 def insurance():
     lang = request.args.get('lang', 'en')
     return render_template('insurance.html', lang=lang)
 
-@app.route('/find_insurance', methods=['POST'])
-def find_insurance():
+def enrich_insurance_flow(data):
     try:
-        data = request.get_json()
         if not data:
-            return jsonify({"error": "No data provided"}), 400
+            return {"error": "No data provided"}, 400
 
         required_fields = ['location', 'district', 'state']
         for field in required_fields:
             if field not in data or not data[field]:
-                return jsonify({"error": f"Missing or empty field: {field}"}), 400
+                return {"error": f"Missing or empty field: {field}"}, 400
 
         location = data['location'].strip().title()
         district = data['district'].strip().title()
@@ -873,28 +1147,12 @@ def find_insurance():
 
         try:
             logger.debug(f"Sending prompt to Gemini for insurance: {prompt[:200]}...")
-            response = llm.invoke(prompt)
+            response = yield prompt, parses_as(structured_output.SCHEMES)
             logger.debug(f"Raw Gemini response: {response.content}")
 
-            response_content = response.content.strip()
-            response_content = re.sub(r'^```json\s*|\s*```$', '', response_content).strip()
-            logger.debug(f"Cleaned Gemini response: {response_content}")
-
-            insurance = json.loads(response_content)
-            if not isinstance(insurance, list):
-                logger.error("Gemini response is not a list")
-                insurance = []
-
-            required_fields = ['name', 'description', 'eligibility', 'link', 'states', 'districts', 'launch_date']
-            valid_insurance = []
-            for scheme in insurance:
-                if isinstance(scheme, dict) and all(field in scheme for field in required_fields):
-                    valid_insurance.append(scheme)
-                else:
-                    logger.warning(f"Invalid insurance scheme object: {scheme}")
-            insurance = valid_insurance
-
+            insurance = structured_output.parse(response.content, structured_output.SCHEMES)
             insurance.sort(key=lambda x: x['launch_date'], reverse=True)
+            scheme_catalogue.write_back('insurance', district, state, insurance)
 
         except (json.JSONDecodeError, ValueError) as e:
             logger.error(f"Error parsing Gemini response: {str(e)}")
@@ -903,11 +1161,16 @@ def find_insurance():
             logger.error(f"Gemini query error: {str(e)}")
             insurance = []
 
-        return jsonify({"insurance": insurance}), 200
+        return {"insurance": insurance}, 200
 
     except Exception as e:
         logger.error(f"Server error: {str(e)}")
-        return jsonify({"error": f"Server error: {str(e)}"}), 500
+        return {"error": f"Server error: {str(e)}"}, 500
+
+@app.route('/find_insurance', methods=['POST'])
+def find_insurance():
+    payload, status = catalogue_lookup('insurance', 'insurance', request.get_json(silent=True))
+    return jsonify(payload), status
 
 @app.route('/about')
 def about():
@@ -930,6 +1193,78 @@ def expense_tracker():
     lang = request.args.get('lang', 'en')
     return render_template('expense_tracker.html', lang=lang)
 
+def bill_amount_prompt(content, bill_type):
+    """The Gemini prompt that extracts only the amount from a bill's text."""
+    prompt_template = PromptTemplate(
+        input_variables=["content", "bill_type"],
+        template=""" 
+        You are a bill analysis assistant for rural Indian households. Extract only the total bill amount from the provided {bill_type} bill content, focusing on typical bill formats in India.
+
+        Content:
+        {content}
+
+        Instructions:
+        - Extract the following field:
+          - amount: Total bill amount in INR (numeric, e.g., 1500.50).
+        - Return a JSON object with only the 'amount' field.
+        - If the amount is not found, return {{"amount": 0.0}}.
+        - Do not include markdown, explanations, or extra text—only the JSON object.
+
+        Example Output:
+        {{
+            "amount": 1500.50
+        }}
+        """
+    )
+    return prompt_template.format(content=content[:1000], bill_type=bill_type)
+
+def record_uploaded_bill(digest, file_path, filename, bill_type, user_id):
+    """Extract the amount from a stored bill upload and add the bill; returns (payload, status)."""
+    # Extract content
+    content = ""
+    if filename.endswith('.pdf'):
+        content = upload_store.cached_text(digest, lambda: pdf_text.extract_text(file_path))
+    elif filename.endswith(('.jpg', '.jpeg', '.png')):
+        content = f"Sample {bill_type} bill content extracted from image."
+
+    if not content.strip():
+        content = f"Placeholder content for {bill_type} bill in rural India."
+
+    prompt = bill_amount_prompt(content, bill_type)
+    amount_kind = f"amount:{bill_type}"
+    amount = upload_store.cached_llm_result(digest, amount_kind)
+    if amount is None:
+        # Printed bills from the common billers are read by rules; Gemini handles the rest
+        rule_amount, confidence, layout = bill_amount.extract_amount(content)
+        if rule_amount is not None and confidence >= bill_amount.BILL_RULES_MIN_CONFIDENCE:
+            logger.debug(f"Rule-based amount {rule_amount} ({layout}, confidence {confidence})")
+            metrics.incr('bill_amount_rule_hits')
+            amount = rule_amount
+        else:
+            metrics.incr('bill_amount_rule_misses')
+    if amount is None:
+        try:
+            response = gateway.invoke(prompt, cacheable=parses_as(structured_output.BILL_AMOUNT))
+            amount = structured_output.parse(response.content, structured_output.BILL_AMOUNT)['amount']
+            upload_store.put_result(digest, amount_kind, amount)
+        except Exception as e:
+            logger.error(f"Gemini extraction error: {str(e)}")
+            amount = 0.0
+
+    # Store in SQLite
+    bill_id = db.add_bill(
+        user_id,
+        bill_type,
+        amount,
+        datetime.now().strftime('%Y-%m-%d'),
+        file_path
+    )
+
+    return {"message": "Bill uploaded successfully", "bill_id": bill_id}, 200
+
+def upload_bill_job(job):
+    return record_uploaded_bill(job['digest'], job['path'], job['filename'], job['bill_type'], job['user_id'])
+
 @app.route('/upload_bill', methods=['POST'])
 def upload_bill():
     try:
@@ -948,76 +1283,20 @@ def upload_bill():
         if file.filename.rsplit('.', 1)[-1].lower() not in allowed_extensions:
             return jsonify({"error": "Unsupported file type. Use PDF, JPG, or PNG."}), 400
 
-        # Save file
-        upload_folder = 'uploads/bills'
-        os.makedirs(upload_folder, exist_ok=True)
-        file_path = os.path.join(upload_folder, f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{file.filename}")
-        file.save(file_path)
-
-        # Extract content
-        content = ""
-        if file.filename.endswith('.pdf'):
-            pdf_reader = PyPDF2.PdfReader(file)
-            for page in pdf_reader.pages:
-                text = page.extract_text()
-                content += text or ""
-        elif file.filename.endswith(('.jpg', '.jpeg', '.png')):
-            content = f"Sample {bill_type} bill content extracted from image."
-
-        if not content.strip():
-            content = f"Placeholder content for {bill_type} bill in rural India."
-
-        # Use Gemini to extract only the amount
-        prompt_template = PromptTemplate(
-            input_variables=["content", "bill_type"],
-            template=""" 
-            You are a bill analysis assistant for rural Indian households. Extract only the total bill amount from the provided {bill_type} bill content, focusing on typical bill formats in India.
-
-            Content:
-            {content}
+        # Save file; identical uploads share one copy under their content hash
+        digest, file_path = upload_store.save(file)
 
-            Instructions:
-            - Extract the following field:
-              - amount: Total bill amount in INR (numeric, e.g., 1500.50).
-            - Return a JSON object with only the 'amount' field.
-            - If the amount is not found, return {"amount": 0.0}.
-            - Do not include markdown, explanations, or extra text—only the JSON object.
+        if wants_async():
+            return job_accepted(jobs.submit('upload_bill', {
+                "digest": digest,
+                "path": file_path,
+                "filename": file.filename,
+                "bill_type": bill_type,
+                "user_id": user_id
+            }))
 
-            Example Output:
-            {{
-                "amount": 1500.50
-            }}
-            """
-        )
-
-        prompt = prompt_template.format(content=content[:1000], bill_type=bill_type)
-        try:
-            response = llm.invoke(prompt)
-            response_content = re.sub(r'^```json\s*|\s*```$', '', response.content).strip()
-            extracted_data = json.loads(response_content)
-            amount = extracted_data.get('amount', 0.0)
-        except Exception as e:
-            logger.error(f"Gemini extraction error: {str(e)}")
-            amount = 0.0
-
-        # Store in SQLite
-        conn = sqlite3.connect('users.db')
-        c = conn.cursor()
-        c.execute('''
-            INSERT INTO bills (user_id, bill_type, amount, bill_date, file_path)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (
-            user_id,
-            bill_type,
-            amount,
-            datetime.now().strftime('%Y-%m-%d'),
-            file_path
-        ))
-        conn.commit()
-        bill_id = c.lastrowid
-        conn.close()
-
-        return jsonify({"message": "Bill uploaded successfully", "bill_id": bill_id}), 200
+        payload, status = record_uploaded_bill(digest, file_path, file.filename, bill_type, user_id)
+        return jsonify(payload), status
 
     except Exception as e:
         logger.error(f"Server error: {str(e)}")
@@ -1030,37 +1309,14 @@ def add_manual_bill():
         if not data:
             return jsonify({"error": "No data provided"}), 400
 
-        bill_type = data.get('bill_type', 'other').lower()
-        amount = data.get('amount')
-        bill_date = data.get('bill_date')
-        user_id = data.get('user_id', 1)  # Default to 1 for demo
-
         # Validate inputs
         try:
-            amount = float(amount)
-            if amount <= 0:
-                return jsonify({"error": "Amount must be a positive number"}), 400
-        except (ValueError, TypeError):
-            return jsonify({"error": "Invalid amount"}), 400
-
-        if not bill_date:
-            bill_date = datetime.now().strftime('%Y-%m-%d')
-        else:
-            try:
-                datetime.strptime(bill_date, '%Y-%m-%d')
-            except ValueError:
-                return jsonify({"error": "Invalid date format. Use YYYY-MM-DD."}), 400
+            user_id, bill_type, amount, bill_date = bill_import.validate_bill(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
         # Store in SQLite
-        conn = sqlite3.connect('users.db')
-        c = conn.cursor()
-        c.execute('''
-            INSERT INTO bills (user_id, bill_type, amount, bill_date, file_path)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (user_id, bill_type, amount, bill_date, None))
-        conn.commit()
-        bill_id = c.lastrowid
-        conn.close()
+        bill_id = db.add_bill(user_id, bill_type, amount, bill_date)
 
         return jsonify({"message": "Manual bill added successfully", "bill_id": bill_id}), 200
 
@@ -1068,6 +1324,28 @@ def add_manual_bill():
         logger.error(f"Server error: {str(e)}")
         return jsonify({"error": f"Server error: {str(e)}"}), 500
 
+@app.route('/import_bills', methods=['POST'])
+def import_bills():
+    try:
+        if 'file' not in request.files:
+            return jsonify({"error": "No file provided"}), 400
+
+        file = request.files['file']
+        if not file.filename.lower().endswith(('.csv', '.jsonl')):
+            return jsonify({"error": "Unsupported file type. Use CSV or JSONL."}), 400
+
+        try:
+            user_id = int(request.form.get('user_id', 1))  # Default to 1 for demo
+        except ValueError:
+            return jsonify({"error": "Invalid user_id"}), 400
+
+        result = bill_import.import_bills(bill_import.iter_records(file.stream, file.filename), user_id)
+        return jsonify(result), 200
+
+    except Exception as e:
+        logger.error(f"Server error: {str(e)}")
+        return jsonify({"error": f"Server error: {str(e)}"}), 500
+
 @app.route('/analyze_bills', methods=['POST'])
 def analyze_bills():
     try:
@@ -1078,112 +1356,33 @@ def analyze_bills():
         bill_type = data.get('bill_type', 'all').lower()
         user_id = data.get('user_id', 1)  # Default to 1 for demo
 
-        # Fetch bills from SQLite
-        conn = sqlite3.connect('users.db')
-        c = conn.cursor()
-
-        if bill_type == 'all':
-            # Fetch all bills for the user
-            c.execute('''
-                SELECT bill_type, amount, bill_date
-                FROM bills
-                WHERE user_id = ?
-                ORDER BY bill_date ASC
-            ''', (user_id,))
+        # Dashboards stored by bill_cache.py are served until the user adds a bill;
+        # an 'all' miss recomputes and stores the dashboard
+        analysis = bill_cache.get_cached(user_id)
+        if analysis is not None:
+            analysis = bill_cache.for_bill_type(analysis, bill_type)
+        elif bill_type == 'all':
+            analysis = bill_cache.refresh(user_id)
         else:
-            # Fetch bills for the specified type
-            c.execute('''
-                SELECT bill_type, amount, bill_date
-                FROM bills
-                WHERE user_id = ? AND LOWER(bill_type) = ?
-                ORDER BY bill_date ASC
-            ''', (user_id, bill_type))
-        bills = c.fetchall()
-
-        # Fetch all bills for category-wise analysis
-        c.execute('''
-            SELECT bill_type, amount
-            FROM bills
-            WHERE user_id = ?
-            GROUP BY bill_type
-        ''', (user_id,))
-        all_bills = c.fetchall()
-        conn.close()
-
-        if not bills:
-            return jsonify({"error": "No bills found"}), 404
-
-        # Group bills by bill_type for analysis
-        bills_by_type = {}
-        for bill in bills:
-            bt, amount, bill_date = bill
-            if bt not in bills_by_type:
-                bills_by_type[bt] = []
-            bills_by_type[bt].append((amount, bill_date))
-
-        # Analyze each bill type
-        analysis_by_type = {}
-        for bt, bill_data in bills_by_type.items():
-            amounts = [data[0] for data in bill_data]
-            dates = [datetime.strptime(data[1], '%Y-%m-%d') for data in bill_data]
-
-            # Statistical analysis
-            monthly_avg = np.mean(amounts) if amounts else 0
-            peak_months = []
-            monthly_sums = {}
-            if dates and amounts:
-                for date, amount in zip(dates, amounts):
-                    month_key = date.strftime('%Y-%m')
-                    monthly_sums[month_key] = monthly_sums.get(month_key, 0) + amount
-                sorted_months = sorted(monthly_sums.items(), key=lambda x: x[1], reverse=True)[:3]
-                peak_months = [f"{month} (₹{amount:.2f})" for month, amount in sorted_months]
-
-            # Future bill prediction (weighted moving average)
-            future_prediction = monthly_avg
-            if len(amounts) > 3:
-                weights = np.array([0.2, 0.3, 0.5])
-                recent_amounts = amounts[-3:]
-                future_prediction = np.average(recent_amounts, weights=weights) * 1.05
-
-            # Savings tips
-            savings_tips = []
-            if bt == 'electricity' and monthly_avg > 1000:
-                savings_tips.append("Your electricity bills are high. Use LED bulbs or solar lanterns to reduce costs.")
-            elif bt == 'water' and max(amounts) > np.mean(amounts) * 2:
-                savings_tips.append("Unusually high water bill detected. Check for leaks or use rainwater harvesting.")
-            else:
-                savings_tips.append(f"Track your {bt} bills regularly to identify saving opportunities.")
-
-            analysis_by_type[bt] = {
-                "monthly_average": round(monthly_avg, 2),
-                "peak_months": peak_months,
-                "future_prediction": round(future_prediction, 2),
-                "savings_tips": savings_tips,
-                "total_bills": len(amounts),
-                "trend": {
-                    "labels": [date.strftime('%Y-%m') for date in dates],
-                    "amounts": amounts
+            # One indexed scan loads the bills as columns; the analysis runs over the arrays
+            rows = db.query(db.SELECT_USER_BILLS_BY_TYPE, (user_id, db.normalize_bill_type(bill_type)))
+            if rows:
+                result = bill_analytics.analyze(*bill_analytics.to_arrays(rows))
+                # Category-wise spending for pie chart always covers every bill type
+                category_totals = db.query(db.SELECT_CATEGORY_TOTALS, (user_id,))
+                analysis = {
+                    "by_type": result['by_type'],
+                    "graph_data": {
+                        "category": {
+                            "labels": [bt for bt, _ in category_totals],
+                            "amounts": [round(total, 2) for _, total in category_totals]
+                        }
+                    },
+                    "total_bills": result['total_bills']
                 }
-            }
-
-        # Category-wise spending for pie chart
-        category_sums = {bill_type: sum(amount for bt, amount in all_bills if bt == bill_type) for bill_type, _ in all_bills}
-        category_labels = list(category_sums.keys())
-        category_values = list(category_sums.values())
-
-        # Prepare graph data
-        graph_data = {
-            "category": {
-                "labels": category_labels,
-                "amounts": category_values
-            }
-        }
-
-        analysis = {
-            "by_type": analysis_by_type,
-            "graph_data": graph_data,
-            "total_bills": len(bills)
-        }
+
+        if analysis is None:
+            return jsonify({"error": "No bills found"}), 404
 
         return jsonify({"analysis": analysis}), 200
 
@@ -1203,11 +1402,7 @@ def signup():
             return redirect(url_for('signup'))
 
         try:
-            conn = sqlite3.connect('users.db')
-            c = conn.cursor()
-            c.execute('INSERT INTO users (username, password) VALUES (?, ?)', (username, password))
-            conn.commit()
-            conn.close()
+            db.execute(db.INSERT_USER, (username, password))
             flash('Sign up successful! Please log in.', 'success')
             return redirect(url_for('login'))
         except sqlite3.IntegrityError:
@@ -1231,11 +1426,7 @@ def login():
             return redirect(url_for('login'))
 
         try:
-            conn = sqlite3.connect('users.db')
-            c = conn.cursor()
-            c.execute('SELECT id FROM users WHERE username = ? AND password = ?', (username, password))
-            user = c.fetchone()
-            conn.close()
+            user = db.query_one(db.SELECT_USER_LOGIN, (username, password))
 
             if user:
                 session['user_id'] = user[0]
@@ -1258,22 +1449,31 @@ def weather_advisory():
     lang = request.args.get('lang', 'en')
     return render_template('weather_advisory.html', lang=lang)
 
-@app.route('/weather_advisory_data', methods=['POST'])
-def weather_advisory_data():
+def weather_advisory_data_flow(data, refresh=False):
+    """Advisory for the farmer's district, served from weather_cache when one is recent enough.
+
+    refresh=True always regenerates (used by the weather_cache scheduler).
+    """
     try:
-        data = request.get_json()
         if not data:
-            return jsonify({"error": "No data provided"}), 400
+            return {"error": "No data provided"}, 400
 
         required_fields = ['location', 'district', 'state']
         for field in required_fields:
             if field not in data or not data[field]:
-                return jsonify({"error": f"Missing or empty field: {field}"}), 400
+                return {"error": f"Missing or empty field: {field}"}, 400
 
-        location = data['location'].strip().title()
         district = data['district'].strip().title()
         state = data['state'].strip().title()
 
+        if not refresh:
+            weather_cache.record_request(district, state)
+            cached = weather_cache.servable(district, state)
+            if cached is not None:
+                metrics.incr('weather_cache_hits')
+                return weather_cache.with_meta(cached[0], cached[1], district, state), 200
+            metrics.incr('weather_cache_misses')
+
         # Generate dates for the forecast
         today = datetime.now()
         daily_dates = [(today + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(1, 3)]  # Next 2 days
@@ -1364,67 +1564,83 @@ def weather_advisory_data():
             """
         )
 
+        # One advisory per district, so the village is not part of the prompt
         prompt = prompt_template.format(
-            location=location,
+            location=district,
             district=district,
             state=state,
             daily_dates=", ".join(daily_dates),
             weekly_dates=", ".join(weekly_dates),
             today=today.strftime('%Y-%m-%d')
         )
+        if refresh:
+            gateway.invalidate(prompt)
 
         try:
             logger.debug(f"Sending prompt to Gemini for weather: {prompt[:200]}...")
-            response = llm.invoke(prompt)
+            response = yield prompt, parses_as(structured_output.WEATHER)
             logger.debug(f"Raw Gemini response: {response.content}")
 
-            response_content = response.content.strip()
-            response_content = re.sub(r'^```json\s*|\s*```$', '', response_content).strip()
-            logger.debug(f"Cleaned Gemini response: {response_content}")
-
-            weather_data = json.loads(response_content)
-            if not isinstance(weather_data, dict) or 'daily_forecast' not in weather_data or 'weekly_forecast' not in weather_data:
-                logger.error("Invalid response format from Gemini")
-                return jsonify({"error": "Invalid weather data format"}), 500
-
-            # Validate daily forecast
-            required_daily_fields = ['date', 'condition', 'temperature', 'humidity', 'icon']
-            valid_daily = []
-            for day in weather_data['daily_forecast']:
-                if isinstance(day, dict) and all(field in day for field in required_daily_fields):
-                    valid_daily.append(day)
-                else:
-                    logger.warning(f"Invalid daily forecast object: {day}")
-            weather_data['daily_forecast'] = valid_daily
-
-            # Validate weekly forecast
-            required_weekly_fields = ['date', 'condition', 'min_temp', 'max_temp', 'icon']
-            valid_weekly = []
-            for day in weather_data['weekly_forecast']:
-                if isinstance(day, dict) and all(field in day for field in required_weekly_fields):
-                    valid_weekly.append(day)
-                else:
-                    logger.warning(f"Invalid weekly forecast object: {day}")
-            weather_data['weekly_forecast'] = valid_weekly
-
-            # Ensure agricultural tips and alerts are present
-            if 'agricultural_tips' not in weather_data or not isinstance(weather_data['agricultural_tips'], list):
-                weather_data['agricultural_tips'] = ["No agricultural tips available."]
-            if 'weather_alerts' not in weather_data or not isinstance(weather_data['weather_alerts'], str):
-                weather_data['weather_alerts'] = "No weather alerts available."
+            weather_data = structured_output.parse(response.content, structured_output.WEATHER)
 
         except (json.JSONDecodeError, ValueError) as e:
             logger.error(f"Error parsing Gemini response: {str(e)}")
-            return jsonify({"error": "Failed to parse weather data"}), 500
+            return {"error": "Failed to parse weather data"}, 500
         except Exception as e:
             logger.error(f"Gemini query error: {str(e)}")
-            return jsonify({"error": f"Server error: {str(e)}"}), 500
+            return {"error": f"Server error: {str(e)}"}, 500
 
-        return jsonify(weather_data), 200
+        generated_at = weather_cache.store(district, state, weather_data)
+        return weather_cache.with_meta(weather_data, generated_at, district, state), 200
 
     except Exception as e:
         logger.error(f"Server error: {str(e)}")
-        return jsonify({"error": f"Server error: {str(e)}"}), 500
+        return {"error": f"Server error: {str(e)}"}, 500
+
+@app.route('/weather_advisory_data', methods=['POST'])
+def weather_advisory_data():
+    data = request.get_json(silent=True)
+    if wants_async() and isinstance(data, dict):
+        return job_accepted(jobs.submit('weather_advisory_data', data))
+    if wants_stream():
+        return sse_response(weather_advisory_data_flow(data), structured_output.WEATHER)
+    payload, status = gateway.run(weather_advisory_data_flow(data))
+    return jsonify(payload), status
+
+def refresh_weather_advisory(district, state):
+    data = {"location": district, "district": district, "state": state}
+    return gateway.run(weather_advisory_data_flow(data, refresh=True))
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Job status and, once finished, its result; ?wait=N long-polls for up to N seconds."""
+    try:
+        wait = float(request.args.get('wait', 0))
+    except ValueError:
+        return jsonify({"error": "Invalid wait"}), 400
+    job = jobs.wait(job_id, wait) if wait > 0 else jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job), 200
+
+@app.route('/metrics')
+def metrics_view():
+    return jsonify(metrics.snapshot()), 200
+
+jobs.register('analyze_document', analyze_document_job)
+jobs.register('analyze_document_language', analyze_document_language_job)
+jobs.register('upload_bill', upload_bill_job, side_effects=True)
+jobs.register('weather_advisory_data', lambda data: gateway.run(weather_advisory_data_flow(data)))
+jobs.register('enrich_schemes', lambda data: gateway.run(enrich_schemes_flow(data)))
+jobs.register('enrich_insurance', lambda data: gateway.run(enrich_insurance_flow(data)))
+
+def start_background_workers():
+    """Start the parse pool, job workers and weather scheduler for a serving process."""
+    # Fork the parse workers before the job and weather threads exist
+    documents.start_parse_pool()
+    jobs.start()
+    weather_cache.start(refresh_weather_advisory)
 
 if __name__ == '__main__':
+    start_background_workers()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,111 @@
+"""ASGI entry point.
+
+The LLM-bound POST routes are served by an async Quart app that awaits Gemini through
+gateway.arun(), so a single worker can keep hundreds of requests in flight. Every other
+request is handed to the regular Flask app. The flows' own code between prompts (SQLite
+reads and writes, file parsing) and the LLM cache lookups run in worker threads, so a
+locked database does not stall the event loop.
+
+Run with e.g.:  hypercorn asgi:app --workers 2
+The background workers are started from the lifespan startup of each worker process.
+Requires the quart and asgiref packages; `python app.py` keeps working without them.
+"""
+from asgiref.wsgi import WsgiToAsgi
+from quart import Quart, Response, request, jsonify
+
+from app import (
+    app as flask_app, gateway, check_eligibility_flow, find_lockers_flow,
+    analyze_document_flow, financial_assistant_flow, chat_flow,
+    weather_advisory_data_flow, sse_message, start_background_workers
+)
+import structured_output
+
+async_app = Quart(__name__)
+wsgi_app = WsgiToAsgi(flask_app)
+
+
+@async_app.before_serving
+async def start_workers():
+    # Called on the loop thread, before any worker thread exists, so the parse pool forks cleanly
+    start_background_workers()
+
+
+JSON_FLOWS = {
+    '/check_eligibility': check_eligibility_flow,
+    '/find_lockers': find_lockers_flow,
+    '/financial_assistant': financial_assistant_flow,
+    '/chat': chat_flow,
+    '/weather_advisory_data': weather_advisory_data_flow,
+}
+# Routes that stream with ?stream=1: model tokens, or partial results for a JSON schema
+STREAMING_ROUTES = {
+    '/chat': None,
+    '/financial_assistant': None,
+    '/check_eligibility': structured_output.ELIGIBILITY,
+    '/find_lockers': structured_output.LOCKERS,
+    '/weather_advisory_data': structured_output.WEATHER,
+}
+ASYNC_ROUTES = set(JSON_FLOWS) | {'/analyze_document'}
+
+
+def wants_stream():
+    return request.args.get('stream') == '1' or 'text/event-stream' in request.headers.get('Accept', '')
+
+
+async def sse_response(flow, schema=None):
+    events = gateway.astream_flow(flow, blocking=True)
+    if schema is not None:
+        events = structured_output.apartial_events(events, schema)
+    event, first = await events.__anext__()
+    if event == 'done':
+        payload, status = first
+        return jsonify(payload), status
+
+    async def generate():
+        yield sse_message(event, first)
+        async for later_event, data in events:
+            yield sse_message(later_event, data)
+
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+def _json_view(path, flow):
+    async def view():
+        data = await request.get_json(silent=True)
+        if path in STREAMING_ROUTES and wants_stream():
+            return await sse_response(flow(data), STREAMING_ROUTES[path])
+        payload, status = await gateway.arun(flow(data), blocking=True)
+        return jsonify(payload), status
+    view.__name__ = flow.__name__
+    return view
+
+
+for path, flow in JSON_FLOWS.items():
+    async_app.add_url_rule(path, view_func=_json_view(path, flow), methods=['POST'])
+
+
+@async_app.route('/analyze_document', methods=['POST'])
+async def analyze_document():
+    files = await request.files
+    form = await request.form
+    payload, status = await gateway.arun(analyze_document_flow(files, form), blocking=True)
+    return jsonify(payload), status
+
+
+def _submits_job(scope):
+    """Background-job submissions return at once, so the Flask views handle them."""
+    query = scope.get('query_string', b'').decode('latin-1').split('&')
+    prefer = dict(scope.get('headers', [])).get(b'prefer', b'')
+    return 'async=1' in query or b'respond-async' in prefer
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'http' and not (scope['method'] == 'POST' and scope['path'] in ASYNC_ROUTES
+                                        and not _submits_job(scope)):
+        await wsgi_app(scope, receive, send)
+    else:
+        await async_app(scope, receive, send)
@@ -0,0 +1,137 @@
+"""Load comparison of the ASGI entry point against serving everything through Flask.
+
+    python bench_asgi.py [--clients 50 200 500] [--latency 0.5] [--threads 16] [--route /chat]
+
+Gemini is replaced by a fake model that takes --latency seconds per completion, and the
+LLM cache uses the SQLite backend in a temporary directory, so the numbers show how
+many requests one worker keeps in flight rather than how fast Gemini is. For each
+concurrency level it sends that many simultaneous requests first to the Flask app,
+served by --threads threads like a threaded WSGI worker, and then to asgi.app in one
+event loop. It prints wall time, throughput, latency percentiles and, for the ASGI
+run, the longest stall of a 10 ms timer on the event loop.
+
+Run it from a scratch directory: importing app creates users.db there.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault('GEMINI_API_KEY', 'bench')
+os.environ.setdefault('GOOGLE_API_KEY', 'bench')
+os.environ.setdefault('LLM_CACHE_BACKEND', 'sqlite')
+os.environ.setdefault('LLM_CACHE_PATH', os.path.join(tempfile.mkdtemp(), 'llm_cache.db'))
+
+import logging  # noqa: E402
+
+import httpx  # noqa: E402
+from langchain_core.messages import AIMessage  # noqa: E402
+
+import app  # noqa: E402
+import asgi  # noqa: E402
+
+
+class FakeModel:
+    model = 'bench'
+    temperature = 0.5
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def invoke(self, prompt):
+        time.sleep(self.latency)
+        return AIMessage(content='{"status": "approved", "reason": "ok"}')
+
+    async def ainvoke(self, prompt):
+        await asyncio.sleep(self.latency)
+        return AIMessage(content='{"status": "approved", "reason": "ok"}')
+
+
+def _body(route, number):
+    if route == '/check_eligibility':
+        return {'age': 30, 'monthlyIncome': 12000, 'existingLoans': 'yes', 'existingLoanAmount': 40000,
+                'defaultHistory': 'no', 'loanAmount': 50000 + number, 'loanPurpose': 'business', 'loanTenure': 12}
+    return {'message': f"How do I open a savings account? ({number})"}
+
+
+async def _loop_lag(stop):
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.01)
+        worst = max(worst, time.perf_counter() - started - 0.01)
+    return worst
+
+
+async def _measure(post, clients):
+    latencies = []
+
+    async def one(number):
+        started = time.perf_counter()
+        status = await post(number)
+        latencies.append(time.perf_counter() - started)
+        return status
+
+    stop = asyncio.Event()
+    lag = asyncio.create_task(_loop_lag(stop))
+    started = time.perf_counter()
+    statuses = await asyncio.gather(*[one(number) for number in range(clients)])
+    wall = time.perf_counter() - started
+    stop.set()
+    return wall, latencies, statuses, await lag
+
+
+async def run_flask(route, clients, offset, threads):
+    client = app.app.test_client()
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(threads) as executor:
+        async def post(number):
+            response = await loop.run_in_executor(
+                executor, lambda: client.post(route, json=_body(route, offset + number)))
+            return response.status_code
+        return await _measure(post, clients)
+
+
+async def run_asgi(route, clients, offset):
+    transport = httpx.ASGITransport(app=asgi.app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+        async def post(number):
+            response = await client.post(route, json=_body(route, offset + number))
+            return response.status_code
+        return await _measure(post, clients)
+
+
+def report(label, clients, result):
+    wall, latencies, statuses, worst_lag = result
+
+    latencies.sort()
+    errors = sum(status != 200 for status in statuses)
+    print(f"{clients:4d} clients  {label:5s} {wall:6.2f}s {clients / wall:7.1f} req/s  "
+          f"p50 {latencies[len(latencies) // 2] * 1000:6.0f} ms  p95 {latencies[int(len(latencies) * 0.95)] * 1000:6.0f} ms"
+          + (f"  loop stall {worst_lag * 1000:4.0f} ms" if label == 'asgi' else '')
+          + (f"  {errors} errors" if errors else ''))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, nargs='+', default=[50, 200, 500])
+    parser.add_argument('--latency', type=float, default=0.5, help="seconds per fake completion")
+    parser.add_argument('--threads', type=int, default=16, help="threads serving the Flask app")
+    parser.add_argument('--route', default='/chat', choices=['/chat', '/check_eligibility'])
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    app.gateway.llm = FakeModel(args.latency)
+    print(f"POST {args.route}, {args.latency}s per completion, Flask on {args.threads} threads")
+    # Every request gets a distinct prompt, so all of them reach the model
+    offset = 0
+    for clients in args.clients:
+        report('flask', clients, await run_flask(args.route, clients, offset, args.threads))
+        report('asgi', clients, await run_asgi(args.route, clients, offset + clients))
+        offset += 2 * clients
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
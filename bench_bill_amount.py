@@ -0,0 +1,75 @@
+"""Accuracy and throughput of the bill amount rules over the labelled fixtures.
+
+    python bench_bill_amount.py [--repeat N] [--gemini]
+
+Reports how many fixtures the rules answer, how many of those answers match the label,
+and the time per bill. --gemini also sends every fixture through the Gemini prompt that
+upload_bill() falls back to (needs GEMINI_API_KEY/GOOGLE_API_KEY) and reports the same
+numbers for it, so the two paths can be compared on the same bills.
+"""
+import argparse
+import json
+import os
+import time
+
+import bill_amount
+
+FIXTURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tests', 'fixtures', 'bill_texts.json')
+
+
+def _matches(amount, label):
+    if label is None:
+        return amount in (None, 0.0)
+    return amount is not None and abs(amount - label) < 0.005
+
+
+def bench_rules(fixtures, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        results = [bill_amount.extract_amount(f['text']) for f in fixtures]
+    seconds = (time.perf_counter() - started) / repeat
+    hits = [(f, amount) for f, (amount, confidence, _) in zip(fixtures, results)
+            if amount is not None and confidence >= bill_amount.BILL_RULES_MIN_CONFIDENCE]
+    correct = sum(_matches(amount, f['amount']) for f, amount in hits)
+    print(f"rules:  answered {len(hits)}/{len(fixtures)}, correct {correct}/{len(hits)}, "
+          f"{seconds / len(fixtures) * 1e6:.1f} µs/bill ({len(fixtures) / seconds:.0f} bills/s)")
+    return {f['name']: amount for f, amount in hits}
+
+
+def bench_gemini(fixtures, rule_answers):
+    import structured_output
+    from app import bill_amount_prompt, llm
+
+    correct, agree, seconds = 0, 0, []
+    for f in fixtures:
+        started = time.perf_counter()
+        try:
+            response = llm.invoke(bill_amount_prompt(f['text'], f['bill_type']))
+            amount = structured_output.parse(response.content, structured_output.BILL_AMOUNT)['amount']
+        except Exception as e:
+            print(f"  {f['name']}: {e}")
+            amount = None
+        seconds.append(time.perf_counter() - started)
+        correct += _matches(amount, f['amount'])
+        if f['name'] in rule_answers:
+            agree += _matches(amount, rule_answers[f['name']])
+    seconds.sort()
+    print(f"gemini: correct {correct}/{len(fixtures)}, agrees with the rules on {agree}/{len(rule_answers)}, "
+          f"median {seconds[len(seconds) // 2] * 1000:.0f} ms/bill, max {seconds[-1] * 1000:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=2000, help="passes over the fixtures when timing the rules")
+    parser.add_argument('--gemini', action='store_true', help="also run the Gemini fallback on every fixture")
+    args = parser.parse_args()
+
+    with open(FIXTURES_PATH, encoding='utf-8') as f:
+        fixtures = json.load(f)
+    rule_answers = bench_rules(fixtures, args.repeat)
+    if args.gemini:
+        bench_gemini(fixtures, rule_answers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Dashboard analysis time for one user's bills: per-row Python loops vs bill_analytics.
+
+    python bench_bill_analytics.py [--sizes 10000 100000 1000000]
+
+The baseline is the per-type loop analyze_bills() ran before bill_analytics
+(strptime per row, a dict per month, sorted() for peak months, np.mean/np.average on
+lists). Both are given the same synthetic rows, the new path including the
+to_arrays() conversion, and must produce the same by_type results.
+"""
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+import bill_analytics
+
+BILL_TYPES = ['electricity', 'water', 'gas', 'phone', 'rent', 'other']
+
+
+def synthetic_rows(count, rng):
+    start = date(2015, 1, 1)
+    rows = [(rng.choice(BILL_TYPES), round(rng.uniform(50, 5000), 2),
+             (start + timedelta(days=rng.randrange(3650))).isoformat()) for _ in range(count)]
+    # The order SELECT_USER_BILLS returns them in
+    rows.sort(key=lambda row: (row[0], row[2]))
+    return rows
+
+
+def legacy_by_type(bills):
+    """analyze_bills()'s per-type analysis before the NumPy rewrite."""
+    bills_by_type = {}
+    for bt, amount, bill_date in bills:
+        bills_by_type.setdefault(bt, []).append((amount, bill_date))
+
+    analysis_by_type = {}
+    for bt, bill_data in bills_by_type.items():
+        amounts = [data[0] for data in bill_data]
+        dates = [datetime.strptime(data[1], '%Y-%m-%d') for data in bill_data]
+
+        monthly_avg = np.mean(amounts) if amounts else 0
+        monthly_sums = {}
+        for bill_date, amount in zip(dates, amounts):
+            month_key = bill_date.strftime('%Y-%m')
+            monthly_sums[month_key] = monthly_sums.get(month_key, 0) + amount
+        sorted_months = sorted(monthly_sums.items(), key=lambda x: x[1], reverse=True)[:3]
+        peak_months = [f"{month} (₹{amount:.2f})" for month, amount in sorted_months]
+
+        future_prediction = monthly_avg
+        if len(amounts) > 3:
+            future_prediction = np.average(amounts[-3:], weights=np.array([0.2, 0.3, 0.5])) * 1.05
+
+        analysis_by_type[bt] = {
+            "monthly_average": round(monthly_avg, 2),
+            "peak_months": peak_months,
+            "future_prediction": round(future_prediction, 2),
+            "savings_tips": bill_analytics.savings_tips(bt, monthly_avg, max(amounts)),
+            "total_bills": len(amounts),
+            "trend": {
+                "labels": [d.strftime('%Y-%m') for d in dates],
+                "amounts": amounts
+            }
+        }
+    return analysis_by_type
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    args = parser.parse_args()
+    rng = random.Random(8)
+
+    for size in args.sizes:
+        rows = synthetic_rows(size, rng)
+        legacy, legacy_seconds = timed(legacy_by_type, rows)
+        new, new_seconds = timed(lambda: bill_analytics.analyze(*bill_analytics.to_arrays(rows)))
+        for bt, expected in legacy.items():
+            got = new['by_type'][bt]
+            assert got['peak_months'] == expected['peak_months'], bt
+            assert got['trend'] == expected['trend'], bt
+            for field in ('monthly_average', 'future_prediction', 'total_bills', 'savings_tips'):
+                assert got[field] == expected[field], (bt, field)
+        print(f"{size:8d} bills  loops {legacy_seconds * 1000:8.1f} ms   numpy {new_seconds * 1000:7.1f} ms   "
+              f"{legacy_seconds / new_seconds:5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Dashboard precompute throughput on synthetic users.
+
+    python bench_bill_cache.py [--users 100000] [--bills-per-user 20] [--workers N] [--sample 2000]
+
+Fills a temporary users.db with --users users, then compares computing dashboards the
+way /analyze_bills did on demand, one user at a time with bill_cache.refresh() (timed on
+--sample users and reported as users/s), against precompute_all() walking every user in
+chunked ranges across the process pool.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+import bill_cache
+import db
+
+BILL_TYPES = ['electricity', 'water', 'gas', 'phone']
+
+
+def fill(users, bills_per_user, rng, batch_users=5000):
+    start = date(2022, 1, 1)
+    for first in range(1, users + 1, batch_users):
+        bills = [(user_id, rng.choice(BILL_TYPES), round(rng.uniform(50, 3000), 2),
+                  (start + timedelta(days=rng.randrange(730))).isoformat())
+                 for user_id in range(first, min(first + batch_users, users + 1))
+                 for _ in range(bills_per_user)]
+        db.transaction(lambda conn: db.insert_bills(conn, bills))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--bills-per-user', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--chunk-size', type=int, default=bill_cache.CHUNK_SIZE)
+    parser.add_argument('--sample', type=int, default=2000, help="users timed for the one-at-a-time baseline")
+    args = parser.parse_args()
+    rng = random.Random(9)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.pool = db.ConnectionPool(os.path.join(tmp, 'users.db'))
+        db.init_db()
+        started = time.perf_counter()
+        fill(args.users, args.bills_per_user, rng)
+        print(f"filled {args.users} users x {args.bills_per_user} bills in {time.perf_counter() - started:.1f}s")
+
+        sample = rng.sample(range(1, args.users + 1), min(args.sample, args.users))
+        started = time.perf_counter()
+        for user_id in sample:
+            bill_cache.refresh(user_id)
+        seconds = time.perf_counter() - started
+        rate = len(sample) / seconds
+        print(f"one user at a time: {rate:8.0f} users/s ({args.users / rate:.1f}s projected for {args.users} users)")
+
+        users, seconds = bill_cache.precompute_all(workers=args.workers, chunk_size=args.chunk_size)
+        print(f"precompute_all:     {users / seconds:8.0f} users/s ({users} users in {seconds:.1f}s, "
+              f"{args.workers} workers, chunks of {args.chunk_size})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Build time, memory and query latency of the branch directory on synthetic branches.
+
+    python bench_branch_index.py [--branches 150000] [--queries 2000] [--scan-queries 100]
+
+Writes a synthetic IFSC-style CSV with branches spread over India's bounding box, loads
+it with BranchIndex.load() and times k-nearest, radius and district queries against a
+brute-force haversine scan over every branch (what a query costs without the grid).
+"""
+import argparse
+import csv
+import os
+import random
+import resource
+import tempfile
+import time
+
+import numpy as np
+
+import branch_index
+
+STATES = ['Karnataka', 'Maharashtra', 'Tamil Nadu', 'Uttar Pradesh', 'Bihar', 'Rajasthan', 'Odisha', 'Assam']
+BANKS = ['State Bank of India', 'Canara Bank', 'Bank of Baroda', 'Punjab National Bank', 'Union Bank of India']
+
+
+def write_branches(path, count, rng):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['BANK', 'IFSC', 'BRANCH', 'ADDRESS', 'CITY', 'STATE', 'LATITUDE', 'LONGITUDE', 'LOCKER'])
+        for i in range(count):
+            state = STATES[i % len(STATES)]
+            district = f"District {i % 700}"
+            writer.writerow([rng.choice(BANKS), f"SBIN{i:07d}", f"Branch {i}", f"Village {i % 5000}, {district}",
+                             district, state, round(rng.uniform(8, 35), 6), round(rng.uniform(68, 97), 6),
+                             'yes' if rng.random() < 0.3 else 'no'])
+
+
+def brute_force(index, lat, lng, k, radius_km=None, lockers_only=False):
+    dists = branch_index.haversine_km(lat, lng, index.lats, index.lngs)
+    if lockers_only:
+        dists = np.where(index.has_locker, dists, np.inf)
+    if radius_km:
+        dists = np.where(dists <= radius_km, dists, np.inf)
+    candidates = np.flatnonzero(np.isfinite(dists))
+    return candidates[np.argsort(dists[candidates], kind='stable')[:k]].tolist()
+
+
+def timed(fn, points):
+    started = time.perf_counter()
+    for lat, lng in points:
+        fn(lat, lng)
+    return (time.perf_counter() - started) / len(points) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--branches', type=int, default=150000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--scan-queries', type=int, default=100, help="queries for the slow full scan")
+    args = parser.parse_args()
+    rng = random.Random(5)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'branches.csv')
+        write_branches(path, args.branches, rng)
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        started = time.perf_counter()
+        index = branch_index.BranchIndex.load(path)
+        build = time.perf_counter() - started
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"build: {len(index)} branches from CSV in {build:.2f}s; "
+          f"peak RSS grew by {(rss_after - rss_before) / 1024:.0f} MB")
+
+    points = [(rng.uniform(8, 35), rng.uniform(68, 97)) for _ in range(args.queries)]
+    # The grid must return the same branches as the full scan
+    for lat, lng in points[:50]:
+        expected = [index.branches[i]['ifsc'] for i in brute_force(index, lat, lng, 5)]
+        assert [b['ifsc'] for b in index.nearest(lat, lng, k=5)] == expected
+
+    cases = [
+        ("nearest k=5", lambda lat, lng: index.nearest(lat, lng, k=5), lambda lat, lng: brute_force(index, lat, lng, 5)),
+        ("lockers k=5", lambda lat, lng: index.nearest(lat, lng, k=5, lockers_only=True),
+         lambda lat, lng: brute_force(index, lat, lng, 5, lockers_only=True)),
+        ("within 10 km", lambda lat, lng: index.within(lat, lng, 10),
+         lambda lat, lng: brute_force(index, lat, lng, len(index), radius_km=10)),
+    ]
+    for label, grid, scan in cases:
+        print(f"{label:13s} full scan {timed(scan, points[:args.scan_queries]):8.1f} µs   "
+              f"grid {timed(grid, points):8.1f} µs")
+
+    districts = [(f"Village {i}", f"District {i % 700}", STATES[i % len(STATES)]) for i in range(args.queries)]
+    started = time.perf_counter()
+    for location, district, state in districts:
+        index.in_district(location, district, state)
+    print(f"{'in_district':13s} {'':23s}grid {(time.perf_counter() - started) / len(districts) * 1e6:8.1f} µs")
+
+
+if __name__ == '__main__':
+    main()
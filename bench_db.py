@@ -0,0 +1,90 @@
+"""Bill writes per second under concurrent writers, before and after the pooled db layer.
+
+    python bench_db.py [--writers 32] [--bills 200]
+
+Each of --writers threads adds --bills bills. The baseline does what the routes did
+before db.py: sqlite3.connect('users.db'), INSERT, commit and close for every bill, in
+the default rollback-journal mode. The pooled run calls db.add_bill(), which also
+updates the monthly rollup and the bill_activity version in the same transaction.
+Both run against fresh databases in a temporary directory; 'database is locked' and
+other failures are counted rather than retried by the benchmark.
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import db
+
+CREATE_BILLS = '''
+    CREATE TABLE IF NOT EXISTS bills (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        bill_type TEXT NOT NULL,
+        amount REAL NOT NULL,
+        bill_date TEXT NOT NULL,
+        file_path TEXT
+    )
+'''
+
+
+def connect_per_write(path, user_id, bill_type, amount, bill_date):
+    conn = sqlite3.connect(path)
+    c = conn.cursor()
+    c.execute(db.INSERT_BILL, (user_id, bill_type, amount, bill_date, None))
+    conn.commit()
+    conn.close()
+
+
+def pooled(path, user_id, bill_type, amount, bill_date):
+    db.add_bill(user_id, bill_type, amount, bill_date)
+
+
+def run(write, path, writers, bills):
+    failures = []
+
+    def writer(number):
+        for i in range(bills):
+            try:
+                write(path, number + 1, ('electricity', 'water', 'gas')[i % 3], 100.0 + i, f"2024-{i % 12 + 1:02d}-15")
+            except sqlite3.Error as e:
+                failures.append(str(e))
+
+    threads = [threading.Thread(target=writer, args=(number,)) for number in range(writers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+    stored = sqlite3.connect(path).execute('SELECT COUNT(*) FROM bills').fetchone()[0]
+    return stored, len(failures), seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writers', type=int, default=32)
+    parser.add_argument('--bills', type=int, default=200, help="bills per writer")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        baseline_path = os.path.join(tmp, 'baseline.db')
+        conn = sqlite3.connect(baseline_path)
+        conn.execute(CREATE_BILLS)
+        conn.close()
+
+        pooled_path = os.path.join(tmp, 'pooled.db')
+        db.pool = db.ConnectionPool(pooled_path)
+        db.init_db()
+
+        for label, write, path in (("connect per write", connect_per_write, baseline_path),
+                                   ("pooled db.add_bill", pooled, pooled_path)):
+            stored, failed, seconds = run(write, path, args.writers, args.bills)
+            print(f"{label:18s} {args.writers} writers: {stored} bills in {seconds:.2f}s "
+                  f"({stored / seconds:.0f} writes/s), {failed} failed")
+
+
+if __name__ == '__main__':
+    main()
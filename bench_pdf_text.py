@@ -0,0 +1,81 @@
+"""Time and peak RSS of PDF text extraction: every page vs pdf_text's early stop.
+
+    python bench_pdf_text.py [--pages 200] [--scanned 40] [--repeat 3]
+
+Builds two documents by replicating the bundled rental_agreement.pdf: a --pages page
+statement, and the same with --scanned font-less (image-only) pages in front. The
+baseline concatenates extract_text() of every page as analyze_document() and
+upload_bill() did, then keeps the first PDF_CHAR_BUDGET characters; the new path is
+pdf_text.extract_text(). Each run happens in a fresh process so its peak RSS is its own.
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+import PyPDF2
+
+import pdf_text
+
+SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rental_agreement.pdf')
+
+
+def build_corpus(directory, pages, scanned):
+    source = PyPDF2.PdfReader(SOURCE)
+    paths = {}
+    for label, blanks in (('statement', 0), ('scanned first', scanned)):
+        writer = PyPDF2.PdfWriter()
+        width, height = source.pages[0].mediabox.width, source.pages[0].mediabox.height
+        for _ in range(blanks):
+            writer.add_blank_page(width=width, height=height)
+        for number in range(pages):
+            writer.add_page(source.pages[number % len(source.pages)])
+        paths[label] = os.path.join(directory, f"{label.replace(' ', '_')}.pdf")
+        with open(paths[label], 'wb') as f:
+            writer.write(f)
+    return paths
+
+
+def every_page(path):
+    content = ""
+    with open(path, 'rb') as f:
+        for page in PyPDF2.PdfReader(f).pages:
+            content += page.extract_text() or ""
+    return content[:pdf_text.PDF_CHAR_BUDGET]
+
+
+def budgeted(path):
+    with open(path, 'rb') as f:
+        return pdf_text.extract_text(f)
+
+
+def measure(method, path, repeat):
+    extract = {'every page': every_page, 'pdf_text': budgeted}[method]
+    started = time.perf_counter()
+    for _ in range(repeat):
+        text = extract(path)
+    seconds = (time.perf_counter() - started) / repeat
+    return seconds, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, len(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--scanned', type=int, default=40, help="image-only pages in front of the second document")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, path in build_corpus(tmp, args.pages, args.scanned).items():
+            print(f"{label}: {os.path.getsize(path) / 2**20:.1f} MB")
+            for method in ('every page', 'pdf_text'):
+                with context.Pool(1) as workers:
+                    seconds, rss_kb, chars = workers.apply(measure, (method, path, args.repeat))
+                print(f"  {method:10s} {seconds * 1000:8.1f} ms  peak RSS {rss_kb / 1024:6.1f} MB  {chars} chars")
+
+
+if __name__ == '__main__':
+    main()
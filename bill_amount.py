@@ -0,0 +1,111 @@
+"""Rule-based bill amount extraction for common Indian bill layouts.
+
+Looks for the payable-amount field ("Total Amount Payable", "Net Amount Due",
+"कुल राशि", ...) and scores each hit by how reliably that label names the final amount,
+boosted when the label is the one the detected biller (BESCOM, MSEDCL, BSNL/Jio and
+other telecoms, LPG distributors, water boards) actually prints. upload_bill() only
+asks Gemini when the best score is below BILL_RULES_MIN_CONFIDENCE.
+"""
+import os
+import re
+
+BILL_RULES_MIN_CONFIDENCE = float(os.getenv('BILL_RULES_MIN_CONFIDENCE', 0.8))
+MAX_AMOUNT = 10_000_000
+
+_DEVANAGARI_DIGITS = str.maketrans('०१२३४५६७८९', '0123456789')
+
+# Label text, then up to a short run of non-digits on the same line (": Rs.", "(in ₹) -") or
+# the amount alone on the next line. Amounts followed by / or - and a digit are dates.
+_GAP = r'(?P<gap>[^\d\n]{0,30}?(?:\n\s*)?)'
+# "Amount payable after due date", "with late fee": not what is owed today
+_LATE_AMOUNT = re.compile(r'after|late|surcharge|बाद', re.IGNORECASE)
+_AMOUNT = r'(?P<currency>₹|rs\.?|inr|रु\.?|रुपये)?\s*(?P<amount>[0-9०-९][0-9०-९,]*(?:\.[0-9०-९]{1,2})?)(?![0-9०-९]|[/\-][0-9])'
+
+# How reliably each label names the final payable amount
+GENERIC_LABELS = {
+    r'total\s+amount\s+payable': 0.9,
+    r'net\s+amount\s+payable': 0.9,
+    r'amount\s+payable': 0.85,
+    r'(?:total|net)\s+payable': 0.85,
+    r'कुल\s+देय\s+राशि': 0.9,
+    r'देय\s+राशि': 0.85,
+    r'कुल\s+राशि': 0.85,
+    r'ಪಾವತಿಸಬೇಕಾದ\s+ಮೊತ್ತ': 0.85,
+    r'ಒಟ್ಟು\s+ಮೊತ್ತ': 0.8,
+    r'(?:total|net)\s+amount\s+due': 0.8,
+    r'amount\s+due': 0.75,
+    r'rounded\s+bill\s+amount': 0.75,
+    r'grand\s+total': 0.75,
+    r'bill\s+amount': 0.7,
+    r'net\s+amount': 0.7,
+    r'total\s+due': 0.7,
+    r'total\s+amount': 0.65,
+}
+
+# Biller detection, and the GENERIC_LABELS that biller uses for the final amount
+LAYOUTS = {
+    'bescom': (r'bescom|bangalore\s+electricity', [r'(?:total|net)\s+amount\s+due', r'total\s+amount\s+payable']),
+    'msedcl': (r'msedcl|mahavitaran|maharashtra\s+state\s+electricity',
+               [r'rounded\s+bill\s+amount', r'bill\s+amount', r'amount\s+payable']),
+    'water': (r'water\s+supply|jal\s+board|bwssb|municipal|water\s+charges|जल\s+बिल|पानी',
+              [r'total\s+amount\s+payable', r'(?:total|net)\s+payable', r'amount\s+due']),
+    'telecom': (r'\bbsnl\b|bharat\s+sanchar|\bjio\b|airtel|vodafone',
+                [r'(?:total|net)\s+amount\s+due', r'amount\s+due', r'amount\s+payable']),
+    'lpg': (r'\blpg\b|indane|hp\s+gas|bharat\s*gas|cash\s+memo',
+            [r'total\s+amount', r'(?:total|net)\s+payable', r'grand\s+total']),
+}
+LAYOUT_BOOST = 0.15
+CURRENCY_BOOST = 0.05
+CONFLICT_PENALTY = 0.2
+
+_LABEL_PATTERNS = [
+    (label, weight, re.compile(r'(?<![a-z])' + label + _GAP + _AMOUNT, re.IGNORECASE))
+    for label, weight in GENERIC_LABELS.items()
+]
+_LAYOUT_PATTERNS = {
+    name: (re.compile(detect, re.IGNORECASE), set(labels)) for name, (detect, labels) in LAYOUTS.items()
+}
+
+
+def _parse_amount(text):
+    try:
+        amount = float(text.translate(_DEVANAGARI_DIGITS).replace(',', ''))
+    except ValueError:
+        return None
+    return amount if 0 < amount < MAX_AMOUNT else None
+
+
+def detect_layout(text):
+    for name, (detect, _) in _LAYOUT_PATTERNS.items():
+        if detect.search(text):
+            return name
+    return None
+
+
+def extract_amount(text):
+    """Return (amount, confidence, layout); amount is None when no payable field is found."""
+    layout = detect_layout(text)
+    preferred = _LAYOUT_PATTERNS[layout][1] if layout else set()
+
+    candidates = []
+    for label, weight, pattern in _LABEL_PATTERNS:
+        for match in pattern.finditer(text):
+            amount = _parse_amount(match.group('amount'))
+            if amount is None or _LATE_AMOUNT.search(match.group('gap')):
+                continue
+            score = weight
+            if label in preferred:
+                score += LAYOUT_BOOST
+            if match.group('currency'):
+                score += CURRENCY_BOOST
+            candidates.append((min(score, 1.0), amount))
+
+    if not candidates:
+        return None, 0.0, layout
+
+    candidates.sort(key=lambda c: c[0], reverse=True)
+    confidence, amount = candidates[0]
+    # A different amount under a nearly as trusted label makes the pick doubtful
+    if any(other != amount and score >= confidence - 0.1 for score, other in candidates[1:]):
+        confidence -= CONFLICT_PENALTY
+    return amount, round(confidence, 2), layout
@@ -0,0 +1,94 @@
+import numpy as np
+
+import db
+
+FORECAST_WEIGHTS = np.array([0.2, 0.3, 0.5])
+PEAK_MONTHS = 3
+
+
+def to_arrays(rows):
+    """Column arrays from (bill_type, amount, bill_date) rows ordered by bill_type, bill_date."""
+    if not rows:
+        return np.empty(0, dtype=object), np.empty(0, dtype=np.float64), np.empty(0, dtype='U10')
+    types, amounts, dates = zip(*rows)
+    dates = np.array(dates, dtype='U10')
+    # Unpadded dates such as '2024-1-5' cannot be cast to datetime64
+    for i in np.flatnonzero(np.char.str_len(dates) != 10):
+        dates[i] = db.normalize_bill_date(dates[i])
+    return np.array(types, dtype=object), np.array(amounts, dtype=np.float64), dates
+
+
+def savings_tips(bill_type, monthly_avg, max_amount):
+    if bill_type == 'electricity' and monthly_avg > 1000:
+        return ["Your electricity bills are high. Use LED bulbs or solar lanterns to reduce costs."]
+    if bill_type == 'water' and max_amount > monthly_avg * 2:
+        return ["Unusually high water bill detected. Check for leaks or use rainwater harvesting."]
+    return [f"Track your {bill_type} bills regularly to identify saving opportunities."]
+
+
+def analyze(types, amounts, dates):
+    """Dashboard analysis for one user's bills.
+
+    Arrays must be grouped by bill type and date-ordered within each type (the order the
+    (user_id, bill_type, bill_date) index returns them in). Returns
+    {"by_type": ..., "category": {"labels", "amounts"}, "total_bills": n}.
+    """
+    n = len(amounts)
+    if not n:
+        return {"by_type": {}, "category": {"labels": [], "amounts": []}, "total_bills": 0}
+
+    # Segment boundaries of each bill type
+    starts = np.flatnonzero(np.r_[True, types[1:] != types[:-1]])
+    ends = np.r_[starts[1:], n]
+    counts = ends - starts
+    names = types[starts].tolist()
+    type_idx = np.repeat(np.arange(len(starts)), counts)
+
+    months = dates.astype('datetime64[M]')
+    month_ord = months.astype(np.int64)
+    first_month = month_ord.min()
+    span = int(month_ord.max() - first_month) + 1
+
+    # Per (type, month) totals and bill counts in one pass
+    cell = type_idx * span + (month_ord - first_month)
+    month_totals = np.bincount(cell, weights=amounts, minlength=len(starts) * span).reshape(-1, span)
+    month_counts = np.bincount(cell, minlength=len(starts) * span).reshape(-1, span)
+
+    type_totals = np.add.reduceat(amounts, starts)
+    monthly_avg = type_totals / counts
+    max_amount = np.maximum.reduceat(amounts, starts)
+
+    # Weighted moving average of the last three bills, for types with more than three
+    forecast = monthly_avg.copy()
+    recent = counts > 3
+    if recent.any():
+        last3 = amounts[ends[recent, None] - np.array([3, 2, 1])]
+        forecast[recent] = last3 @ FORECAST_WEIGHTS * 1.05
+
+    labels = months.astype(str)
+    month_names = (np.datetime64(int(first_month), 'M') + np.arange(span)).astype(str)
+
+    by_type = {}
+    for i, name in enumerate(names):
+        present = np.flatnonzero(month_counts[i])
+        totals = month_totals[i, present]
+        # Highest totals first, earlier month first on ties
+        peak = present[np.lexsort((present, -totals))[:PEAK_MONTHS]]
+        segment = slice(starts[i], ends[i])
+        by_type[name] = {
+            "monthly_average": round(float(monthly_avg[i]), 2),
+            "peak_months": [f"{month_names[m]} (₹{month_totals[i, m]:.2f})" for m in peak],
+            "future_prediction": round(float(forecast[i]), 2),
+            "savings_tips": savings_tips(name, monthly_avg[i], max_amount[i]),
+            "total_bills": int(counts[i]),
+            "trend": {
+                "labels": labels[segment].tolist(),
+                "amounts": amounts[segment].tolist()
+            }
+        }
+
+    return {
+        "by_type": by_type,
+        "category": {"labels": names, "amounts": [round(total, 2) for total in type_totals.tolist()]},
+        "total_bills": int(n)
+    }
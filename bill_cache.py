@@ -0,0 +1,134 @@
+"""Precomputed /analyze_bills dashboards.
+
+The batch job walks every user with bills in chunked user_id ranges across a process
+pool and stores each dashboard in bill_analysis_cache together with the user's
+bill_activity version. /analyze_bills serves the stored dashboard until a new bill
+bumps that version.
+
+Usage:  python bill_cache.py [--workers N] [--chunk-size N]
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+import bill_analytics
+import db
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1000
+
+
+def build_analysis(types, amounts, dates):
+    """The /analyze_bills 'all' payload for one user's bill arrays."""
+    result = bill_analytics.analyze(types, amounts, dates)
+    return {
+        "by_type": result['by_type'],
+        "graph_data": {"category": result['category']},
+        "total_bills": result['total_bills']
+    }
+
+
+def for_bill_type(analysis, bill_type):
+    """Narrow a cached 'all' dashboard to one bill type, or None if the user has none."""
+    if bill_type == 'all':
+        return analysis
+    bill_type = db.normalize_bill_type(bill_type)
+    if bill_type not in analysis['by_type']:
+        return None
+    type_analysis = analysis['by_type'][bill_type]
+    return {
+        "by_type": {bill_type: type_analysis},
+        "graph_data": analysis['graph_data'],
+        "total_bills": type_analysis['total_bills']
+    }
+
+
+def get_cached(user_id):
+    row = db.query_one(db.SELECT_FRESH_ANALYSIS, (user_id,))
+    return json.loads(row[0]) if row else None
+
+
+def refresh(user_id):
+    """Recompute and store one user's dashboard; returns it, or None if the user has no bills."""
+    def read(conn):
+        version = conn.execute(db.SELECT_BILL_VERSION, (user_id,)).fetchone()[0]
+        return conn.execute(db.SELECT_USER_BILLS, (user_id,)).fetchall(), version
+
+    rows, version = db.snapshot(read)
+    if not rows:
+        return None
+    analysis = build_analysis(*bill_analytics.to_arrays(rows))
+    db.execute(db.UPSERT_ANALYSIS, (user_id, json.dumps(analysis), version, time.time()))
+    return analysis
+
+
+def precompute_range(first_user, last_user):
+    """Compute and store dashboards for every user_id in [first_user, last_user]; returns the count."""
+    def read(conn):
+        versions = dict(conn.execute(db.SELECT_BILL_VERSIONS_IN_RANGE, (first_user, last_user)).fetchall())
+        return conn.execute(db.SELECT_BILLS_IN_RANGE, (first_user, last_user)).fetchall(), versions
+
+    rows, versions = db.snapshot(read)
+    # A user_id stored as text or a fraction is not a user a dashboard can be served to
+    rows = [row for row in rows if isinstance(row[0], int)]
+    if not rows:
+        return 0
+
+    user_ids = np.array([row[0] for row in rows], dtype=np.int64)
+    # to_arrays() pads legacy dates such as '2024-1-5' the way the live path does
+    types, amounts, dates = bill_analytics.to_arrays([row[1:] for row in rows])
+
+    starts = np.flatnonzero(np.r_[True, user_ids[1:] != user_ids[:-1]])
+    ends = np.r_[starts[1:], len(user_ids)]
+    computed_at = time.time()
+    entries = []
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        user_id = int(user_ids[start])
+        analysis = build_analysis(types[start:end], amounts[start:end], dates[start:end])
+        entries.append((user_id, json.dumps(analysis), versions.get(user_id, 0), computed_at))
+
+    db.transaction(lambda conn: conn.executemany(db.UPSERT_ANALYSIS, entries))
+    return len(entries)
+
+
+def precompute_all(workers=None, chunk_size=CHUNK_SIZE):
+    """Fill bill_analysis_cache for every user; returns (users, seconds)."""
+    started = time.perf_counter()
+    first_user, last_user = db.query_one(db.SELECT_BILL_USER_RANGE)
+    if first_user is None:
+        return 0, time.perf_counter() - started
+
+    ranges = [(lo, min(lo + chunk_size - 1, last_user)) for lo in range(first_user, last_user + 1, chunk_size)]
+    users = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(precompute_range, lo, hi): (lo, hi) for lo, hi in ranges}
+        for future in as_completed(futures):
+            lo, hi = futures[future]
+            try:
+                users += future.result()
+            except Exception as e:
+                logger.error(f"Failed to precompute dashboards for users {lo}-{hi}: {e}")
+    return users, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute /analyze_bills dashboards for every user.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="user_ids per task")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    db.init_db()
+    users, seconds = precompute_all(workers=args.workers, chunk_size=args.chunk_size)
+    rate = users / seconds if seconds else 0
+    logger.info(f"Precomputed {users} dashboards in {seconds:.1f}s ({rate:.0f} users/sec)")
+
+
+if __name__ == '__main__':
+    main()
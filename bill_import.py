@@ -0,0 +1,149 @@
+"""Bulk bill import from CSV or JSON-lines statements.
+
+Rows are validated with the same rules as /add_manual_bill and written in batched
+transactions; a bad row is reported and skipped without failing its batch. Used by the
+/import_bills endpoint and from the command line:
+
+    python bill_import.py statement.csv [--user-id N] [--batch-size N]
+
+Columns/keys: bill_type, amount, bill_date (YYYY-MM-DD, default today), user_id (optional).
+"""
+import argparse
+import csv
+import io
+import json
+import logging
+import math
+import time
+from datetime import datetime
+from functools import lru_cache
+
+import db
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 50000
+MAX_REPORTED_ERRORS = 100
+
+
+@lru_cache(maxsize=8192)
+def _padded_date(bill_date):
+    """bill_date as zero-padded YYYY-MM-DD (strptime also accepts '2024-1-5'), or None."""
+    try:
+        return datetime.strptime(bill_date, '%Y-%m-%d').strftime('%Y-%m-%d')
+    except ValueError:
+        return None
+
+
+def validate_bill(row, default_user_id=1):
+    """Return (user_id, bill_type, amount, bill_date) for a bill record or raise ValueError."""
+    if not isinstance(row, dict):
+        raise ValueError("Invalid record")
+    bill_type = row.get('bill_type') or 'other'
+    if not isinstance(bill_type, str):
+        raise ValueError("Invalid bill_type")
+    bill_type = bill_type.lower()
+
+    try:
+        amount = float(row.get('amount'))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid amount")
+    if not math.isfinite(amount):
+        # float() accepts 'nan' and 'inf', which would fail the whole batch's insert
+        raise ValueError("Invalid amount")
+    if amount <= 0:
+        raise ValueError("Amount must be a positive number")
+
+    bill_date = row.get('bill_date')
+    if not bill_date:
+        bill_date = datetime.now().strftime('%Y-%m-%d')
+    else:
+        bill_date = _padded_date(bill_date) if isinstance(bill_date, str) else None
+        if bill_date is None:
+            raise ValueError("Invalid date format. Use YYYY-MM-DD.")
+
+    user_id = row.get('user_id')
+    if user_id in (None, ''):
+        user_id = default_user_id
+    else:
+        try:
+            user_id = int(user_id)
+        except (ValueError, TypeError):
+            raise ValueError("Invalid user_id")
+
+    return user_id, bill_type, amount, bill_date
+
+
+def iter_records(stream, filename):
+    """Yield records from a binary CSV or JSON-lines stream without reading it all.
+
+    Unparseable JSON lines are yielded as None so they are reported with their row number.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if filename.lower().endswith('.csv'):
+        for record in csv.DictReader(text):
+            yield {(k or '').strip().lower(): v.strip() if isinstance(v, str) else v for k, v in record.items()}
+    else:
+        for line in text:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                yield None
+
+
+def import_bills(records, default_user_id=1, batch_size=BATCH_SIZE):
+    """Validate and insert bill records; returns {"imported", "failed", "errors", "seconds"}.
+
+    Row numbers in errors count records from 1 (the CSV header and blank lines are not counted).
+    """
+    started = time.perf_counter()
+    imported, failed, errors, batch = 0, 0, [], []
+
+    def flush():
+        nonlocal imported
+        if batch:
+            imported += db.transaction(lambda conn: db.insert_bills(conn, batch))
+            batch.clear()
+
+    for number, record in enumerate(records, start=1):
+        try:
+            batch.append(validate_bill(record, default_user_id))
+        except ValueError as e:
+            failed += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"row": number, "error": str(e)})
+            continue
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+
+    return {
+        "imported": imported,
+        "failed": failed,
+        "errors": errors,
+        "seconds": round(time.perf_counter() - started, 3)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import bills from a CSV or JSON-lines file.")
+    parser.add_argument('path')
+    parser.add_argument('--user-id', type=int, default=1, help="user_id for rows without one")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="rows per transaction")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    db.init_db()
+    with open(args.path, 'rb') as f:
+        result = import_bills(iter_records(f, args.path), args.user_id, args.batch_size)
+    for error in result['errors']:
+        logger.warning(f"Row {error['row']}: {error['error']}")
+    rate = result['imported'] / result['seconds'] if result['seconds'] else 0
+    logger.info(f"Imported {result['imported']} bills, {result['failed']} failed, "
+                f"in {result['seconds']}s ({rate:.0f} rows/sec)")
+
+
+if __name__ == '__main__':
+    main()
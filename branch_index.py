@@ -0,0 +1,233 @@
+import csv
+import json
+import logging
+import math
+import os
+import re
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BRANCH_DIRECTORY_PATH = os.getenv('BRANCH_DIRECTORY_PATH', 'data/bank_branches.csv')
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.19
+
+# Accepted column names in the branch dump, mapped to our field names
+FIELD_ALIASES = {
+    'bank': ['bank', 'bank_name', 'name'],
+    'branch': ['branch', 'branch_name'],
+    'address': ['address', 'branch_address'],
+    'district': ['district', 'city'],
+    'state': ['state'],
+    'ifsc': ['ifsc', 'ifsc_code'],
+    'lat': ['lat', 'latitude'],
+    'lng': ['lng', 'lon', 'long', 'longitude'],
+    'locker': ['locker', 'has_locker', 'locker_facility'],
+}
+
+
+def _normalize(text):
+    return re.sub(r'\s+', ' ', str(text or '')).strip().lower()
+
+
+def _field(row, name):
+    for alias in FIELD_ALIASES[name]:
+        if alias in row and row[alias] not in (None, ''):
+            return row[alias]
+    return None
+
+
+def haversine_km(lat, lng, lats, lngs):
+    lat1, lng1 = math.radians(lat), math.radians(lng)
+    lat2, lng2 = np.radians(lats), np.radians(lngs)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+class BranchIndex:
+    """In-memory bank branch directory with a uniform lat/lng grid for nearest/radius queries.
+
+    Branches are sorted by grid cell id so each cell is a contiguous slice found with
+    searchsorted; a query scans rings of cells outward from the query point and stops
+    once no unscanned cell can hold anything closer than the k-th hit.
+    """
+
+    def __init__(self, branches, cell_size=0.05):
+        self.cell_size = cell_size
+        self.n_cols = int(math.ceil(360 / cell_size))
+        branches = [b for b in branches if b.get('lat') is not None and b.get('lng') is not None]
+
+        lats = np.array([b['lat'] for b in branches], dtype=np.float64)
+        lngs = np.array([b['lng'] for b in branches], dtype=np.float64)
+        cell_ids = self._cell_ids(lats, lngs)
+        order = np.argsort(cell_ids, kind='stable')
+
+        self.branches = [branches[i] for i in order]
+        self.lats = lats[order]
+        self.lngs = lngs[order]
+        self.cell_ids = cell_ids[order]
+        self.has_locker = np.array([bool(b.get('locker')) for b in self.branches], dtype=bool)
+
+        by_district = {}
+        for i, b in enumerate(self.branches):
+            by_district.setdefault((_normalize(b.get('district')), _normalize(b.get('state'))), []).append(i)
+        self.by_district = {key: np.array(idx, dtype=np.int64) for key, idx in by_district.items()}
+
+    def __len__(self):
+        return len(self.branches)
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        """Build the index from a CSV or JSON/JSON-lines branch dump."""
+        with open(path, encoding='utf-8') as f:
+            if path.endswith('.csv'):
+                rows = list(csv.DictReader(f))
+            elif path.endswith('.jsonl'):
+                rows = [json.loads(line) for line in f if line.strip()]
+            else:
+                rows = json.load(f)
+
+        branches = []
+        for row in rows:
+            row = {k.strip().lower(): v for k, v in row.items()}
+            try:
+                lat, lng = float(_field(row, 'lat')), float(_field(row, 'lng'))
+            except (TypeError, ValueError):
+                continue
+            locker = _field(row, 'locker')
+            branches.append({
+                "bank": _field(row, 'bank') or '',
+                "branch": _field(row, 'branch') or '',
+                "address": _field(row, 'address') or '',
+                "district": _field(row, 'district') or '',
+                "state": _field(row, 'state') or '',
+                "ifsc": _field(row, 'ifsc') or '',
+                "lat": lat,
+                "lng": lng,
+                "locker": _normalize(locker) in ('1', 'true', 'yes', 'y') if isinstance(locker, str) else bool(locker),
+            })
+        return cls(branches, **kwargs)
+
+    def _cell(self, lat, lng):
+        return int((lat + 90) // self.cell_size), int((lng + 180) // self.cell_size)
+
+    def _cell_ids(self, lats, lngs):
+        rows = np.floor((lats + 90) / self.cell_size).astype(np.int64)
+        cols = np.floor((lngs + 180) / self.cell_size).astype(np.int64)
+        return rows * self.n_cols + cols
+
+    def _ring(self, row, col, r):
+        """Indices of branches in the square ring of cells at Chebyshev distance r."""
+        if r == 0:
+            cells = [(row, col)]
+        else:
+            cells = [(row - r, c) for c in range(col - r, col + r + 1)]
+            cells += [(row + r, c) for c in range(col - r, col + r + 1)]
+            cells += [(rw, col - r) for rw in range(row - r + 1, row + r)]
+            cells += [(rw, col + r) for rw in range(row - r + 1, row + r)]
+        ids = np.array([rw * self.n_cols + (c % self.n_cols) for rw, c in cells], dtype=np.int64)
+        starts = np.searchsorted(self.cell_ids, ids, side='left')
+        ends = np.searchsorted(self.cell_ids, ids, side='right')
+        slices = [np.arange(s, e) for s, e in zip(starts, ends) if e > s]
+        return np.concatenate(slices) if slices else np.empty(0, dtype=np.int64)
+
+    def _ring_km(self, lat, r):
+        """Lower bound on the distance from the query point to any cell beyond ring r."""
+        widest_lat = min(89.9, abs(lat) + (r + 1) * self.cell_size)
+        return r * self.cell_size * KM_PER_DEGREE * math.cos(math.radians(widest_lat))
+
+    def nearest(self, lat, lng, k=5, radius_km=None, lockers_only=False, max_km=300):
+        """Up to k branches nearest to (lat, lng), optionally within radius_km."""
+        limit_km = min(radius_km, max_km) if radius_km else max_km
+        row, col = self._cell(lat, lng)
+        idx = np.empty(0, dtype=np.int64)
+        dists = np.empty(0, dtype=np.float64)
+        r = 0
+        while True:
+            ring = self._ring(row, col, r)
+            if lockers_only and len(ring):
+                ring = ring[self.has_locker[ring]]
+            if len(ring):
+                idx = np.concatenate([idx, ring])
+                dists = np.concatenate([dists, haversine_km(lat, lng, self.lats[ring], self.lngs[ring])])
+            bound = self._ring_km(lat, r)
+            if bound >= limit_km:
+                break
+            if len(idx) >= k and np.partition(dists, k - 1)[k - 1] <= bound:
+                break
+            r += 1
+
+        if radius_km:
+            keep = dists <= radius_km
+            idx, dists = idx[keep], dists[keep]
+        top = np.argsort(dists, kind='stable')[:k]
+        return [dict(self.branches[i], distance_km=round(float(d), 2)) for i, d in zip(idx[top], dists[top])]
+
+    def within(self, lat, lng, radius_km, lockers_only=False):
+        """All branches within radius_km of (lat, lng), nearest first."""
+        return self.nearest(lat, lng, k=len(self.branches), radius_km=radius_km, lockers_only=lockers_only)
+
+    def in_district(self, location, district, state, k=5, lockers_only=False):
+        """Branches in a district, nearest to the branch matching the village/town if any.
+
+        Returns (branches, center) or ([], None) when the directory has nothing there.
+        """
+        idx = self.by_district.get((_normalize(district), _normalize(state)))
+        if idx is None:
+            return [], None
+        if lockers_only:
+            idx = idx[self.has_locker[idx]]
+        if not len(idx):
+            return [], None
+
+        place = _normalize(location)
+        local = [i for i in idx if place and (place in _normalize(self.branches[i]['address'])
+                                              or place in _normalize(self.branches[i]['branch']))]
+        anchor = np.array(local, dtype=np.int64) if local else idx
+        center = {"lat": float(self.lats[anchor].mean()), "lng": float(self.lngs[anchor].mean())}
+
+        dists = haversine_km(center['lat'], center['lng'], self.lats[idx], self.lngs[idx])
+        top = np.argsort(dists, kind='stable')[:k]
+        return [dict(self.branches[i], distance_km=round(float(d), 2)) for i, d in zip(idx[top], dists[top])], center
+
+
+def to_bank(branch):
+    """Shape a directory entry like the bank objects the frontend already renders."""
+    name = branch['bank']
+    if branch.get('branch'):
+        name = f"{name} ({branch['branch']})"
+    return {
+        "name": name,
+        "address": branch.get('address') or f"{branch.get('district')}, {branch.get('state')}",
+        "lat": branch['lat'],
+        "lng": branch['lng']
+    }
+
+
+_index = None
+_loaded = False
+_load_lock = threading.Lock()
+
+
+def get_index():
+    """The branch directory, or None when no dump is configured; loaded on first use."""
+    global _index, _loaded
+    if _loaded:
+        return _index
+    # Concurrent first requests wait for one load instead of seeing None or building their own
+    with _load_lock:
+        if not _loaded:
+            index = None
+            if os.path.exists(BRANCH_DIRECTORY_PATH):
+                try:
+                    index = BranchIndex.load(BRANCH_DIRECTORY_PATH)
+                    logger.info(f"Loaded {len(index)} bank branches from {BRANCH_DIRECTORY_PATH}")
+                except Exception as e:
+                    logger.error(f"Failed to load branch directory {BRANCH_DIRECTORY_PATH}: {e}")
+            else:
+                logger.info(f"No branch directory at {BRANCH_DIRECTORY_PATH}; using external lookups")
+            _index = index
+            _loaded = True
+    return _index
@@ -5,12 +5,19 @@ from dotenv import load_dotenv
 import os
 import re
 import json
+import threading
 from datetime import datetime
 
-# Load environment variables
+# Load environment variables (before the modules below read their settings)
 load_dotenv()
+
+import intent_router
+import shop_db
+import sql_templates
+
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-DB_PATH = os.getenv("SQLITE_DB_PATH", "database.db")
+DB_PATH = shop_db.DB_PATH
+CHECKOUT_MAX_ITEMS = int(os.getenv("CHECKOUT_MAX_ITEMS", 200))
 
 # Configure Gemini API
 genai.configure(api_key=GEMINI_API_KEY)
@@ -18,30 +25,86 @@ model = genai.GenerativeModel("gemini-2.0-flash")
 
 app = Flask(__name__, template_folder="templates")
 
-def get_table_schema():
-    """Extract and return database schema."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    schema = {}
+SQL_PROMPT_RULES = """IMPORTANT RULES:
+1. Return ONLY the raw SQL query with no explanation or markdown.
+2. For INSERT, UPDATE, or DELETE operations, use parameterized queries with ? placeholders.
+3. For searching text fields, use LIKE with % wildcards (e.g., WHERE name LIKE '%value%').
+4. All customer names are stored in lowercase in the customers table.
+5. Join tables when necessary to fulfill the request.
+6. For listing all records, include a LIMIT 100 to avoid excessive results.
+7. When ordering results, use ORDER BY with an appropriate field.
+8. For bill creation, ALWAYS include the bill_date field with a ? placeholder.
+9. When inserting into bills table, always include customer_id, bill_date, total_amount, and payment_status.
+10. Use ISO format (YYYY-MM-DD HH:MM:SS) for dates.
+11. For stock insertions, product_name and price are REQUIRED. Quantity defaults to 0 if not provided.
+12. For stock queries (e.g., 'show all stock items'), include items with quantity=0 in the results.
+13. Stock item names are case-insensitive; check for existing items using LOWER(product_name).
+14. For customer phone number updates or insertions, ensure the phone number contains only numerical digits, up to 12 digits, ignoring spaces or symbols.
+15. For bill deletion, ensure the bill_id exists in the bills table.
+16. For viewing bill items, join bill_items, stocks, and bills to show item details and total amount.
+"""
+
+# Schema catalogue: loaded once per PRAGMA schema_version of DB_PATH
+_schema_lock = threading.Lock()
+_schema_catalogue = {"key": None, "schema": {}, "prompt_prefix": ""}
+
+def load_table_schema(cursor):
+    """Read the schema and foreign keys of every table from the database."""
+    schema, foreign_keys = {}, {}
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
+    for (table_name,) in cursor.fetchall():
+        cursor.execute(f"PRAGMA table_info({table_name});")
+        schema[table_name] = [
+            {"name": col[1], "type": col[2], "primary_key": bool(col[5]), "not_null": bool(col[3])}
+            for col in cursor.fetchall()
+        ]
+        cursor.execute(f"PRAGMA foreign_key_list({table_name});")
+        foreign_keys[table_name] = {fk[3]: f"{fk[2]}.{fk[4]}" for fk in cursor.fetchall()}
+    return schema, foreign_keys
+
+def render_schema_prompt(schema, foreign_keys):
+    """Compact one-line-per-table schema followed by the SQL rules, ready for the user query."""
+    lines = []
+    for table_name, columns in schema.items():
+        if table_name.startswith("sqlite_"):
+            continue
+        fields = []
+        for col in columns:
+            field = f"{col['name']} {col['type']}".strip()
+            if col["primary_key"]:
+                field += " PK"
+            elif col["not_null"]:
+                field += " NOT NULL"
+            if col["name"] in foreign_keys.get(table_name, {}):
+                field += f" -> {foreign_keys[table_name][col['name']]}"
+            fields.append(field)
+        lines.append(f"{table_name}({', '.join(fields)})")
+    return (
+        "Convert this natural language query into a valid SQLite SQL query.\n\n"
+        "DATABASE SCHEMA:\n" + "\n".join(lines) + "\n\n" + SQL_PROMPT_RULES + "USER QUERY:\n"
+    )
+
+def get_schema_catalogue():
+    """Cached schema and prompt prefix, reloaded only when PRAGMA schema_version changes."""
     try:
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        tables = cursor.fetchall()
-        
-        for table in tables:
-            table_name = table[0]
-            cursor.execute(f"PRAGMA table_info({table_name});")
-            columns = cursor.fetchall()
-            schema[table_name] = [
-                {"name": col[1], "type": col[2], "primary_key": bool(col[5]), "not_null": bool(col[3])}
-                for col in columns
-            ]
+        with shop_db.pool.connection() as conn:
+            key = (DB_PATH, conn.execute("PRAGMA schema_version;").fetchone()[0])
+            if _schema_catalogue["key"] == key:
+                return _schema_catalogue
+            with _schema_lock:
+                if _schema_catalogue["key"] != key:
+                    schema, foreign_keys = load_table_schema(conn.cursor())
+                    _schema_catalogue.update(
+                        key=key, schema=schema, prompt_prefix=render_schema_prompt(schema, foreign_keys)
+                    )
+            return _schema_catalogue
     except sqlite3.Error as e:
         print(f"Error getting schema: {e}")
-    finally:
-        conn.close()
-    
-    return schema
+        return {"key": None, "schema": {}, "prompt_prefix": render_schema_prompt({}, {})}
+
+def get_table_schema():
+    """Return the database schema (cached, see get_schema_catalogue)."""
+    return get_schema_catalogue()["schema"]
 
 def check_customer_exists(name):
     """Check if a customer with the given name already exists (case-insensitive)."""
@@ -208,62 +271,15 @@ def add_stock_item(product_name, price, quantity=None):
     finally:
         conn.close()
 
-def add_bill_item(bill_id, stock_id, quantity):
-    """Add an item to a bill with validation and stock checking."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+def add_bill_item(bill_id, stock, quantity):
+    """Add an item (stock ID or product name) to a bill with validation and stock checking.
     
+    The checks, stock decrement and inserts run in one BEGIN IMMEDIATE transaction.
+    """
     try:
-        # Verify bill exists
-        cursor.execute("SELECT id FROM bills WHERE id = ?", (bill_id,))
-        if not cursor.fetchone():
-            return None, [f"Bill ID {bill_id} does not exist."]
-        
-        # Get stock details
-        stock = get_stock_details(stock_id)
-        if not stock:
-            return None, [f"Stock ID {stock_id} does not exist."]
-        
-        product_name, available_quantity, price = stock
-
-
-        
-        
-        # Validate quantity
-        if not isinstance(quantity, int) or quantity <= 0:
-            return None, ["Quantity must be a positive integer."]
-        if available_quantity == 0:
-            return None, [f"No stock available for {product_name} (current quantity: 0)."]
-        if quantity > available_quantity:
-            return None, [f"Requested quantity ({quantity}) exceeds available stock ({available_quantity}) for {product_name}."]
-        
-        # Calculate total price
-        total_price = price * quantity
-        
-        # Insert bill item
-        cursor.execute(
-            "INSERT INTO bill_items (bill_id, stock_id, quantity, total_price) VALUES (?, ?, ?, ?)",
-            (bill_id, stock_id, quantity, total_price)
-        )
-        
-        # Update stock quantity
-        cursor.execute(
-            "UPDATE stocks SET quantity = quantity - ? WHERE id = ?",
-            (quantity, stock_id)
-        )
-        
-        # Update bill total_amount
-        cursor.execute(
-            "UPDATE bills SET total_amount = total_amount + ? WHERE id = ?",
-            (total_price, bill_id)
-        )
-        
-        conn.commit()
-        return cursor.lastrowid, None
+        return shop_db.transaction(lambda conn: shop_db.reserve_bill_item(conn, bill_id, stock, quantity))
     except sqlite3.Error as e:
         return None, [f"Error adding bill item: {str(e)}"]
-    finally:
-        conn.close()
 
 def query_db(query, params=()):
     """Execute a SQLite query and return results with column names."""
@@ -311,26 +327,7 @@ def query_db(query, params=()):
 
 def is_casual_query(user_input):
     """Check if the input appears to be casual conversation rather than a database query."""
-    casual_patterns = [
-        r'^(hi|hello|hey|howdy|greetings|good morning|good afternoon|good evening)(\s|$)',
-        r'^how are (you|u)(\s|$)',
-        r'^(thanks|thank you|thx|ty)(\s|$)',
-        r'^(bye|goodbye|see you|later|cya)(\s|$)',
-        r'^(what\'?s up|sup)(\s|$)'
-    ]
-    
-    for pattern in casual_patterns:
-        if re.search(pattern, user_input.lower()):
-            return True
-    
-    db_keywords = ['list', 'show', 'get', 'find', 'display', 'view', 'add', 'create', 'insert', 
-                  'update', 'change', 'modify', 'delete', 'remove', 'customer', 'bill', 'stock', 
-                  'payment', 'item', 'price', 'quantity', 'status', 'phone', 'name', 'amount']
-    
-    has_db_keyword = any(keyword in user_input.lower() for keyword in db_keywords)
-    
-    words = user_input.split()
-    return (len(words) < 3 and not has_db_keyword) or not has_db_keyword
+    return intent_router.route(user_input)[0] == 'casual'
 
 def handle_casual_query(user_input):
     """Generate a friendly response to casual conversation."""
@@ -350,10 +347,10 @@ def extract_parameters(user_input, sql_query):
     """Extract parameters from user input based on SQL query structure."""
     params = []
     
-    quoted_strings = re.findall(r'["\']([^"\']+)["\']', user_input)
-    numbers = re.findall(r'\b(\d+(?:\.\d+)?)\b', user_input)
-    dates = re.findall(r'\b(\d{1,2}[/-]\d{1,2}[/-]\d{2,4}|\d{4}[/-]\d{1,2}[/-]\d{1,2})\b', user_input)
-    status_values = re.findall(r'\b(paid|unpaid|pending|delivered|canceled|completed)\b', user_input.lower())
+    quoted_strings = re.findall(sql_templates.QUOTED_PATTERN, user_input)
+    numbers = re.findall(sql_templates.NUMBER_PATTERN, user_input)
+    dates = re.findall(sql_templates.DATE_PATTERN, user_input)
+    status_values = re.findall(sql_templates.STATUS_PATTERN, user_input.lower())
     
     potential_params = []
     potential_params.extend([s.lower() for s in quoted_strings])
@@ -382,42 +379,15 @@ def extract_parameters(user_input, sql_query):
     param_count = sql_query.count('?')
     return potential_params[:param_count]
 
-def preprocess_user_query(user_input):
-    """Process user query to handle special cases before generating SQL."""
-    bill_patterns = [
-        r'create (?:a )?(?:new )?bill for customer [\'""]?([a-zA-Z0-9\s]+)[\'""]?',
-        r'add (?:a )?(?:new )?bill for (?:customer )?[\'""]?([a-zA-Z0-9\s]+)[\'""]?',
-        r'generate (?:a )?(?:new )?bill for [\'""]?([a-zA-Z0-9\s]+)[\'""]?',
-        r'create (?:a )?(?:new )?bill for [\'""]?([a-zA-Z0-9\s]+)[\'""]?'
-    ]
-    
-    for pattern in bill_patterns:
-        match = re.search(pattern, user_input.lower())
-        if match:
-            customer_name = match.group(1).strip()
-            return {"special_action": "create_customer_and_bill", "customer_name": customer_name}
-    
-    bill_item_pattern = r'add (\d+)\s*(?:units of)?\s*([a-zA-Z\s]+)\s*to bill\s*(?:id\s*)?(\d+)'
-    match = re.search(bill_item_pattern, user_input.lower())
-    if match:
-        quantity = int(match.group(1))
-        product_name = match.group(2).strip()
-        bill_id = int(match.group(3))
-        return {
-            "special_action": "add_bill_item",
-            "quantity": quantity,
-            "product_name": product_name,
-            "bill_id": bill_id
-        }
+def generate_sql_query(user_input, routed=None):
+    """Use Gemini to convert natural language to SQLite query.
     
-    return {"special_action": None}
-
-def generate_sql_query(user_input):
-    """Use Gemini to convert natural language to SQLite query."""
-    preprocess_result = preprocess_user_query(user_input)
+    routed is the (intent, slots) of intent_router.route(user_input), if already known.
+    """
+    intent, slots = routed or intent_router.route(user_input)
     
-    if preprocess_result["special_action"] == "create_customer_and_bill":
-        customer_name = preprocess_result["customer_name"]
+    if intent == "create_bill":
+        customer_name = slots["customer_name"].strip()
         customer_id = check_customer_exists(customer_name)
         
         if not customer_id:
@@ -434,40 +404,9 @@ def generate_sql_query(user_input):
         
         return sql_query, params, None
     
-    if preprocess_result["special_action"] == "add_bill_item":
-        quantity = preprocess_result["quantity"]
-        product_name = preprocess_result["product_name"]
-        bill_id = preprocess_result["bill_id"]
-        
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        try:
-            cursor.execute("SELECT id FROM stocks WHERE LOWER(product_name) = LOWER(?)", (product_name,))
-            result = cursor.fetchone()
-            if not result:
-                return None, None, [f"Product '{product_name}' not found in stock."]
-            stock_id = result[0]
-        except sqlite3.Error as e:
-            return None, None, [f"Error finding stock item: {str(e)}"]
-        finally:
-            conn.close()
-        
-        bill_item_id, error = add_bill_item(bill_id, stock_id, quantity)
-        if error:
-            return None, None, error
-        
-        return (
-            "INSERT INTO bill_items (bill_id, stock_id, quantity, total_price) VALUES (?, ?, ?, ?)",
-            [bill_id, stock_id, quantity, 0.0],  # total_price updated by add_bill_item
-            None
-        )
-    
-    # Handle phone number update
-    phone_update_pattern = r'update (?:customer )?[\'""]?([a-zA-Z0-9\s]+)[\'""]?\s*phone\s*(?:number)?\s*to\s*([\d\s\-()+]+)'
-    match = re.search(phone_update_pattern, user_input.lower())
-    if match:
-        customer_name = match.group(1).strip()
-        phone = match.group(2).strip()
+    if intent == "update_phone":
+        customer_name = slots["customer_name"].strip()
+        phone = slots["phone"].strip()
         customer_id, error = update_customer_phone(customer_name, phone)
         if error:
             return None, None, error
@@ -479,10 +418,8 @@ def generate_sql_query(user_input):
         )
     
     # Handle bill deletion
-    bill_delete_pattern = r'delete (?:bill|invoice)\s*(?:id\s*)?(\d+)'
-    match = re.search(bill_delete_pattern, user_input.lower())
-    if match:
-        bill_id = int(match.group(1))
+    if intent == "delete_bill":
+        bill_id = int(slots["bill_id"])
         conn = sqlite3.connect(DB_PATH)
         cursor = conn.cursor()
         try:
@@ -498,10 +435,8 @@ def generate_sql_query(user_input):
             conn.close()
     
     # Handle customer deletion
-    delete_customer_pattern = r'delete (?:customer )?[\'""]?([a-zA-Z0-9\s]+)[\'""]?'
-    match = re.search(delete_customer_pattern, user_input.lower())
-    if match:
-        customer_name = match.group(1).strip()
+    if intent == "delete_customer":
+        customer_name = slots["customer_name"].strip()
         customer_id = check_customer_exists(customer_name)
         if not customer_id:
             return None, None, [f"Customer '{customer_name}' does not exist."]
@@ -510,12 +445,10 @@ def generate_sql_query(user_input):
         return sql_query, params, None
     
     # Handle stock creation
-    stock_pattern = r'(?:add|create)\s*(?:new)?\s*stock\s*(?:item)?\s*([a-zA-Z\s]+)(?:\s*with\s*price\s*\$?(\d+(?:\.\d+)?))?(?:\s*(?:and\s*quantity\s*(\d+)))?'
-    match = re.search(stock_pattern, user_input.lower())
-    if match:
-        product_name = match.group(1).strip()
-        price = float(match.group(2)) if match.group(2) else None
-        quantity = int(match.group(3)) if match.group(3) else 0
+    if intent == "create_stock":
+        product_name = slots["product_name"].strip()
+        price = float(slots["price"]) if slots["price"] else None
+        quantity = int(slots["quantity"]) if slots["quantity"] else 0
         
         # Check if stock item already exists
         stock_id = check_stock_exists(product_name)
@@ -542,11 +475,9 @@ def generate_sql_query(user_input):
             None
         )
     # Handle stock quantity update
-    add_stock_quantity_pattern = r'add\s*(\d+)\s*(?:units of)?\s*([a-zA-Z\s]+)\s*to\s*stock'
-    match = re.search(add_stock_quantity_pattern, user_input.lower())
-    if match:
-        quantity = int(match.group(1))
-        product_name = match.group(2).strip()
+    if intent == "add_stock":
+        quantity = int(slots["quantity"])
+        product_name = slots["product_name"].strip()
         
         stock_id = check_stock_exists(product_name)
         if not stock_id:
@@ -560,10 +491,8 @@ def generate_sql_query(user_input):
         return sql_query, params, None
     
     # Handle view bill items
-    view_bill_items_pattern = r'(?:view|show|list)\s*(?:bill\s*)?items\s*(?:of\s*)?(?:bill\s*)?(?:id\s*)?(\d+)'
-    match = re.search(view_bill_items_pattern, user_input.lower())
-    if match:
-        bill_id = int(match.group(1))
+    if intent == "view_bill_items":
+        bill_id = int(slots["bill_id"])
         conn = sqlite3.connect(DB_PATH)
         cursor = conn.cursor()
         try:
@@ -587,9 +516,7 @@ def generate_sql_query(user_input):
             conn.close()
     
     # Handle show all bills
-    show_bills_pattern = r'(?:show|list|display)\s*(?:all\s*)?bills'
-    match = re.search(show_bills_pattern, user_input.lower())
-    if match:
+    if intent == "show_bills":
         sql_query = """
             SELECT b.id AS bill_id, b.customer_id, c.name AS customer_name, 
                    b.bill_date, b.total_amount, b.payment_status
@@ -601,57 +528,22 @@ def generate_sql_query(user_input):
         params = []
         return sql_query, params, None
 
-    schema = get_table_schema()
-    schema_str = json.dumps(schema, indent=2)
-    
-    prompt = f"""
-    Convert this natural language query into a valid SQLite SQL query.
-    
-    DATABASE SCHEMA:
-    {schema_str}
-    
-    IMPORTANT RULES:
-    1. Return ONLY the raw SQL query with no explanation or markdown.
-    2. For INSERT, UPDATE, or DELETE operations, use parameterized queries with ? placeholders.
-    3. For searching text fields, use LIKE with % wildcards (e.g., WHERE name LIKE '%value%').
-    4. All customer names are stored in lowercase in the customers table.
-    5. Join tables when necessary to fulfill the request.
-    6. For listing all records, include a LIMIT 100 to avoid excessive results.
-    7. When ordering results, use ORDER BY with an appropriate field.
-    8. For bill creation, ALWAYS include the bill_date field with a ? placeholder.
-    9. When inserting into bills table, always include customer_id, bill_date, total_amount, and payment_status.
-    10. Use ISO format (YYYY-MM-DD HH:MM:SS) for dates.
-    11. For stock insertions, product_name and price are REQUIRED. Quantity defaults to 0 if not provided.
-    12. For stock queries (e.g., 'show all stock items'), include items with quantity=0 in the results.
-    13. Stock item names are case-insensitive; check for existing items using LOWER(product_name).
-    14. For customer phone number updates or insertions, ensure the phone number contains only numerical digits, up to 12 digits, ignoring spaces or symbols.
-    15. For bill deletion, ensure the bill_id exists in the bills table.
-    16. For viewing bill items, join bill_items, stocks, and bills to show item details and total amount.
-    USER QUERY:
-    {user_input.lower()}
-    """
+    catalogue = get_schema_catalogue()
     
     try:
-        response = model.generate_content(prompt)
-        sql_query = response.text.strip()
-        
-        sql_query = re.sub(r'```(?:sqlite|sql)?\n?', '', sql_query, flags=re.MULTILINE).strip()
-        
-        if not re.search(r'\b(SELECT|INSERT|UPDATE|DELETE)\b', sql_query, re.IGNORECASE):
-            print(f"Invalid SQL generated: {sql_query}")
-            return None, None, ["Generated query doesn't appear to be valid SQL."]
-        
-        dangerous_patterns = [
-            r'--',           # SQL comment
-            r'/\*.*?\*/',    # Multi-line comment
-            r';.*?;',        # Multiple statements
-            r'DROP\s+TABLE', # Drop table
-            r'DELETE\s+FROM\s+\w+\s*(?:WHERE\s+\d+\s*=\s*\d+|$)' # Delete all records
-        ]
+        sql_query = sql_templates.lookup(user_input, catalogue["key"], sql_name_kind)
+        cached = sql_query is not None
+        if not cached:
+            response = model.generate_content(catalogue["prompt_prefix"] + user_input.lower())
+            sql_query = response.text.strip()
+            
+            sql_query = re.sub(r'```(?:sqlite|sql)?\n?', '', sql_query, flags=re.MULTILINE).strip()
         
-        for pattern in dangerous_patterns:
-            if re.search(pattern, sql_query, re.IGNORECASE):
-                return None, None, ["Generated query contains potentially unsafe patterns."]
+        error = validate_generated_sql(sql_query)
+        if error:
+            return None, None, error
+        if not cached:
+            sql_templates.store(user_input, sql_query, catalogue["key"], sql_name_kind)
         
         # Validate phone number for UPDATE customers SET phone or INSERT INTO customers
         params = extract_parameters(user_input, sql_query)
@@ -706,6 +598,33 @@ def generate_sql_query(user_input):
         print(f"Gemini error for SQL parsing: {e}")
         return None, None, [f"Error generating SQL: {str(e)}"]
 
+def validate_generated_sql(sql_query):
+    """Return a list of errors if generated SQL is not a single safe statement, else None."""
+    if not re.search(r'\b(SELECT|INSERT|UPDATE|DELETE)\b', sql_query, re.IGNORECASE):
+        print(f"Invalid SQL generated: {sql_query}")
+        return ["Generated query doesn't appear to be valid SQL."]
+    
+    dangerous_patterns = [
+        r'--',           # SQL comment
+        r'/\*.*?\*/',    # Multi-line comment
+        r';.*?;',        # Multiple statements
+        r'DROP\s+TABLE', # Drop table
+        r'DELETE\s+FROM\s+\w+\s*(?:WHERE\s+\d+\s*=\s*\d+|$)' # Delete all records
+    ]
+    
+    for pattern in dangerous_patterns:
+        if re.search(pattern, sql_query, re.IGNORECASE):
+            return ["Generated query contains potentially unsafe patterns."]
+    return None
+
+def sql_name_kind(name):
+    """Slot type of an unquoted name for the translation cache: customer, product or None."""
+    if check_customer_exists(name):
+        return "customer"
+    if check_stock_exists(name):
+        return "product"
+    return None
+
 def handle_bill_creation(customer_name):
     """Create a new bill for a customer by name."""
     customer_id = check_customer_exists(customer_name)
@@ -806,69 +725,67 @@ def process_query():
         return jsonify({"status": "error", "message": "Query is empty"}), 400
 
     try:
-        if is_casual_query(user_input):
+        intent, slots = intent_router.route(user_input)
+        
+        if intent == "casual":
             casual_response = handle_casual_query(user_input)
             return jsonify({"status": "casual", "data": casual_response})
         
-        bill_creation_patterns = [
-            r'create (?:a )?(?:new )?bill for customer [\'""]?([a-zA-Z0-9\s]+)[\'""]?',
-            r'add (?:a )?(?:new )?bill for (?:customer )?[\'""]?([a-zA-Z0-9\s]+)[\'""]?',
-            r'generate (?:a )?(?:new )?bill for [\'""]?([a-zA-Z0-9\s]+)[\'""]?',
-            r'create (?:a )?(?:new )?bill for [\'""]?([a-zA-Z0-9\s]+)[\'""]?'
-        ]
-        
-        for pattern in bill_creation_patterns:
-            match = re.search(pattern, user_input.lower())
-            if match:
-                customer_name = match.group(1).strip()
-                bill_data, error = handle_bill_creation(customer_name)
-                
-                if error:
-                    return jsonify({"status": "error", "message": error[0]}), 400
-                
-                return jsonify({
-                    "status": "success",
-                    "message": f"Created bill for {customer_name}",
-                    "data": f"Bill #{bill_data['bill_id']} created for customer '{customer_name}' (ID: {bill_data['customer_id']}) on {bill_data['date']}.",
-                    "sql": "INSERT INTO bills (customer_id, bill_date, total_amount, payment_status) VALUES (?, ?, ?, ?)"
-                })
-        
-        customer_creation_patterns = [
-            r'create (?:a )?(?:new )?customer (?:named )?[\'""]?([a-zA-Z0-9\s]+)[\'""]?',
-            r'add (?:a )?(?:new )?customer (?:named )?[\'""]?([a-zA-Z0-9\s]+)[\'""]?',
-            r'insert (?:a )?(?:new )?customer (?:named )?[\'""]?([a-zA-Z0-9\s]+)[\'""]?'
-        ]
+        if intent == "create_bill":
+            customer_name = slots["customer_name"].strip()
+            bill_data, error = handle_bill_creation(customer_name)
+            
+            if error:
+                return jsonify({"status": "error", "message": error[0]}), 400
+            
+            return jsonify({
+                "status": "success",
+                "message": f"Created bill for {customer_name}",
+                "data": f"Bill #{bill_data['bill_id']} created for customer '{customer_name}' (ID: {bill_data['customer_id']}) on {bill_data['date']}.",
+                "sql": "INSERT INTO bills (customer_id, bill_date, total_amount, payment_status) VALUES (?, ?, ?, ?)"
+            })
         
-        for pattern in customer_creation_patterns:
-            match = re.search(pattern, user_input.lower())
-            if match:
-                customer_name = match.group(1).strip()
-                phone = match.group(2) if len(match.groups()) > 1 else None
-                valid, result = validate_phone_number(phone)
-                if not valid:
-                    return jsonify({"status": "error", "message": result[0]}), 400
-                customer_id = check_customer_exists(customer_name)
-                if customer_id:
-                    return jsonify({
-                        "status": "success",
-                        "message": f"Customer '{customer_name}' already exists with ID {customer_id}.",
-                        "data": f"Customer '{customer_name}' already exists with ID {customer_id}."
-                    }), 200
-                customer_id = get_or_create_customer(customer_name, phone)
-                if not customer_id:
-                    return jsonify({"status": "error", "message": "Failed to create customer."}), 400
+        if intent == "create_customer":
+            customer_name = slots["customer_name"].strip()
+            phone = slots.get("phone")
+            valid, result = validate_phone_number(phone)
+            if not valid:
+                return jsonify({"status": "error", "message": result[0]}), 400
+            customer_id = check_customer_exists(customer_name)
+            if customer_id:
                 return jsonify({
                     "status": "success",
-                    "message": f"Customer '{customer_name}' created with ID {customer_id}.",
-                    "data": f"Customer '{customer_name}' created with ID {customer_id}.",
-                    "sql": "INSERT INTO customers (name, phone) VALUES (?, ?)"
+                    "message": f"Customer '{customer_name}' already exists with ID {customer_id}.",
+                    "data": f"Customer '{customer_name}' already exists with ID {customer_id}."
                 }), 200
-            # Handle phone number update
-        phone_update_pattern = r'update (?:customer )?[\'""]?([a-zA-Z0-9\s]+)[\'""]?\s*phone\s*(?:number)?\s*to\s*([\d\s\-()+]+)'
-        match = re.search(phone_update_pattern, user_input.lower())
-        if match:
-            customer_name = match.group(1).strip()
-            phone = match.group(2).strip()
+            customer_id = get_or_create_customer(customer_name, phone)
+            if not customer_id:
+                return jsonify({"status": "error", "message": "Failed to create customer."}), 400
+            return jsonify({
+                "status": "success",
+                "message": f"Customer '{customer_name}' created with ID {customer_id}.",
+                "data": f"Customer '{customer_name}' created with ID {customer_id}.",
+                "sql": "INSERT INTO customers (name, phone) VALUES (?, ?)"
+            }), 200
+        
+        if intent == "add_bill_item":
+            quantity = int(slots["quantity"])
+            product_name = slots["product_name"].strip()
+            bill_id = int(slots["bill_id"])
+            bill_item_id, error = add_bill_item(bill_id, product_name, quantity)
+            if error:
+                return jsonify({"status": "error", "message": error[0]}), 400
+            return jsonify({
+                "status": "success",
+                "message": f"Added {quantity} x {product_name} to bill #{bill_id}.",
+                "data": f"Added {quantity} x {product_name} to bill #{bill_id} (item ID: {bill_item_id}).",
+                "sql": "INSERT INTO bill_items (bill_id, stock_id, quantity, total_price) VALUES (?, ?, ?, ?)"
+            })
+        
+        # Handle phone number update
+        if intent == "update_phone":
+            customer_name = slots["customer_name"].strip()
+            phone = slots["phone"].strip()
             customer_id, error = update_customer_phone(customer_name, phone)
             if error:
                 return jsonify({"status": "error", "message": error[0]}), 400
@@ -880,7 +797,7 @@ def process_query():
                 "sql": "UPDATE customers SET phone = ? WHERE id = ?"
             })
         
-        sql_query, params, error = generate_sql_query(user_input)
+        sql_query, params, error = generate_sql_query(user_input, (intent, slots))
         
         if error or not sql_query:
             return jsonify({
@@ -943,12 +860,72 @@ def process_query():
         print(f"Error processing query: {str(e)}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route('/checkout', methods=['POST'])
+def checkout():
+    """Bill a whole cart in one transaction.
+    
+    Body: {"customer": "ramesh", "phone": "98450 12345", "items": [{"product": "soap", "quantity": 2}, ...]},
+    or "bill_id" instead of "customer" to add to an existing bill. Items may also be [product, quantity] pairs.
+    """
+    data = request.get_json(silent=True) or {}
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        return jsonify({"status": "error", "message": "No items provided"}), 400
+    if len(items) > CHECKOUT_MAX_ITEMS:
+        return jsonify({"status": "error", "message": f"At most {CHECKOUT_MAX_ITEMS} items per checkout"}), 400
+    
+    cart = []
+    for item in items:
+        if isinstance(item, dict):
+            product_name, quantity = item.get('product') or item.get('product_name'), item.get('quantity')
+        elif isinstance(item, list) and len(item) == 2:
+            product_name, quantity = item
+        else:
+            return jsonify({"status": "error", "message": "Each item needs a product and a quantity."}), 400
+        if not product_name or not isinstance(product_name, str):
+            return jsonify({"status": "error", "message": "Each item needs a product name."}), 400
+        if isinstance(quantity, str) and quantity.strip().isdigit():
+            quantity = int(quantity)
+        cart.append((product_name, quantity))
+    
+    customer_name = (data.get('customer') or '').strip()
+    bill_id = data.get('bill_id')
+    if bill_id is None and not customer_name:
+        return jsonify({"status": "error", "message": "Provide a customer or a bill_id."}), 400
+    if bill_id is not None and (not isinstance(bill_id, int) or isinstance(bill_id, bool)):
+        return jsonify({"status": "error", "message": "bill_id must be an integer."}), 400
+    valid, phone = validate_phone_number(data.get('phone'))
+    if not valid:
+        return jsonify({"status": "error", "message": phone[0]}), 400
+    
+    try:
+        result, errors = shop_db.transaction(
+            lambda conn: shop_db.checkout(conn, cart, customer_name, phone, bill_id)
+        )
+    except sqlite3.Error as e:
+        print(f"Error during checkout: {e}")
+        return jsonify({"status": "error", "message": f"Database error during checkout: {str(e)}"}), 500
+    
+    if errors:
+        return jsonify({"status": "error", "message": errors[0], "errors": errors}), 400
+    
+    return jsonify({
+        "status": "success",
+        "message": f"Bill #{result['bill_id']} checked out with {len(result['items'])} items, total {result['total_amount']:.2f}.",
+        "data": result
+    })
+
 @app.route('/tables', methods=['GET'])
 def get_tables():
     """API endpoint to get database schema information."""
     schema = get_table_schema()
     return jsonify({"status": "success", "data": schema})
 
+@app.route('/translation_cache', methods=['GET'])
+def get_translation_cache():
+    """API endpoint to get NL-to-SQL translation cache statistics."""
+    return jsonify({"status": "success", "data": sql_templates.stats()})
+
 @app.errorhandler(404)
 def page_not_found(e):
     return jsonify({"status": "error", "message": "Requested resource not found"}), 404
@@ -0,0 +1,102 @@
+"""Single-pass intent routing for /query.
+
+The fast-path patterns of process_query() and generate_sql_query() are combined into one
+regex, with each intent as an alternative of the form .*?PATTERN anchored at the start of
+the input. The engine tries the alternatives in order, and each finds the leftmost match
+of its pattern, so the result is the same as running re.search with each pattern in turn
+and taking the first that matches. The match names the intent, and the pattern's named
+groups are the slots.
+
+Every pattern contains a trigger word ("bill", "stock", ...). The alternation is compiled
+once per set of trigger words present in the input and leaves out patterns that cannot
+match, so a question headed for the model is not scanned by every pattern.
+"""
+import re
+
+CASUAL_PATTERNS = [
+    r'(?:hi|hello|hey|howdy|greetings|good morning|good afternoon|good evening)(?:\s|$)',
+    r'how are (?:you|u)(?:\s|$)',
+    r'(?:thanks|thank you|thx|ty)(?:\s|$)',
+    r'(?:bye|goodbye|see you|later|cya)(?:\s|$)',
+    r'(?:what\'?s up|sup)(?:\s|$)'
+]
+
+DB_KEYWORDS = ['list', 'show', 'get', 'find', 'display', 'view', 'add', 'create', 'insert',
+               'update', 'change', 'modify', 'delete', 'remove', 'customer', 'bill', 'stock',
+               'payment', 'item', 'price', 'quantity', 'status', 'phone', 'name', 'amount']
+
+TRIGGERS = ('bill', 'customer', 'phone', 'delete', 'stock', 'item')
+
+NAME = r'[\'""]?(?P<customer_name>[a-zA-Z0-9\s]+)[\'""]?'
+
+# (intent, trigger, patterns) in the order the cascade used to try them; each pattern
+# can only match input containing its trigger
+INTENT_PATTERNS = [
+    ('create_bill', 'bill', [
+        r'create (?:a )?(?:new )?bill for customer ' + NAME,
+        r'add (?:a )?(?:new )?bill for (?:customer )?' + NAME,
+        r'generate (?:a )?(?:new )?bill for ' + NAME,
+        r'create (?:a )?(?:new )?bill for ' + NAME
+    ]),
+    ('create_customer', 'customer', [
+        r'create (?:a )?(?:new )?customer (?:named )?' + NAME,
+        r'add (?:a )?(?:new )?customer (?:named )?' + NAME,
+        r'insert (?:a )?(?:new )?customer (?:named )?' + NAME
+    ]),
+    ('update_phone', 'phone', [
+        r'update (?:customer )?' + NAME + r'\s*phone\s*(?:number)?\s*to\s*(?P<phone>[\d\s\-()+]+)'
+    ]),
+    ('add_bill_item', 'bill', [
+        r'add (?P<quantity>\d+)\s*(?:units of)?\s*(?P<product_name>[a-zA-Z\s]+)\s*to bill\s*(?:id\s*)?(?P<bill_id>\d+)'
+    ]),
+    ('delete_bill', 'delete', [r'delete (?:bill|invoice)\s*(?:id\s*)?(?P<bill_id>\d+)']),
+    ('delete_customer', 'delete', [r'delete (?:customer )?' + NAME]),
+    ('create_stock', 'stock', [
+        r'(?:add|create)\s*(?:new)?\s*stock\s*(?:item)?\s*(?P<product_name>[a-zA-Z\s]+)'
+        r'(?:\s*with\s*price\s*\$?(?P<price>\d+(?:\.\d+)?))?(?:\s*(?:and\s*quantity\s*(?P<quantity>\d+)))?'
+    ]),
+    ('add_stock', 'stock', [r'add\s*(?P<quantity>\d+)\s*(?:units of)?\s*(?P<product_name>[a-zA-Z\s]+)\s*to\s*stock']),
+    ('view_bill_items', 'item', [
+        r'(?:view|show|list)\s*(?:bill\s*)?items\s*(?:of\s*)?(?:bill\s*)?(?:id\s*)?(?P<bill_id>\d+)'
+    ]),
+    ('show_bills', 'bill', [r'(?:show|list|display)\s*(?:all\s*)?bills']),
+]
+
+_GROUP = re.compile(r'\(\?P<(\w+)>')
+_CASUAL = re.compile('|'.join(CASUAL_PATTERNS))
+_KEYWORDS = re.compile('|'.join(re.escape(keyword) for keyword in DB_KEYWORDS))
+_routers = {}
+
+
+def _compile(triggers):
+    alternatives, intents = [], []
+    for intent, trigger, patterns in INTENT_PATTERNS:
+        if trigger not in triggers:
+            continue
+        for pattern in patterns:
+            k = len(intents)
+            alternatives.append(f'(?P<r{k}>.*?' + _GROUP.sub(rf'(?P<r{k}_\1>', pattern) + ')')
+            intents.append((intent, [(slot, f'r{k}_{slot}') for slot in _GROUP.findall(pattern)]))
+    if not alternatives:
+        return None, intents
+    return re.compile('^(?:' + '|'.join(alternatives) + ')', re.DOTALL), intents
+
+
+def route(user_input):
+    """(intent, slots) for a query; intent is None when it should go to the model.
+
+    Slots are the raw matched strings (None for optional groups that did not match).
+    """
+    text = user_input.lower()
+    # Casual input: a greeting at the start, or no database keyword anywhere
+    if _CASUAL.match(text) or not _KEYWORDS.search(text):
+        return 'casual', {}
+    triggers = frozenset(trigger for trigger in TRIGGERS if trigger in text)
+    if triggers not in _routers:
+        _routers[triggers] = _compile(triggers)
+    router, intents = _routers[triggers]
+    match = router.match(text) if router is not None else None
+    if match is None:
+        return None, {}
+    intent, groups = intents[int(match.lastgroup[1:])]
+    return intent, {slot: match.group(group) for slot, group in groups}
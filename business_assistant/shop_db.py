@@ -0,0 +1,220 @@
+"""Pooled connections and write transactions for the shop database (customers, bills,
+stocks, bill_items)."""
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+DB_PATH = os.getenv("SQLITE_DB_PATH", "database.db")
+POOL_SIZE = int(os.getenv("SQLITE_DB_POOL_SIZE", 8))
+BUSY_RETRIES = 5
+
+SELECT_BILL = "SELECT id FROM bills WHERE id = ?"
+SELECT_STOCK_BY_ID = "SELECT id, product_name, quantity, price FROM stocks WHERE id = ?"
+SELECT_STOCK_BY_NAME = "SELECT id, product_name, quantity, price FROM stocks WHERE LOWER(product_name) = LOWER(?)"
+RESERVE_STOCK = "UPDATE stocks SET quantity = quantity - ? WHERE id = ? AND quantity >= ?"
+INSERT_BILL_ITEM = "INSERT INTO bill_items (bill_id, stock_id, quantity, total_price) VALUES (?, ?, ?, ?)"
+ADD_TO_BILL_TOTAL = "UPDATE bills SET total_amount = total_amount + ? WHERE id = ?"
+SELECT_CUSTOMER_BY_NAME = "SELECT id FROM customers WHERE LOWER(name) = LOWER(?)"
+INSERT_CUSTOMER = "INSERT INTO customers (name, phone) VALUES (?, ?)"
+UPDATE_CUSTOMER_PHONE = "UPDATE customers SET phone = ? WHERE id = ?"
+INSERT_BILL = "INSERT INTO bills (customer_id, bill_date, total_amount, payment_status) VALUES (?, ?, ?, ?)"
+SELECT_BILL_CUSTOMER = "SELECT customer_id, bill_date FROM bills WHERE id = ?"
+SELECT_BILL_TOTAL = "SELECT total_amount FROM bills WHERE id = ?"
+
+
+def _connect(path):
+    # isolation_level=None: writers issue BEGIN IMMEDIATE themselves so the stock check
+    # and the decrement happen under the write lock
+    conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False,
+                           cached_statements=128)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    return conn
+
+
+class ConnectionPool:
+    """Bounded pool of SQLite connections shared by the threads of one process."""
+
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self, timeout=30):
+        if self._pid != os.getpid():
+            # Connections must not be shared across a fork
+            self._reset()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return _connect(self.path)
+        return self._idle.get(timeout=timeout)
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+
+pool = ConnectionPool(DB_PATH)
+
+
+def _is_busy(error):
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+
+def transaction(fn):
+    """Run fn(conn) inside BEGIN IMMEDIATE ... COMMIT, retrying the whole unit while busy."""
+    for attempt in range(BUSY_RETRIES + 1):
+        try:
+            with pool.connection() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    result = fn(conn)
+                    conn.execute("COMMIT")
+                    return result
+                except BaseException:
+                    conn.rollback()
+                    raise
+        except sqlite3.OperationalError as e:
+            if not _is_busy(e) or attempt == BUSY_RETRIES:
+                raise
+            time.sleep(0.02 * (2 ** attempt) * (1 + random.random()))
+
+
+def reserve_bill_item(conn, bill_id, stock, quantity):
+    """Add quantity of a stock item (id, or product name) to a bill; call inside transaction().
+
+    Returns (bill_item_id, None) or (None, errors). The stock decrement is conditional on
+    enough quantity being left, so concurrent sales cannot oversell.
+    """
+    if not conn.execute(SELECT_BILL, (bill_id,)).fetchone():
+        return None, [f"Bill ID {bill_id} does not exist."]
+
+    if isinstance(stock, str):
+        row = conn.execute(SELECT_STOCK_BY_NAME, (stock,)).fetchone()
+        if not row:
+            return None, [f"Product '{stock}' not found in stock."]
+    else:
+        row = conn.execute(SELECT_STOCK_BY_ID, (stock,)).fetchone()
+        if not row:
+            return None, [f"Stock ID {stock} does not exist."]
+    stock_id, product_name, available_quantity, price = row
+
+    if not isinstance(quantity, int) or quantity <= 0:
+        return None, ["Quantity must be a positive integer."]
+    if available_quantity == 0:
+        return None, [f"No stock available for {product_name} (current quantity: 0)."]
+    if conn.execute(RESERVE_STOCK, (quantity, stock_id, quantity)).rowcount == 0:
+        return None, [f"Requested quantity ({quantity}) exceeds available stock ({available_quantity}) for {product_name}."]
+
+    total_price = price * quantity
+    bill_item_id = conn.execute(INSERT_BILL_ITEM, (bill_id, stock_id, quantity, total_price)).lastrowid
+    conn.execute(ADD_TO_BILL_TOTAL, (total_price, bill_id))
+    return bill_item_id, None
+
+
+def _stocks_by_name(conn, names):
+    placeholders = ", ".join("?" * len(names))
+    rows = conn.execute(
+        f"SELECT id, product_name, quantity, price FROM stocks WHERE LOWER(product_name) IN ({placeholders})",
+        names
+    ).fetchall()
+    stocks = {}
+    for row in rows:
+        stocks.setdefault(row[1].lower(), row)
+    return stocks
+
+
+def checkout(conn, items, customer_name=None, phone=None, bill_id=None):
+    """Bill a cart of (product_name, quantity) pairs; call inside transaction().
+
+    Adds to bill_id, or creates a pending bill for customer_name (creating the customer
+    if needed); a phone given for an existing customer replaces the stored one. Every
+    product is resolved in one query and all stock is checked before anything is
+    written, so the cart is billed completely or not at all.
+    Returns (result, None) or (None, errors).
+    """
+    cart, names = {}, {}
+    for product_name, quantity in items:
+        if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity <= 0:
+            return None, [f"Quantity for '{product_name}' must be a positive integer."]
+        key = product_name.strip().lower()
+        cart[key] = cart.get(key, 0) + quantity
+        # Errors name a product the way the caller first wrote it
+        names.setdefault(key, product_name.strip())
+
+    errors = []
+    stocks = _stocks_by_name(conn, list(cart))
+    for key, quantity in cart.items():
+        stock = stocks.get(key)
+        if not stock:
+            errors.append(f"Product '{names[key]}' not found in stock.")
+        elif stock[2] == 0:
+            errors.append(f"No stock available for {stock[1]} (current quantity: 0).")
+        elif quantity > stock[2]:
+            errors.append(f"Requested quantity ({quantity}) exceeds available stock ({stock[2]}) for {stock[1]}.")
+
+    customer_id = bill_date = None
+    if bill_id is not None:
+        row = conn.execute(SELECT_BILL_CUSTOMER, (bill_id,)).fetchone()
+        if not row:
+            errors.insert(0, f"Bill ID {bill_id} does not exist.")
+        else:
+            customer_id, bill_date = row
+    elif customer_name:
+        row = conn.execute(SELECT_CUSTOMER_BY_NAME, (customer_name,)).fetchone()
+        customer_id = row[0] if row else None
+    if errors:
+        return None, errors
+
+    if bill_id is None and customer_id is None:
+        customer_id = conn.execute(INSERT_CUSTOMER, (customer_name.lower(), phone or "")).lastrowid
+    elif phone and customer_id is not None:
+        conn.execute(UPDATE_CUSTOMER_PHONE, (phone, customer_id))
+    if bill_id is None:
+        bill_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        bill_id = conn.execute(INSERT_BILL, (customer_id, bill_date, 0.0, "pending")).lastrowid
+
+    lines = [(stocks[key], quantity) for key, quantity in cart.items()]
+    reserved = conn.executemany(RESERVE_STOCK, [(quantity, stock[0], quantity) for stock, quantity in lines])
+    if reserved.rowcount != len(lines):
+        # Cannot happen under BEGIN IMMEDIATE; roll the whole cart back if it does
+        raise sqlite3.IntegrityError("Stock changed during checkout")
+    conn.executemany(INSERT_BILL_ITEM, [(bill_id, stock[0], quantity, stock[3] * quantity) for stock, quantity in lines])
+    total = sum(stock[3] * quantity for stock, quantity in lines)
+    conn.execute(ADD_TO_BILL_TOTAL, (total, bill_id))
+
+    return {
+        "bill_id": bill_id,
+        "customer_id": customer_id,
+        "date": bill_date,
+        "items": [
+            {"product_name": stock[1], "quantity": quantity, "price": stock[3], "total_price": stock[3] * quantity}
+            for stock, quantity in lines
+        ],
+        "items_total": total,
+        "total_amount": conn.execute(SELECT_BILL_TOTAL, (bill_id,)).fetchone()[0]
+    }, None
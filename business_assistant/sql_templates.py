@@ -0,0 +1,211 @@
+"""Translation cache for generate_sql_query(): query shape -> validated SQL template.
+
+A query is normalised by replacing the values extract_parameters() recognises (quoted
+strings, dates, numbers, payment statuses) with typed slots, so "show bills above 500"
+and "show bills above 2000" share the shape "show bills above <num>". When the SQL Gemini
+wrote for a new shape has passed validation, each value is located in it and the SQL is
+kept as a template; the next query of that shape gets the template with its own values
+filled in and never reaches Gemini.
+
+Unquoted names ("show bills for ramesh") become <customer> or <product> slots when the
+model put them in a string literal and they exist in that table; on a hit the new name
+must exist in the same table. A value the model rewrote (e.g. a reformatted date) cannot
+be located, so the query is only cached if the SQL has a ? placeholder to bind it.
+"""
+import os
+import re
+import threading
+from collections import OrderedDict
+
+SQL_CACHE_ENABLED = os.getenv("SQL_TRANSLATION_CACHE", "1") == "1"
+SQL_CACHE_MAX_ENTRIES = int(os.getenv("SQL_TRANSLATION_CACHE_MAX_ENTRIES", 512))
+
+# Value patterns shared with extract_parameters()
+QUOTED_PATTERN = r'["\']([^"\']+)["\']'
+DATE_PATTERN = r'\b(\d{1,2}[/-]\d{1,2}[/-]\d{2,4}|\d{4}[/-]\d{1,2}[/-]\d{1,2})\b'
+NUMBER_PATTERN = r'\b(\d+(?:\.\d+)?)\b'
+STATUS_PATTERN = r'\b(paid|unpaid|pending|delivered|canceled|completed)\b'
+
+NAME_KINDS = ("customer", "product")
+
+_VALUES = re.compile("|".join(
+    f"(?P<{kind}>{pattern})" for kind, pattern in
+    [("text", QUOTED_PATTERN), ("date", DATE_PATTERN), ("num", NUMBER_PATTERN), ("status", STATUS_PATTERN)]
+))
+_MARKER = re.compile(r"<(\w+)>")
+_SQL_LITERAL = re.compile(r"'(?:[^']|'')*'")
+
+_lock = threading.Lock()
+_entries = OrderedDict()
+_named = {}
+_state = {"schema_key": None, "hits": 0, "misses": 0}
+
+
+class Template:
+    def __init__(self, shape, kinds, parts):
+        self.shape = shape
+        self.kinds = kinds
+        self.parts = parts
+        self.pattern = None
+        if any(kind in NAME_KINDS for kind in kinds):
+            self.pattern = re.compile("".join(
+                ("(.+?)" if piece in NAME_KINDS else re.escape(f"<{piece}>")) if i % 2 else re.escape(piece)
+                for i, piece in enumerate(_MARKER.split(shape))
+            ))
+
+    def render(self, values):
+        sql = []
+        for part in self.parts:
+            if isinstance(part, str):
+                sql.append(part)
+            else:
+                kind, value = values[part]
+                sql.append(value if kind == "num" else value.replace("'", "''"))
+        return "".join(sql)
+
+
+def normalize(user_input):
+    """(shape, values) of a query; values are (kind, text) pairs in order of appearance."""
+    text = " ".join(user_input.lower().split()).rstrip("?.! ")
+    shape, values, pos = [], [], 0
+    for match in _VALUES.finditer(text):
+        kind = match.lastgroup
+        value = match.group(kind)
+        values.append((kind, value[1:-1] if kind == "text" else value))
+        shape += [_escape(text[pos:match.start()]), f"<{kind}>"]
+        pos = match.end()
+    shape.append(_escape(text[pos:]))
+    return "".join(shape), values
+
+
+def _escape(text):
+    # Literal < and > in the shape cannot be mistaken for slot markers; values keep them
+    return text.replace("<", "&lt;").replace(">", "&gt;")
+
+
+def _occurrences(sql, kind, value):
+    """Spans of value in sql: numbers outside string literals, everything else inside."""
+    literals = [m.span() for m in _SQL_LITERAL.finditer(sql)]
+    if kind == "num":
+        pattern = re.compile(rf"(?<![\w.]){re.escape(value)}(?![\w.])")
+    else:
+        pattern = re.compile(rf"(?<![a-z0-9]){re.escape(value.replace(chr(39), chr(39) * 2))}(?![a-z0-9])",
+                             re.IGNORECASE)
+    spans = []
+    for match in pattern.finditer(sql):
+        inside = any(start < match.start() and match.end() < end for start, end in literals)
+        if inside != (kind == "num"):
+            spans.append(match.span())
+    return spans
+
+
+def _find_names(shape, values, sql, name_kind):
+    """Slot unquoted customer/product names the model copied into a string literal."""
+    for literal in _SQL_LITERAL.findall(sql):
+        name = literal[1:-1].replace("''", "'").strip("% ").lower()
+        if not name or "<" in name:
+            continue
+        match = re.search(rf"(?<![\w<]){re.escape(name)}(?![\w>])", shape)
+        if not match:
+            continue
+        kind = name_kind(name)
+        if kind is None:
+            continue
+        index = len(_MARKER.findall(shape[:match.start()]))
+        values.insert(index, (kind, name))
+        shape = f"{shape[:match.start()]}<{kind}>{shape[match.end():]}"
+    return shape, values
+
+
+def build(user_input, sql, name_kind):
+    """Template for sql generated from user_input, or None if its values can't be placed."""
+    shape, values = normalize(user_input)
+    shape, values = _find_names(shape, values, sql, name_kind)
+    if len({value for _, value in values}) != len(values):
+        return None
+
+    spans, unplaced = [], 0
+    for index, (kind, value) in enumerate(values):
+        found = _occurrences(sql, kind, value)
+        if len(found) > 1:
+            return None
+        if not found:
+            unplaced += 1
+        else:
+            spans.append((*found[0], index))
+    if unplaced > sql.count("?"):
+        return None
+
+    parts, pos = [], 0
+    for start, end, index in sorted(spans):
+        if start < pos:
+            return None
+        parts += [sql[pos:start], index]
+        pos = end
+    parts.append(sql[pos:])
+    return Template(shape, [kind for kind, _ in values], parts)
+
+
+def _reset_if_schema_changed(schema_key):
+    if _state["schema_key"] != schema_key:
+        _entries.clear()
+        _named.clear()
+        _state["schema_key"] = schema_key
+
+
+def lookup(user_input, schema_key, name_kind):
+    """SQL for user_input from a cached template, or None on a miss."""
+    if not SQL_CACHE_ENABLED:
+        return None
+    shape, values = normalize(user_input)
+    with _lock:
+        _reset_if_schema_changed(schema_key)
+        template = _entries.get(shape)
+        names = []
+        if template is None:
+            for candidate in list(_named.values()):
+                match = candidate.pattern.fullmatch(shape)
+                if match:
+                    template, names = candidate, [name.strip() for name in match.groups()]
+                    break
+        if template is not None:
+            _entries.move_to_end(template.shape)
+    if template is not None and names:
+        expected = [kind for kind in template.kinds if kind in NAME_KINDS]
+        if any(name_kind(name) != kind for name, kind in zip(names, expected)):
+            template = None
+        else:
+            names, typed = iter(names), iter(values)
+            values = [(kind, next(names)) if kind in NAME_KINDS else next(typed) for kind in template.kinds]
+    with _lock:
+        _state["hits" if template is not None else "misses"] += 1
+    return template.render(values) if template is not None else None
+
+
+def store(user_input, sql, schema_key, name_kind):
+    """Remember validated sql for the shape of user_input, if it can be templated."""
+    if not SQL_CACHE_ENABLED:
+        return
+    template = build(user_input, sql, name_kind)
+    if template is None:
+        return
+    with _lock:
+        _reset_if_schema_changed(schema_key)
+        _entries[template.shape] = template
+        if template.pattern is not None:
+            _named[template.shape] = template
+        while len(_entries) > SQL_CACHE_MAX_ENTRIES:
+            shape, _ = _entries.popitem(last=False)
+            _named.pop(shape, None)
+
+
+def stats():
+    with _lock:
+        lookups = _state["hits"] + _state["misses"]
+        return {
+            "enabled": SQL_CACHE_ENABLED,
+            "entries": len(_entries),
+            "hits": _state["hits"],
+            "misses": _state["misses"],
+            "hit_rate": round(_state["hits"] / lookups, 3) if lookups else None,
+        }
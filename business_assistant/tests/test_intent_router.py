@@ -0,0 +1,63 @@
+"""Golden (intent, slots) for route(), taken from the pattern cascade it replaced.
+
+Some of these look wrong (the greedy product name in create_stock, the first matching
+pattern winning for a two-command input); they are what the cascade returned, and the
+router has to keep returning them.
+"""
+import pytest
+
+import intent_router
+
+GOLDEN = [
+    ("hi", 'casual', {}),
+    ("hello there", 'casual', {}),
+    ("how are you", 'casual', {}),
+    ("thanks!", 'casual', {}),
+    ("bye", 'casual', {}),
+    ("what's up", 'casual', {}),
+    ("good morning team", 'casual', {}),
+    ("hey show bills", 'casual', {}),
+    ("create a new bill for customer 'Ramesh'", 'create_bill', {'customer_name': 'ramesh'}),
+    ("add bill for suresh", 'create_bill', {'customer_name': 'suresh'}),
+    ("generate bill for Anita K", 'create_bill', {'customer_name': 'anita k'}),
+    ("create bill for ravi", 'create_bill', {'customer_name': 'ravi'}),
+    ("please add a bill for customer x and delete bill 3", 'create_bill', {'customer_name': 'x and delete bill 3'}),
+    ("create customer named Lakshmi", 'create_customer', {'customer_name': 'lakshmi'}),
+    ("add new customer 'gopal'", 'create_customer', {'customer_name': 'gopal'}),
+    ("insert customer meena", 'create_customer', {'customer_name': 'meena'}),
+    ("update ramesh phone number to +91 98450 12345", 'update_phone',
+     {'customer_name': 'ramesh ', 'phone': '+91 98450 12345'}),
+    ("update customer 'anita' phone to 12345", 'update_phone', {'customer_name': 'anita', 'phone': '12345'}),
+    ("add 3 soap to bill 5", 'add_bill_item', {'quantity': '3', 'product_name': 'soap ', 'bill_id': '5'}),
+    ("add 10 units of rice to bill id 12", 'add_bill_item', {'quantity': '10', 'product_name': 'rice ', 'bill_id': '12'}),
+    ("hi, add 3 soap to bill 2", 'add_bill_item', {'quantity': '3', 'product_name': 'soap ', 'bill_id': '2'}),
+    ("add 2 soap to bill 5\nand delete customer x", 'add_bill_item',
+     {'quantity': '2', 'product_name': 'soap ', 'bill_id': '5'}),
+    ("delete bill 4", 'delete_bill', {'bill_id': '4'}),
+    ("delete invoice id 9", 'delete_bill', {'bill_id': '9'}),
+    ("Delete Bill 10\n", 'delete_bill', {'bill_id': '10'}),
+    ("delete customer ramesh", 'delete_customer', {'customer_name': 'ramesh'}),
+    ("add new stock item ceramic mug with price $12.99 and quantity 50", 'create_stock',
+     {'product_name': 'ceramic mug with price ', 'price': None, 'quantity': None}),
+    ("create stock tea with price 4", 'create_stock', {'product_name': 'tea with price ', 'price': None, 'quantity': None}),
+    ("add stock item sugar", 'create_stock', {'product_name': 'sugar', 'price': None, 'quantity': None}),
+    ("add 25 units of rice to stock", 'add_stock', {'quantity': '25', 'product_name': 'rice '}),
+    ("view items of bill 3", 'view_bill_items', {'bill_id': '3'}),
+    ("show bill items 7", 'view_bill_items', {'bill_id': '7'}),
+    ("show all bills", 'show_bills', {}),
+    ("list bills", 'show_bills', {}),
+    ("which customer has the highest bill amount", None, {}),
+    ("total unpaid amount", None, {}),
+    ("update price of tea to 5", None, {}),
+]
+
+
+@pytest.mark.parametrize('user_input, intent, slots', GOLDEN)
+def test_route(user_input, intent, slots):
+    assert intent_router.route(user_input) == (intent, slots)
+
+
+def test_route_is_independent_of_earlier_inputs():
+    # Routers are cached per set of trigger words; the answer must not depend on which came first
+    for user_input, intent, slots in reversed(GOLDEN):
+        assert intent_router.route(user_input) == (intent, slots)
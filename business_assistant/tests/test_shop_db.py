@@ -0,0 +1,134 @@
+import os
+import random
+import runpy
+import sqlite3
+import threading
+
+import pytest
+
+import shop_db
+
+INIT_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'init_db.py')
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A fresh database.db in tmp_path, with shop_db's pool pointed at it."""
+    monkeypatch.chdir(tmp_path)
+    runpy.run_path(INIT_DB)
+    path = str(tmp_path / 'database.db')
+    monkeypatch.setattr(shop_db, 'pool', shop_db.ConnectionPool(path))
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO customers (name, phone) VALUES ('ramesh', '')")
+    conn.executemany("INSERT INTO bills (customer_id, bill_date, total_amount, payment_status) VALUES (1, '2024-01-01', 0, 'pending')",
+                     [()] * 10)
+    conn.execute("INSERT INTO stocks (product_name, quantity, price) VALUES ('soap', 200, 10)")
+    conn.execute("INSERT INTO stocks (product_name, quantity, price) VALUES ('tea', 50, 5)")
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def _run_threads(count, target):
+    threads = [threading.Thread(target=target, args=(number,)) for number in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def _assert_consistent(conn, stock_id, initial):
+    left, = conn.execute("SELECT quantity FROM stocks WHERE id = ?", (stock_id,)).fetchone()
+    sold, = conn.execute("SELECT COALESCE(SUM(quantity), 0) FROM bill_items WHERE stock_id = ?", (stock_id,)).fetchone()
+    assert left >= 0
+    assert left + sold == initial
+    billed, = conn.execute("SELECT SUM(total_amount) FROM bills").fetchone()
+    items, = conn.execute("SELECT COALESCE(SUM(total_price), 0) FROM bill_items").fetchone()
+    assert billed == pytest.approx(items)
+    return left, sold
+
+
+def test_reserve_bill_item_does_not_oversell(db):
+    added, errors = [], []
+
+    def sell(seed):
+        rng = random.Random(seed)
+        for _ in range(40):
+            item, error = shop_db.transaction(
+                lambda conn: shop_db.reserve_bill_item(conn, rng.randint(1, 10), 'soap', rng.randint(1, 3)))
+            (added if item else errors).append(item or error[0])
+
+    _run_threads(16, sell)
+
+    left, sold = _assert_consistent(db, 1, 200)
+    assert sold == 200 and left == 0
+    assert len(added) + len(errors) == 16 * 40
+    assert all('exceeds available stock' in error or 'No stock available' in error for error in errors)
+
+
+def test_reserve_bill_item_errors(db):
+    assert shop_db.transaction(lambda conn: shop_db.reserve_bill_item(conn, 99, 'soap', 1)) == \
+        (None, ["Bill ID 99 does not exist."])
+    assert shop_db.transaction(lambda conn: shop_db.reserve_bill_item(conn, 1, 'rice', 1)) == \
+        (None, ["Product 'rice' not found in stock."])
+    assert shop_db.transaction(lambda conn: shop_db.reserve_bill_item(conn, 1, 2, 51)) == \
+        (None, ["Requested quantity (51) exceeds available stock (50) for tea."])
+    _assert_consistent(db, 2, 50)
+
+
+def _checkout(items, **kwargs):
+    return shop_db.transaction(lambda conn: shop_db.checkout(conn, items, **kwargs))
+
+
+def test_checkout_is_all_or_nothing(db):
+    result, errors = _checkout([('Soap', 5), ('Rice', 1), ('tea', 51)], customer_name='anita')
+    assert result is None
+    assert errors == ["Product 'Rice' not found in stock.",
+                      "Requested quantity (51) exceeds available stock (50) for tea."]
+    assert db.execute("SELECT quantity FROM stocks ORDER BY id").fetchall() == [(200,), (50,)]
+    assert db.execute("SELECT COUNT(*) FROM bills").fetchone() == (10,)
+    assert db.execute("SELECT COUNT(*) FROM customers WHERE name = 'anita'").fetchone() == (0,)
+
+
+def test_checkout_new_customer(db):
+    result, errors = _checkout([('soap', 2), (' SOAP ', 1), ('Tea', 4)], customer_name='Anita', phone='9845012345')
+    assert errors is None
+    assert [(item['product_name'], item['quantity']) for item in result['items']] == [('soap', 3), ('tea', 4)]
+    assert result['total_amount'] == result['items_total'] == 50
+    assert db.execute("SELECT name, phone FROM customers WHERE id = ?", (result['customer_id'],)).fetchone() == \
+        ('anita', '9845012345')
+    assert db.execute("SELECT bill_date FROM bills WHERE id = ?", (result['bill_id'],)).fetchone() == (result['date'],)
+
+
+def test_checkout_existing_bill_and_customer(db):
+    result, errors = _checkout([('soap', 1)], bill_id=3, phone='9845012345')
+    assert errors is None
+    assert (result['bill_id'], result['customer_id'], result['date']) == (3, 1, '2024-01-01')
+    assert db.execute("SELECT phone FROM customers WHERE id = 1").fetchone() == ('9845012345',)
+
+    result, errors = _checkout([('soap', 1)], customer_name='Ramesh', phone='12345')
+    assert errors is None and result['customer_id'] == 1
+    assert db.execute("SELECT phone FROM customers WHERE id = 1").fetchone() == ('12345',)
+
+    assert _checkout([('soap', 1)], bill_id=99) == (None, ["Bill ID 99 does not exist."])
+
+
+def test_checkout_drains_stock_concurrently(db):
+    outcomes = []
+
+    def buy(seed):
+        rng = random.Random(seed)
+        for _ in range(20):
+            cart = [('soap', rng.randint(1, 4)), ('tea', rng.randint(1, 2))]
+            outcomes.append(_checkout(cart, bill_id=rng.randint(1, 10)))
+
+    _run_threads(12, buy)
+
+    soap_left, soap_sold = _assert_consistent(db, 1, 200)
+    tea_left, tea_sold = _assert_consistent(db, 2, 50)
+    # Every cart sold both products or neither
+    billed = [result for result, errors in outcomes if errors is None]
+    assert len(billed) == db.execute("SELECT COUNT(*) FROM bill_items WHERE stock_id = 2").fetchone()[0]
+    assert soap_sold == sum(result['items'][0]['quantity'] for result in billed)
+    assert tea_sold == sum(result['items'][1]['quantity'] for result in billed)
+    assert soap_left < 4 or tea_left < 2
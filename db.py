@@ -0,0 +1,504 @@
+import logging
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.getenv('USERS_DB_PATH', 'users.db')
+POOL_SIZE = int(os.getenv('USERS_DB_POOL_SIZE', 8))
+BUSY_RETRIES = 5
+
+# Fixed queries live here so every caller passes the identical SQL string and hits
+# the per-connection prepared statement cache.
+INSERT_USER = 'INSERT INTO users (username, password) VALUES (?, ?)'
+SELECT_USER_LOGIN = 'SELECT id FROM users WHERE username = ? AND password = ?'
+INSERT_BILL = '''
+    INSERT INTO bills (user_id, bill_type, amount, bill_date, file_path)
+    VALUES (?, ?, ?, ?, ?)
+'''
+UPSERT_MONTHLY_TOTAL = '''
+    INSERT INTO bill_monthly_totals (user_id, bill_type, month, total, bill_count, max_amount)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (user_id, bill_type, month) DO UPDATE SET
+        total = total + excluded.total,
+        bill_count = bill_count + excluded.bill_count,
+        max_amount = MAX(max_amount, excluded.max_amount)
+'''
+SELECT_USER_BILLS = '''
+    SELECT bill_type, amount, bill_date
+    FROM bills
+    WHERE user_id = ?
+    ORDER BY bill_type, bill_date, id
+'''
+SELECT_USER_BILLS_BY_TYPE = '''
+    SELECT bill_type, amount, bill_date
+    FROM bills
+    WHERE user_id = ? AND bill_type = ?
+    ORDER BY bill_date, id
+'''
+UPSERT_BILL_ACTIVITY = '''
+    INSERT INTO bill_activity (user_id, version, updated_at)
+    VALUES (?, 1, ?)
+    ON CONFLICT (user_id) DO UPDATE SET
+        version = version + 1,
+        updated_at = excluded.updated_at
+'''
+SELECT_BILL_VERSION = 'SELECT COALESCE(MAX(version), 0) FROM bill_activity WHERE user_id = ?'
+SELECT_FRESH_ANALYSIS = '''
+    SELECT c.analysis
+    FROM bill_analysis_cache c
+    LEFT JOIN bill_activity a ON a.user_id = c.user_id
+    WHERE c.user_id = ? AND c.bills_version = COALESCE(a.version, 0)
+'''
+UPSERT_ANALYSIS = '''
+    INSERT OR REPLACE INTO bill_analysis_cache (user_id, analysis, bills_version, computed_at)
+    VALUES (?, ?, ?, ?)
+'''
+SELECT_UNPADDED_BILL_DATES = '''
+    SELECT id, user_id, bill_date FROM bills
+    WHERE bill_date NOT GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'
+'''
+UPDATE_BILL_DATE = 'UPDATE bills SET bill_date = ? WHERE id = ?'
+SELECT_BILL_USER_RANGE = "SELECT MIN(user_id), MAX(user_id) FROM bills WHERE typeof(user_id) = 'integer'"
+SELECT_BILLS_IN_RANGE = '''
+    SELECT user_id, bill_type, amount, bill_date
+    FROM bills
+    WHERE user_id BETWEEN ? AND ?
+    ORDER BY user_id, bill_type, bill_date, id
+'''
+SELECT_BILL_VERSIONS_IN_RANGE = 'SELECT user_id, version FROM bill_activity WHERE user_id BETWEEN ? AND ?'
+SELECT_UPLOAD_RESULT = 'SELECT value FROM upload_results WHERE content_hash = ? AND kind = ?'
+UPSERT_UPLOAD_RESULT = '''
+    INSERT OR REPLACE INTO upload_results (content_hash, kind, value, created_at)
+    VALUES (?, ?, ?, ?)
+'''
+INSERT_JOB = '''
+    INSERT INTO jobs (id, kind, input_hash, payload, status, max_attempts, run_after, created_at)
+    VALUES (?, ?, ?, ?, 'queued', ?, ?, ?)
+'''
+SELECT_DUPLICATE_JOB = '''
+    SELECT id FROM jobs
+    WHERE input_hash = ? AND (status IN ('queued', 'running') OR (status = 'done' AND finished_at > ?))
+    ORDER BY created_at DESC
+    LIMIT 1
+'''
+CLAIM_JOB = '''
+    UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ?
+    WHERE id = (
+        SELECT id FROM jobs
+        WHERE (status = 'queued' AND run_after <= ?) OR (status = 'running' AND started_at < ?)
+        ORDER BY run_after
+        LIMIT 1
+    )
+    RETURNING id, kind, payload, attempts, max_attempts, created_at
+'''
+RETRY_JOB = "UPDATE jobs SET status = 'queued', run_after = ?, error = ? WHERE id = ?"
+FINISH_JOB = '''
+    UPDATE jobs SET status = ?, result = ?, result_status = ?, error = ?, finished_at = ?
+    WHERE id = ?
+'''
+SELECT_JOB = '''
+    SELECT id, kind, status, attempts, result, result_status, error, created_at, started_at, finished_at
+    FROM jobs WHERE id = ?
+'''
+COUNT_JOBS_BY_STATUS = 'SELECT COUNT(*) FROM jobs WHERE status = ?'
+SELECT_WEATHER_ADVISORY = 'SELECT advisory, generated_at FROM weather_advisories WHERE district_key = ?'
+UPSERT_WEATHER_ADVISORY = '''
+    INSERT INTO weather_advisories (district_key, district, state, advisory, generated_at)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (district_key) DO UPDATE SET
+        advisory = excluded.advisory,
+        generated_at = excluded.generated_at
+'''
+UPSERT_WEATHER_REQUESTS = '''
+    INSERT INTO weather_advisories (district_key, district, state, request_count, last_requested)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (district_key) DO UPDATE SET
+        request_count = request_count + excluded.request_count,
+        last_requested = excluded.last_requested
+'''
+SELECT_POPULAR_DISTRICTS = 'SELECT district, state FROM weather_advisories ORDER BY request_count DESC LIMIT ?'
+SELECT_DUE_DISTRICTS = '''
+    SELECT district, state FROM weather_advisories
+    WHERE last_requested > ? AND (generated_at IS NULL OR generated_at < ?)
+    ORDER BY request_count DESC
+    LIMIT ?
+'''
+SELECT_SCHEMES_SINCE = 'SELECT id, data FROM schemes WHERE id > ? ORDER BY id'
+INSERT_SCHEME = '''
+    INSERT INTO schemes (kind, scheme_key, data, added_at) VALUES (?, ?, ?, ?)
+    ON CONFLICT (kind, scheme_key) DO NOTHING
+'''
+SELECT_SCHEME_COVERAGE = 'SELECT enriched_at FROM scheme_coverage WHERE kind = ? AND district_key = ?'
+UPSERT_SCHEME_COVERAGE = '''
+    INSERT INTO scheme_coverage (kind, district_key, enriched_at) VALUES (?, ?, ?)
+    ON CONFLICT (kind, district_key) DO UPDATE SET enriched_at = excluded.enriched_at
+'''
+SELECT_CATEGORY_TOTALS = '''
+    SELECT bill_type, SUM(total)
+    FROM bill_monthly_totals
+    WHERE user_id = ?
+    GROUP BY bill_type
+'''
+
+def _connect(path):
+    # isolation_level=None: we issue BEGIN IMMEDIATE ourselves so writers take the
+    # write lock up front instead of failing on a read->write upgrade.
+    conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False,
+                           cached_statements=256)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA cache_size=-16000')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    return conn
+
+
+class ConnectionPool:
+    """Bounded pool of SQLite connections shared by the threads of one process."""
+
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self, timeout=30):
+        if self._pid != os.getpid():
+            # Connections must not be shared across a fork
+            self._reset()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return _connect(self.path)
+        return self._idle.get(timeout=timeout)
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+
+pool = ConnectionPool(DB_PATH)
+
+
+def _is_busy(error):
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+def _retry(fn):
+    for attempt in range(BUSY_RETRIES + 1):
+        try:
+            return fn()
+        except sqlite3.OperationalError as e:
+            if not _is_busy(e) or attempt == BUSY_RETRIES:
+                raise
+            delay = 0.02 * (2 ** attempt) * (1 + random.random())
+            logger.warning(f"Database busy, retrying in {delay:.2f}s ({attempt + 1}/{BUSY_RETRIES})")
+            time.sleep(delay)
+
+
+def query(sql, params=()):
+    """Run a read and return all rows."""
+    def run():
+        with pool.connection() as conn:
+            return conn.execute(sql, params).fetchall()
+    return _retry(run)
+
+
+def query_one(sql, params=()):
+    def run():
+        with pool.connection() as conn:
+            return conn.execute(sql, params).fetchone()
+    return _retry(run)
+
+
+def transaction(fn):
+    """Run fn(conn) inside BEGIN IMMEDIATE ... COMMIT, retrying the whole unit while busy."""
+    def run():
+        with pool.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                result = fn(conn)
+                conn.execute('COMMIT')
+                return result
+            except BaseException:
+                conn.rollback()
+                raise
+    return _retry(run)
+
+
+def snapshot(fn):
+    """Run fn(conn) inside one read transaction so all of its queries see the same data."""
+    def run():
+        with pool.connection() as conn:
+            conn.execute('BEGIN')
+            try:
+                return fn(conn)
+            finally:
+                conn.rollback()
+    return _retry(run)
+
+
+def execute(sql, params=()):
+    """Run a single write in its own transaction and return lastrowid."""
+    return transaction(lambda conn: conn.execute(sql, params).lastrowid)
+
+
+def normalize_bill_type(bill_type):
+    return (bill_type or 'other').strip().lower()
+
+
+def normalize_bill_date(bill_date):
+    """A YYYY-MM-DD bill date zero-padded; strptime also accepts dates like '2024-1-5'."""
+    if len(bill_date) == 10:
+        return bill_date
+    return datetime.strptime(bill_date, '%Y-%m-%d').strftime('%Y-%m-%d')
+
+
+def insert_bill(conn, user_id, bill_type, amount, bill_date, file_path=None):
+    """Insert a bill and fold it into bill_monthly_totals; call inside transaction()."""
+    bill_type = normalize_bill_type(bill_type)
+    bill_date = normalize_bill_date(bill_date)
+    bill_id = conn.execute(INSERT_BILL, (user_id, bill_type, amount, bill_date, file_path)).lastrowid
+    conn.execute(UPSERT_MONTHLY_TOTAL, (user_id, bill_type, bill_date[:7], amount, 1, amount))
+    conn.execute(UPSERT_BILL_ACTIVITY, (user_id, time.time()))
+    return bill_id
+
+
+def insert_bills(conn, bills):
+    """Bulk insert_bill() for (user_id, bill_type, amount, bill_date) tuples; call inside transaction()."""
+    # Index order keeps each batch's b-tree writes on neighbouring pages; the sort is
+    # stable, so same-day bills keep their input order
+    rows = sorted(((user_id, normalize_bill_type(bill_type), amount, normalize_bill_date(bill_date), None)
+                   for user_id, bill_type, amount, bill_date in bills),
+                  key=lambda row: (row[0], row[1], row[3]))
+    monthly = {}
+    for user_id, bill_type, amount, bill_date, _ in rows:
+        key = (user_id, bill_type, bill_date[:7])
+        total, count, max_amount = monthly.get(key, (0.0, 0, amount))
+        monthly[key] = (total + amount, count + 1, max(max_amount, amount))
+
+    conn.executemany(INSERT_BILL, rows)
+    conn.executemany(UPSERT_MONTHLY_TOTAL, [key + value for key, value in monthly.items()])
+    now = time.time()
+    conn.executemany(UPSERT_BILL_ACTIVITY, [(user_id, now) for user_id in {key[0] for key in monthly}])
+    return len(rows)
+
+
+def add_bill(user_id, bill_type, amount, bill_date, file_path=None):
+    return transaction(lambda conn: insert_bill(conn, user_id, bill_type, amount, bill_date, file_path))
+
+
+def _migrate_bill_rollups(conn):
+    # Store bill_type pre-normalized so lookups can use the index instead of LOWER()
+    conn.execute('UPDATE bills SET bill_type = LOWER(TRIM(bill_type)) WHERE bill_type != LOWER(TRIM(bill_type))')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_bills_user_type_date ON bills (user_id, bill_type, bill_date)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS bill_monthly_totals (
+            user_id INTEGER NOT NULL,
+            bill_type TEXT NOT NULL,
+            month TEXT NOT NULL,
+            total REAL NOT NULL,
+            bill_count INTEGER NOT NULL,
+            max_amount REAL NOT NULL,
+            PRIMARY KEY (user_id, bill_type, month)
+        )
+    ''')
+    conn.execute('DELETE FROM bill_monthly_totals')
+    conn.execute('''
+        INSERT INTO bill_monthly_totals (user_id, bill_type, month, total, bill_count, max_amount)
+        SELECT user_id, bill_type, substr(bill_date, 1, 7), SUM(amount), COUNT(*), MAX(amount)
+        FROM bills
+        GROUP BY user_id, bill_type, substr(bill_date, 1, 7)
+    ''')
+
+
+def _migrate_analysis_cache(conn):
+    # bill_activity.version is bumped by every insert_bill(); a cached dashboard is fresh
+    # while its bills_version still matches
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS bill_activity (
+            user_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS bill_analysis_cache (
+            user_id INTEGER PRIMARY KEY,
+            analysis TEXT NOT NULL,
+            bills_version INTEGER NOT NULL,
+            computed_at REAL NOT NULL
+        )
+    ''')
+
+
+def _migrate_upload_results(conn):
+    # Keyed by the SHA-256 of an uploaded file; kind is 'text' or the derived result
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS upload_results (
+            content_hash TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            value TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (content_hash, kind)
+        )
+    ''')
+
+
+def _migrate_jobs(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            input_hash TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL,
+            run_after REAL NOT NULL,
+            result TEXT,
+            result_status INTEGER,
+            error TEXT,
+            created_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status_run_after ON jobs (status, run_after)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_input_hash ON jobs (input_hash, created_at)')
+
+
+def _migrate_weather_advisories(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS weather_advisories (
+            district_key TEXT PRIMARY KEY,
+            district TEXT NOT NULL,
+            state TEXT NOT NULL,
+            advisory TEXT,
+            generated_at REAL,
+            request_count INTEGER NOT NULL DEFAULT 0,
+            last_requested REAL
+        )
+    ''')
+
+
+def _migrate_scheme_catalogue(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schemes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            scheme_key TEXT NOT NULL,
+            data TEXT NOT NULL,
+            added_at REAL NOT NULL,
+            UNIQUE (kind, scheme_key)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS scheme_coverage (
+            kind TEXT NOT NULL,
+            district_key TEXT NOT NULL,
+            enriched_at REAL NOT NULL,
+            PRIMARY KEY (kind, district_key)
+        )
+    ''')
+
+
+def _pad_bill_dates(conn):
+    """Rewrite stored dates like '2024-1-5' as '2024-01-05'; returns the affected user ids."""
+    updates, users = [], set()
+    for bill_id, user_id, bill_date in conn.execute(SELECT_UNPADDED_BILL_DATES).fetchall():
+        try:
+            updates.append((normalize_bill_date(bill_date), bill_id))
+        except ValueError:
+            logger.warning(f"Bill {bill_id} has an unparseable date {bill_date!r}")
+            continue
+        if user_id is not None:
+            users.add(user_id)
+    conn.executemany(UPDATE_BILL_DATE, updates)
+    return users
+
+
+def _rebuild_monthly_totals(conn):
+    conn.execute('DELETE FROM bill_monthly_totals')
+    conn.execute('''
+        INSERT INTO bill_monthly_totals (user_id, bill_type, month, total, bill_count, max_amount)
+        SELECT user_id, bill_type, substr(bill_date, 1, 7), SUM(amount), COUNT(*), MAX(amount)
+        FROM bills
+        GROUP BY user_id, bill_type, substr(bill_date, 1, 7)
+    ''')
+
+
+def _migrate_bill_dates(conn):
+    # Unpadded dates accepted before insert_bill() normalised them produced month keys
+    # like '2024-1-'; pad them, rebuild the rollup and invalidate those users' dashboards
+    users = _pad_bill_dates(conn)
+    _rebuild_monthly_totals(conn)
+    now = time.time()
+    conn.executemany(UPSERT_BILL_ACTIVITY, [(user_id, now) for user_id in users])
+
+
+# Applied in order; PRAGMA user_version records how many have run
+MIGRATIONS = [
+    _migrate_bill_rollups,
+    _migrate_analysis_cache,
+    _migrate_upload_results,
+    _migrate_jobs,
+    _migrate_weather_advisories,
+    _migrate_scheme_catalogue,
+    _migrate_bill_dates,
+]
+
+
+def migrate():
+    def run(conn):
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            logger.info(f"Applying users.db migration {number}: {migration.__name__}")
+            migration(conn)
+            conn.execute(f'PRAGMA user_version = {number}')
+    transaction(run)
+
+
+def init_db():
+    def create(conn):
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT UNIQUE NOT NULL,
+                password TEXT NOT NULL
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS bills (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER,
+                bill_type TEXT NOT NULL,
+                amount REAL NOT NULL,
+                bill_date TEXT NOT NULL,
+                file_path TEXT
+            )
+        ''')
+    transaction(create)
+    migrate()
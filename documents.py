@@ -0,0 +1,103 @@
+"""Document text extraction and multi-file analysis batches.
+
+Parsing (PyPDF2/docx/PIL) is CPU-bound and runs in a shared process pool; each batch
+then drives its Gemini calls from a thread pool capped at DOCUMENT_BATCH_CONCURRENCY.
+The pool forks its workers, so start_parse_pool() must run before the process starts
+any threads: a fork copies locks held by other threads into the children.
+"""
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import docx
+from PIL import Image
+
+import pdf_text
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_EXTENSIONS = {'pdf', 'jpg', 'jpeg', 'png', 'doc', 'docx'}
+DOCUMENT_BATCH_MAX_FILES = int(os.getenv('DOCUMENT_BATCH_MAX_FILES', 10))
+DOCUMENT_BATCH_CONCURRENCY = int(os.getenv('DOCUMENT_BATCH_CONCURRENCY', 4))
+DOCUMENT_PARSE_WORKERS = int(os.getenv('DOCUMENT_PARSE_WORKERS', os.cpu_count() or 2))
+
+
+def allowed_file(filename):
+    return filename.rsplit('.', 1)[-1].lower() in ALLOWED_EXTENSIONS
+
+
+def extract_text(filename, stream):
+    """Text layer of a PDF or Word document; images have none (no OCR yet) and give ''."""
+    if filename.endswith('.pdf'):
+        return pdf_text.extract_text(stream)
+    if filename.endswith(('.jpg', '.jpeg', '.png')):
+        Image.open(stream)
+        return ""
+    if filename.endswith(('.doc', '.docx')):
+        return "\n".join([para.text for para in docx.Document(stream).paragraphs])
+    return ""
+
+
+def _extract_bytes(filename, data):
+    return extract_text(filename, io.BytesIO(data))
+
+
+_parse_pool = None
+_parse_pool_lock = threading.Lock()
+
+
+def parse_pool():
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            _parse_pool = ProcessPoolExecutor(max_workers=DOCUMENT_PARSE_WORKERS)
+    return _parse_pool
+
+
+def start_parse_pool():
+    """Fork every parse worker now (a fork pool starts them all on its first task)."""
+    parse_pool().submit(int).result()
+
+
+def analyze_batch(files, analyze, concurrency=DOCUMENT_BATCH_CONCURRENCY):
+    """Analyze (filename, data) pairs concurrently, keeping their order.
+
+    analyze(filename, digest, extract) returns (payload, status); extract() parses the file
+    in the process pool and is only called when no cached text exists. Each result is the
+    payload plus filename, status and a timings breakdown in milliseconds.
+    """
+    def run(filename, data):
+        started = time.perf_counter()
+        timings = {"parse_ms": 0.0}
+        if not allowed_file(filename):
+            payload, status = {"error": "Unsupported file type. Use PDF, JPG, PNG, DOC, or DOCX."}, 400
+        else:
+            digest = hashlib.sha256(data).hexdigest()
+            timings["hash_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+            def extract():
+                parse_started = time.perf_counter()
+                try:
+                    return parse_pool().submit(_extract_bytes, filename, data).result()
+                finally:
+                    timings["parse_ms"] = round((time.perf_counter() - parse_started) * 1000, 1)
+
+            analyze_started = time.perf_counter()
+            try:
+                payload, status = analyze(filename, digest, extract)
+            except Exception as e:
+                logger.error(f"Batch analysis failed for {filename}: {e}")
+                payload, status = {"error": f"Analysis error: {str(e)}"}, 500
+            analyze_ms = (time.perf_counter() - analyze_started) * 1000
+            timings["analysis_ms"] = round(max(analyze_ms - timings["parse_ms"], 0.0), 1)
+        timings["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return dict(payload, filename=filename, status=status, timings=timings)
+
+    if not files:
+        return []
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(files))) as executor:
+        return list(executor.map(lambda item: run(*item), files))
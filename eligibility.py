@@ -0,0 +1,225 @@
+"""Microloan eligibility rules and scorecard, vectorised over many applications.
+
+The hard rules /check_eligibility always applied (age, income, amount range, the
+₹10,000 auto-approval, existing loans above 3x income, default history) come first.
+Applications that pass them are scored on:
+
+- debt-to-income: the EMI of the requested loan over loanTenure months plus the
+  repayment of existing loans, as a share of monthly income;
+- leverage: existing loan amount against 3x monthly income;
+- loan purpose, by category.
+
+A score of at least ELIGIBILITY_APPROVE_SCORE is approved and one below
+ELIGIBILITY_REVIEW_SCORE rejected. On /check_eligibility the band in between is the
+only part sent to Gemini (or marked pending when ELIGIBILITY_LLM_REVIEW is off);
+/check_eligibility_batch returns it as pending with review=True.
+"""
+import os
+import re
+
+import numpy as np
+
+ELIGIBILITY_ANNUAL_RATE = float(os.getenv('ELIGIBILITY_ANNUAL_RATE', 0.24))
+ELIGIBILITY_MAX_DTI = float(os.getenv('ELIGIBILITY_MAX_DTI', 0.5))
+ELIGIBILITY_APPROVE_SCORE = float(os.getenv('ELIGIBILITY_APPROVE_SCORE', 0.6))
+ELIGIBILITY_REVIEW_SCORE = float(os.getenv('ELIGIBILITY_REVIEW_SCORE', 0.45))
+ELIGIBILITY_LLM_REVIEW = os.getenv('ELIGIBILITY_LLM_REVIEW', '1') == '1'
+ELIGIBILITY_BATCH_MAX = int(os.getenv('ELIGIBILITY_BATCH_MAX', 10000))
+# Existing loans are assumed to be repaid over this many months at the same rate
+EXISTING_LOAN_MONTHS = 12
+
+REQUIRED_FIELDS = [
+    'age', 'monthlyIncome', 'existingLoans', 'existingLoanAmount',
+    'defaultHistory', 'loanAmount', 'loanPurpose', 'loanTenure'
+]
+NUMERIC_FIELDS = {
+    'age': 'age',
+    'monthlyIncome': 'monthly_income',
+    'existingLoanAmount': 'existing_loan_amount',
+    'loanAmount': 'loan_amount',
+    'loanTenure': 'loan_tenure',
+}
+
+WEIGHTS = {"dti": 0.5, "leverage": 0.2, "purpose": 0.3}
+
+# Purpose category -> score; the loan form's values are categories themselves
+PURPOSE_SCORES = {
+    'agriculture': 1.0,
+    'livestock': 0.95,
+    'business': 0.9,
+    'education': 0.85,
+    'healthcare': 0.8,
+    'home': 0.7,
+    'other': 0.5,
+    'consumption': 0.35,
+}
+# Whole words: a stem ends in \w* and a noun takes an optional plural, so "fee" does not
+# match "coffee"
+PURPOSE_KEYWORDS = [
+    ('agriculture', r'agri\w*|farm\w*|crops?|seeds?|fertili[sz]\w*|irrigat\w*|tractors?|harvest\w*|pumps?'),
+    ('livestock', r'livestock|dairy|cattle|cows?|buffalo(?:es)?|goats?|sheep|poultry|fish\w*'),
+    ('business', r'business\w*|shops?|stores?|trad(?:e|es|er|ers|ing)|vendors?|stalls?|tailor\w*|'
+                 r'(?:handi)?crafts?\w*|artisans?|workshops?|stocks?|enterprises?'),
+    ('education', r'educat\w*|schools?|colleges?|fees?|study|studies|courses?|training'),
+    ('healthcare', r'health\w*|medical|hospital\w*|treatments?|surgery|surgeries|medicines?|emergenc\w*'),
+    ('home', r'homes?|house\w*|roofs?|repairs?|construct\w*|toilets?|sanitation'),
+    ('consumption', r'weddings?|marriages?|festivals?|celebrat\w*|vehicles?|bikes?|phones?|tv|appliances?|travel\w*'),
+]
+_PURPOSE_PATTERNS = [(category, re.compile(rf'\b(?:{pattern})\b', re.IGNORECASE))
+                     for category, pattern in PURPOSE_KEYWORDS]
+# Numeric inputs are clamped to this magnitude so they fit the int64 score arrays; every
+# rule threshold is far below it
+NUMERIC_LIMIT = 10 ** 12
+
+# Decision codes, in the order the rules are applied
+RULE_REASONS = [
+    ('age', 'rejected', "Age must be between 18 and 65."),
+    ('income', 'rejected', "Monthly income must be at least ₹3,000."),
+    ('amount', 'rejected', "Loan amount must be between ₹500 and ₹150,000."),
+    ('small_loan', 'approved', "Loan amount is ₹10,000 or less, automatically approved."),
+    ('leverage', 'pending', "Existing loan amount exceeds 3x monthly income. Additional review required."),
+    ('default', 'rejected', "History of loan default detected."),
+    ('tenure', 'rejected', "Loan tenure must be at least 1 month."),
+]
+
+
+def purpose_category(purpose):
+    purpose = str(purpose or '').strip().lower()
+    if purpose in PURPOSE_SCORES:
+        return purpose
+    for category, pattern in _PURPOSE_PATTERNS:
+        if pattern.search(purpose):
+            return category
+    return 'other'
+
+
+def parse_application(data):
+    """Numeric fields of one application as ints, or raise ValueError like the route did."""
+    missing = [field for field in REQUIRED_FIELDS if field not in data]
+    if missing:
+        raise ValueError(f"Missing field: {missing[0]}")
+    try:
+        values = {name: max(-NUMERIC_LIMIT, min(int(data[field]), NUMERIC_LIMIT))
+                  for field, name in NUMERIC_FIELDS.items()}
+    except (ValueError, TypeError, OverflowError):
+        raise ValueError("Invalid numeric input")
+    values['default_history'] = data['defaultHistory'] == 'yes'
+    values['loan_purpose'] = data['loanPurpose']
+    return values
+
+
+def emi(principal, months, annual_rate=ELIGIBILITY_ANNUAL_RATE):
+    """Equal monthly instalment for each principal/months pair (arrays)."""
+    principal = np.asarray(principal, dtype=np.float64)
+    months = np.maximum(np.asarray(months, dtype=np.float64), 1)
+    rate = annual_rate / 12
+    if rate == 0:
+        return principal / months
+    growth = (1 + rate) ** months
+    return principal * rate * growth / (growth - 1)
+
+
+def score(applications):
+    """Score parsed applications (dicts from parse_application) in one pass.
+
+    Returns a dict of arrays: decision ('approved', 'rejected', 'pending' or 'review'),
+    rule (index into RULE_REASONS, -1 when the scorecard decided), score, emi, dti and
+    category. 'review' marks the uncertainty band.
+    """
+    n = len(applications)
+    column = lambda name, dtype: np.fromiter((a[name] for a in applications), dtype=dtype, count=n)
+    age = column('age', np.int64)
+    income = column('monthly_income', np.float64)
+    existing = column('existing_loan_amount', np.float64)
+    amount = column('loan_amount', np.float64)
+    tenure = column('loan_tenure', np.int64)
+    defaulted = column('default_history', bool)
+
+    # Purposes repeat a lot; categorise each distinct value once
+    purposes, inverse = np.unique(np.array([str(a['loan_purpose']) for a in applications], dtype=object),
+                                  return_inverse=True)
+    categories = np.array([purpose_category(p) for p in purposes], dtype=object)[inverse]
+    purpose_score = np.array([PURPOSE_SCORES[c] for c in categories], dtype=np.float64)
+
+    rule_hits = [
+        (age < 18) | (age > 65),
+        income < 3000,
+        (amount < 500) | (amount > 150000),
+        amount <= 10000,
+        existing > 3 * income,
+        defaulted,
+        tenure < 1,
+    ]
+    rule = np.select(rule_hits, np.arange(len(RULE_REASONS)), default=-1)
+
+    safe_income = np.maximum(income, 1)
+    instalment = emi(amount, tenure)
+    dti = (instalment + emi(existing, EXISTING_LOAN_MONTHS)) / safe_income
+    dti_score = np.clip(1 - dti / ELIGIBILITY_MAX_DTI, 0, 1)
+    leverage_score = np.clip(1 - existing / (3 * safe_income), 0, 1)
+    total = WEIGHTS['dti'] * dti_score + WEIGHTS['leverage'] * leverage_score + WEIGHTS['purpose'] * purpose_score
+    # Repayments above the DTI limit are not affordable whatever the purpose
+    total = np.where(dti > ELIGIBILITY_MAX_DTI, 0.0, total)
+
+    scored = np.select(
+        [total >= ELIGIBILITY_APPROVE_SCORE, total >= ELIGIBILITY_REVIEW_SCORE],
+        ['approved', 'review'],
+        default='rejected'
+    ).astype(object)
+    rule_decisions = np.array([decision for _, decision, _ in RULE_REASONS], dtype=object)
+    decision = np.where(rule >= 0, rule_decisions[np.maximum(rule, 0)], scored)
+
+    return {
+        "decision": decision,
+        "rule": rule,
+        "score": np.round(total, 3),
+        "emi": np.round(instalment, 2),
+        "dti": np.round(dti, 3),
+        "category": categories,
+        "tenure": tenure,
+    }
+
+
+def _scorecard_reason(decision, emi_value, dti_value, tenure, category):
+    if decision == 'approved':
+        return (f"Estimated EMI of ₹{emi_value:,.0f} over {tenure} months keeps repayments at {dti_value:.0%} "
+                f"of monthly income, which is affordable for the loan purpose ({category}).")
+    if decision == 'rejected' and dti_value > ELIGIBILITY_MAX_DTI:
+        return (f"Estimated EMI of ₹{emi_value:,.0f} over {tenure} months would take repayments to "
+                f"{dti_value:.0%} of monthly income, above the {ELIGIBILITY_MAX_DTI:.0%} limit.")
+    if decision == 'rejected':
+        return (f"Repayments of {dti_value:.0%} of monthly income and existing loans leave too little margin "
+                f"for the loan purpose ({category}).")
+    return "Application is borderline on repayment capacity. Additional review required."
+
+
+def results(scored):
+    """One result dict per application; 'review' becomes 'pending' with review=True."""
+    out = []
+    for i in range(len(scored['decision'])):
+        decision, rule = scored['decision'][i], int(scored['rule'][i])
+        result = {
+            "status": 'pending' if decision == 'review' else decision,
+            "reason": RULE_REASONS[rule][2] if rule >= 0 else _scorecard_reason(
+                decision, float(scored['emi'][i]), float(scored['dti'][i]), int(scored['tenure'][i]),
+                scored['category'][i]
+            ),
+            "decided_by": 'rules' if rule >= 0 else 'scorecard',
+            "review": bool(decision == 'review'),
+        }
+        if rule < 0:
+            result.update({
+                "score": float(scored['score'][i]),
+                "emi": float(scored['emi'][i]),
+                "dti": float(scored['dti'][i]),
+                "purpose_category": scored['category'][i],
+            })
+        out.append(result)
+    return out
+
+
+def evaluate(applications):
+    """Score parsed applications and return their result dicts."""
+    if not applications:
+        return []
+    return results(score(applications))
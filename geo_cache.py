@@ -0,0 +1,178 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+GEOCODE_URL = "https://maps.googleapis.com/maps/api/geocode/json"
+PLACES_URL = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
+
+GEO_CACHE_PATH = os.getenv('GEO_CACHE_PATH', 'geo_cache.db')
+GEOCODE_TTL = int(os.getenv('GEOCODE_CACHE_TTL', 30 * 24 * 3600))
+PLACES_TTL = int(os.getenv('PLACES_CACHE_TTL', 7 * 24 * 3600))
+GEOHASH_PRECISION = int(os.getenv('PLACES_GEOHASH_PRECISION', 6))
+HTTP_TIMEOUT = (3.05, 10)
+
+_GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# One pooled session for all Google Maps calls
+http = requests.Session()
+http.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=2))
+
+
+def geohash_encode(lat, lng, precision=GEOHASH_PRECISION):
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, value = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits <<= 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_ALPHABET[bits])
+            bits, bit_count = 0, 0
+    return ''.join(chars)
+
+
+def geohash_center(cell):
+    """Centre (lat, lng) of a geohash cell."""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in cell:
+        bits = _GEOHASH_ALPHABET.index(char)
+        for shift in range(4, -1, -1):
+            rng = lng_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if (bits >> shift) & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return (lat_range[0] + lat_range[1]) / 2, (lng_range[0] + lng_range[1]) / 2
+
+
+def normalize_address(*parts):
+    return ', '.join(re.sub(r'\s+', ' ', part).strip().lower() for part in parts)
+
+
+class GeoCache:
+    """Persistent key/value store with per-entry expiry for Maps API results."""
+
+    def __init__(self, path=GEO_CACHE_PATH):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS geo_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        ''')
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute(
+            'SELECT value FROM geo_cache WHERE key = ? AND expires_at > ?', (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value, ttl):
+        conn = self._conn()
+        conn.execute(
+            'INSERT OR REPLACE INTO geo_cache (key, value, expires_at) VALUES (?, ?, ?)',
+            (key, json.dumps(value), time.time() + ttl)
+        )
+        conn.commit()
+
+
+_cache = None
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = GeoCache()
+    return _cache
+
+
+def geocode(location, district, state, api_key):
+    """Return {'lat', 'lng'} for the address, or None if Google cannot geocode it."""
+    key = 'geocode:' + normalize_address(location, district, state)
+    cached = get_cache().get(key)
+    if cached is not None:
+        metrics.incr('geocode_cache_hits')
+        return cached
+    metrics.incr('geocode_cache_misses')
+
+    address = f"{location}, {district}, {state}, India"
+    data = http.get(GEOCODE_URL, params={'address': address, 'key': api_key}, timeout=HTTP_TIMEOUT).json()
+    if data.get('status') != 'OK' or not data.get('results'):
+        logger.warning(f"Geocoding failed for '{address}': {data.get('status')}")
+        return None
+
+    location = data['results'][0]['geometry']['location']
+    result = {"lat": location['lat'], "lng": location['lng']}
+    get_cache().set(key, result, GEOCODE_TTL)
+    return result
+
+
+def nearby_banks(lat, lng, api_key, radius=10000, place_type='bank'):
+    """Banks near (lat, lng), shared by every request that falls in the same geohash cell.
+
+    Returns None if the Places API does not answer with OK.
+    """
+    cell = geohash_encode(lat, lng)
+    key = f"places:{cell}:{radius}:{place_type}"
+    cached = get_cache().get(key)
+    if cached is not None:
+        metrics.incr('places_cache_hits')
+        return cached
+    metrics.incr('places_cache_misses')
+
+    # Query from the cell centre so the cached answer is the same for the whole cell
+    center_lat, center_lng = geohash_center(cell)
+    data = http.get(PLACES_URL, params={
+        'location': f"{center_lat},{center_lng}",
+        'radius': radius,
+        'type': place_type,
+        'key': api_key
+    }, timeout=HTTP_TIMEOUT).json()
+    if data.get('status') != 'OK':
+        logger.warning(f"Places search failed for cell {cell}: {data.get('status')}")
+        return None
+
+    banks = [
+        {
+            "name": place['name'],
+            "address": place.get('vicinity', 'Address not available'),
+            "lat": place['geometry']['location']['lat'],
+            "lng": place['geometry']['location']['lng']
+        }
+        for place in data['results']
+    ]
+    get_cache().set(key, banks, PLACES_TTL)
+    return banks
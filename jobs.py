@@ -0,0 +1,178 @@
+"""SQLite-backed background jobs for the slow endpoints.
+
+A route submits (kind, payload) and returns the job id at once; worker threads in this
+process claim queued jobs from users.db, run the handler registered for the kind and
+store its (payload, status) result. Failures and 5xx results are retried with
+exponential backoff; a job left 'running' by a dead worker is reclaimed after
+JOB_LEASE_SECONDS. Submitting the same input again while it is queued, running or
+recently done returns the existing job, except for kinds registered with
+side_effects=True, which run every time they are submitted.
+"""
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+
+import db
+import metrics
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+JOB_RETRY_BASE = float(os.getenv('JOB_RETRY_BASE', 2.0))
+JOB_LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', 300))
+JOB_DEDUP_SECONDS = int(os.getenv('JOB_DEDUP_SECONDS', 600))
+POLL_INTERVAL = 1.0
+MAX_WAIT = 30
+
+_handlers = {}
+_side_effects = set()
+_workers = []
+_wakeup = threading.Event()
+_finished = threading.Condition()
+
+
+def register(kind, handler, side_effects=False):
+    """handler(payload) -> (result_payload, status) runs the job in a worker thread.
+
+    side_effects=True marks a kind that writes data (e.g. records a bill), so resubmitting
+    the same input is a new job rather than a duplicate.
+    """
+    _handlers[kind] = handler
+    if side_effects:
+        _side_effects.add(kind)
+
+
+def input_hash(kind, payload):
+    return hashlib.sha256(f"{kind}:{json.dumps(payload, sort_keys=True)}".encode('utf-8')).hexdigest()
+
+
+def submit(kind, payload, max_attempts=JOB_MAX_ATTEMPTS):
+    """Queue a job, or return the id of an identical queued/running/recent one."""
+    digest = input_hash(kind, payload)
+    dedup = kind not in _side_effects
+
+    def enqueue(conn):
+        now = time.time()
+        existing = dedup and conn.execute(db.SELECT_DUPLICATE_JOB, (digest, now - JOB_DEDUP_SECONDS)).fetchone()
+        if existing:
+            return existing[0], False
+        job_id = uuid.uuid4().hex
+        conn.execute(db.INSERT_JOB, (job_id, kind, digest, json.dumps(payload), max_attempts, now, now))
+        return job_id, True
+
+    job_id, created = db.transaction(enqueue)
+    if created:
+        metrics.incr('jobs_submitted')
+        _wakeup.set()
+    else:
+        metrics.incr('jobs_deduplicated')
+    return job_id
+
+
+def get(job_id):
+    row = db.query_one(db.SELECT_JOB, (job_id,))
+    if row is None:
+        return None
+    job_id, kind, status, attempts, result, result_status, error, created_at, started_at, finished_at = row
+    return {
+        "job_id": job_id,
+        "kind": kind,
+        "status": status,
+        "attempts": attempts,
+        "result": json.loads(result) if result else None,
+        "result_status": result_status,
+        "error": error,
+        "created_at": created_at,
+        "started_at": started_at,
+        "finished_at": finished_at
+    }
+
+
+def wait(job_id, timeout):
+    """get(job_id), waiting up to timeout seconds for the job to finish (long-poll)."""
+    deadline = time.monotonic() + min(timeout, MAX_WAIT)
+    while True:
+        job = get(job_id)
+        remaining = deadline - time.monotonic()
+        if job is None or job['status'] in ('done', 'failed') or remaining <= 0:
+            return job
+        # Woken early by local workers; the timeout also catches jobs finished by other processes
+        with _finished:
+            _finished.wait(min(remaining, 0.5))
+
+
+def _claim():
+    now = time.time()
+    row = db.transaction(lambda conn: conn.execute(db.CLAIM_JOB, (now, now, now - JOB_LEASE_SECONDS)).fetchone())
+    if row is None:
+        return None
+    job_id, kind, payload, attempts, max_attempts, created_at = row
+    if attempts == 1:
+        metrics.observe('job_queue_seconds', now - created_at)
+    return job_id, kind, json.loads(payload), attempts, max_attempts, created_at
+
+
+def _run(job_id, kind, payload, attempts, max_attempts, created_at):
+    started = time.time()
+    try:
+        handler = _handlers[kind]
+        result, status = handler(payload)
+        error = result.get('error') if status >= 500 else None
+    except Exception as e:
+        logger.error(f"Job {job_id} ({kind}) raised: {e}")
+        result, status, error = None, None, str(e)
+    metrics.observe('job_run_seconds', time.time() - started)
+
+    if error is not None and attempts < max_attempts:
+        delay = JOB_RETRY_BASE * (2 ** (attempts - 1)) * (1 + random.random() / 2)
+        logger.warning(f"Job {job_id} ({kind}) failed attempt {attempts}/{max_attempts}, retrying in {delay:.1f}s: {error}")
+        db.execute(db.RETRY_JOB, (time.time() + delay, error, job_id))
+        metrics.incr('jobs_retried')
+        return
+
+    finished = time.time()
+    job_status = 'failed' if error is not None else 'done'
+    db.execute(db.FINISH_JOB, (job_status, json.dumps(result) if result is not None else None, status,
+                               error, finished, job_id))
+    metrics.incr(f"jobs_{job_status}")
+    metrics.observe('job_total_seconds', finished - created_at)
+    with _finished:
+        _finished.notify_all()
+
+
+def _work():
+    while True:
+        try:
+            job = _claim()
+        except Exception as e:
+            logger.error(f"Job claim failed: {e}")
+            job = None
+        if job is None:
+            _wakeup.wait(POLL_INTERVAL)
+            _wakeup.clear()
+            continue
+        try:
+            _run(*job)
+        except Exception as e:
+            # The lease expires and another attempt picks the job up
+            logger.error(f"Job {job[0]} could not be finished: {e}")
+
+
+def start(workers=JOB_WORKERS):
+    """Start the local worker threads once per process."""
+    if _workers:
+        return
+    for number in range(workers):
+        thread = threading.Thread(target=_work, name=f"job-worker-{number}", daemon=True)
+        thread.start()
+        _workers.append(thread)
+
+
+metrics.gauge('jobs_queued', lambda: db.query_one(db.COUNT_JOBS_BY_STATUS, ('queued',))[0])
+metrics.gauge('jobs_running', lambda: db.query_one(db.COUNT_JOBS_BY_STATUS, ('running',))[0])
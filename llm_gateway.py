@@ -0,0 +1,365 @@
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from langchain_core.messages import AIMessage
+
+import metrics
+import structured_output
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_prompt(prompt):
+    """Collapse whitespace so the same prompt with different indentation shares a cache entry."""
+    return re.sub(r'\s+', ' ', prompt).strip()
+
+
+def cache_key(prompt, model, temperature):
+    """Content-addressed key for a prompt sent to a given model/temperature."""
+    raw = json.dumps([normalize_prompt(prompt), model, temperature], ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def parses_as(schema):
+    """Cacheable predicate for completions holding complete JSON that is valid under schema.
+
+    A truncated completion is not cached even though structured_output can recover part
+    of it, and neither is one the route would reject (e.g. an unknown status), so the
+    next request generates the answer again instead of reusing a bad one.
+    """
+    def cacheable(content):
+        try:
+            if not structured_output.loads(content)[1]:
+                return False
+            structured_output.parse(content, schema)
+        except ValueError:
+            return False
+        return True
+    return cacheable
+
+
+def _step(method, value):
+    """Advance a flow with flow.send or flow.throw: (True, result) once it has returned,
+    else (False, the (prompt, cacheable) it yielded)."""
+    try:
+        return False, method(value)
+    except StopIteration as stop:
+        return True, stop.value
+
+
+async def _astep(method, value):
+    return _step(method, value)
+
+
+async def _step_in_thread(method, value):
+    # StopIteration cannot cross a Future, so _step turns it into a return value
+    return await asyncio.to_thread(_step, method, value)
+
+
+class MemoryCache:
+    """In-process LRU cache with per-entry TTL."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCache:
+    """On-disk LRU cache with per-entry TTL, shared by every worker process on the box."""
+
+    def __init__(self, path='llm_cache.db', max_entries=10000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache (last_used)')
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._conn()
+        row = conn.execute('SELECT value, expires_at FROM llm_cache WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        now = time.time()
+        if expires_at < now:
+            conn.execute('DELETE FROM llm_cache WHERE key = ?', (key,))
+            conn.commit()
+            return None
+        conn.execute('UPDATE llm_cache SET last_used = ? WHERE key = ?', (now, key))
+        conn.commit()
+        return value
+
+    def set(self, key, value, ttl):
+        conn = self._conn()
+        now = time.time()
+        conn.execute(
+            'INSERT OR REPLACE INTO llm_cache (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)',
+            (key, value, now + ttl, now)
+        )
+        conn.execute('''
+            DELETE FROM llm_cache WHERE key IN (
+                SELECT key FROM llm_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+            )
+        ''', (self.max_entries,))
+        conn.commit()
+
+    def delete(self, key):
+        conn = self._conn()
+        conn.execute('DELETE FROM llm_cache WHERE key = ?', (key,))
+        conn.commit()
+
+    def clear(self):
+        conn = self._conn()
+        conn.execute('DELETE FROM llm_cache')
+        conn.commit()
+
+
+def make_cache(backend='memory', path='llm_cache.db', max_entries=1024):
+    """Build a cache backend by name ('memory', 'sqlite' or 'none')."""
+    backend = (backend or 'memory').lower()
+    if backend == 'none':
+        return None
+    if backend == 'sqlite':
+        return SQLiteCache(path, max_entries=max_entries)
+    if backend != 'memory':
+        logger.warning(f"Unknown LLM cache backend '{backend}', using in-memory cache")
+    return MemoryCache(max_entries=max_entries)
+
+
+class LLMGateway:
+    """Single entry point for Gemini calls; serves repeated prompts from the cache."""
+
+    def __init__(self, llm, cache=None, ttl=6 * 3600):
+        self.llm = llm
+        self.cache = cache
+        self.ttl = ttl
+        self.model = getattr(llm, 'model', '')
+        self.temperature = getattr(llm, 'temperature', None)
+
+    def key(self, prompt):
+        return cache_key(prompt, self.model, self.temperature)
+
+    def invoke(self, prompt, ttl=None, cacheable=None):
+        """Return the completion for prompt, calling the model only on a cache miss.
+
+        cacheable is an optional predicate on the completion text; responses it rejects
+        (e.g. malformed JSON) are returned but not stored.
+        """
+        key = self.key(prompt)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+        started = time.perf_counter()
+        response = self.llm.invoke(prompt)
+        metrics.observe('llm_call_seconds', time.perf_counter() - started)
+        self._store(key, response, ttl, cacheable)
+        return response
+
+    async def ainvoke(self, prompt, ttl=None, cacheable=None):
+        """Async variant of invoke(); the worker is free while Gemini is generating.
+
+        Cache reads and writes run in a worker thread, since the SQLite backend can block
+        on a locked database.
+        """
+        key = self.key(prompt)
+        cached = await asyncio.to_thread(self._lookup, key)
+        if cached is not None:
+            return cached
+        started = time.perf_counter()
+        response = await self.llm.ainvoke(prompt)
+        metrics.observe('llm_call_seconds', time.perf_counter() - started)
+        await asyncio.to_thread(self._store, key, response, ttl, cacheable)
+        return response
+
+    def stream(self, prompt, ttl=None, cacheable=None):
+        """Yield completion text as Gemini produces it; a cache hit is yielded in one piece."""
+        key = self.key(prompt)
+        cached = self._lookup(key)
+        if cached is not None:
+            yield cached.content
+            return
+        started = time.perf_counter()
+        parts = []
+        for chunk in self.llm.stream(prompt):
+            if not chunk.content:
+                continue
+            if not parts:
+                metrics.observe('llm_ttft_seconds', time.perf_counter() - started)
+            parts.append(chunk.content)
+            yield chunk.content
+        metrics.observe('llm_call_seconds', time.perf_counter() - started)
+        self._store(key, AIMessage(content=''.join(parts)), ttl, cacheable)
+
+    async def astream(self, prompt, ttl=None, cacheable=None):
+        key = self.key(prompt)
+        cached = await asyncio.to_thread(self._lookup, key)
+        if cached is not None:
+            yield cached.content
+            return
+        started = time.perf_counter()
+        parts = []
+        async for chunk in self.llm.astream(prompt):
+            if not chunk.content:
+                continue
+            if not parts:
+                metrics.observe('llm_ttft_seconds', time.perf_counter() - started)
+            parts.append(chunk.content)
+            yield chunk.content
+        metrics.observe('llm_call_seconds', time.perf_counter() - started)
+        await asyncio.to_thread(self._store, key, AIMessage(content=''.join(parts)), ttl, cacheable)
+
+    def run(self, flow):
+        """Drive a route flow synchronously and return its (payload, status).
+
+        A flow is a generator that yields (prompt, cacheable) whenever it needs the model
+        and receives the response back; model errors are raised inside the flow so its own
+        error handling applies unchanged.
+        """
+        try:
+            prompt, cacheable = next(flow)
+            while True:
+                try:
+                    response = self.invoke(prompt, cacheable=cacheable)
+                except Exception as e:
+                    prompt, cacheable = flow.throw(e)
+                else:
+                    prompt, cacheable = flow.send(response)
+        except StopIteration as stop:
+            return stop.value
+
+    def stream_flow(self, flow):
+        """Drive a single-prompt flow, yielding ('token', text) events while the model
+        generates and a final ('done', (payload, status)) once the flow has finished.
+        """
+        try:
+            prompt, cacheable = next(flow)
+        except StopIteration as stop:
+            yield 'done', stop.value
+            return
+        parts = []
+        try:
+            for text in self.stream(prompt, cacheable=cacheable):
+                parts.append(text)
+                yield 'token', text
+        except Exception as e:
+            try:
+                flow.throw(e)
+            except StopIteration as stop:
+                yield 'done', stop.value
+            return
+        try:
+            flow.send(AIMessage(content=''.join(parts)))
+        except StopIteration as stop:
+            yield 'done', stop.value
+
+    async def astream_flow(self, flow, blocking=False):
+        """Async counterpart of stream_flow(); blocking is as for arun()."""
+        step = _step_in_thread if blocking else _astep
+        done, value = await step(flow.send, None)
+        if done:
+            yield 'done', value
+            return
+        prompt, cacheable = value
+        parts = []
+        try:
+            async for text in self.astream(prompt, cacheable=cacheable):
+                parts.append(text)
+                yield 'token', text
+        except Exception as e:
+            done, value = await step(flow.throw, e)
+            if done:
+                yield 'done', value
+            return
+        done, value = await step(flow.send, AIMessage(content=''.join(parts)))
+        if done:
+            yield 'done', value
+
+    async def arun(self, flow, blocking=False):
+        """Async counterpart of run(), used by the ASGI entry point.
+
+        blocking=True runs the flow's own code between prompts (file parsing, hashing,
+        database writes) in a worker thread so it does not hold up the event loop.
+        """
+        step = _step_in_thread if blocking else _astep
+        done, value = await step(flow.send, None)
+        while not done:
+            prompt, cacheable = value
+            try:
+                response = await self.ainvoke(prompt, cacheable=cacheable)
+            except Exception as e:
+                done, value = await step(flow.throw, e)
+            else:
+                done, value = await step(flow.send, response)
+        return value
+
+    def _lookup(self, key):
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                metrics.incr('llm_cache_hits')
+                logger.debug(f"LLM cache hit {key[:12]}")
+                return AIMessage(content=cached)
+        metrics.incr('llm_cache_misses')
+        return None
+
+    def _store(self, key, response, ttl, cacheable):
+        content = response.content
+        if self.cache is not None and isinstance(content, str) and content.strip():
+            if cacheable is None or cacheable(content):
+                self.cache.set(key, content, self.ttl if ttl is None else ttl)
+
+    def invalidate(self, prompt):
+        if self.cache is not None:
+            self.cache.delete(self.key(prompt))
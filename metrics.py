@@ -0,0 +1,58 @@
+import threading
+from collections import defaultdict, deque
+
+# Process-local counters and timing summaries, exposed as JSON on /metrics
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_counts = defaultdict(int)
+_sums = defaultdict(float)
+_samples = defaultdict(lambda: deque(maxlen=1000))
+_gauges = {}
+
+
+def incr(name, value=1):
+    with _lock:
+        _counters[name] += value
+
+
+def observe(name, value):
+    """Record one measurement (e.g. a latency in seconds)."""
+    with _lock:
+        _counts[name] += 1
+        _sums[name] += value
+        _samples[name].append(value)
+
+
+def gauge(name, fn):
+    """Report fn() under name on every snapshot (e.g. a queue depth read on demand)."""
+    with _lock:
+        _gauges[name] = fn
+
+
+def _percentile(values, pct):
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def snapshot():
+    with _lock:
+        counters = dict(_counters)
+        timings = {}
+        for name, samples in _samples.items():
+            values = sorted(samples)
+            timings[name] = {
+                "count": _counts[name],
+                "avg": round(_sums[name] / _counts[name], 4),
+                "p50": round(_percentile(values, 50), 4),
+                "p95": round(_percentile(values, 95), 4),
+                "p99": round(_percentile(values, 99), 4),
+                "max": round(values[-1], 4)
+            }
+        gauges = dict(_gauges)
+    gauge_values = {}
+    for name, fn in gauges.items():
+        try:
+            gauge_values[name] = fn()
+        except Exception:
+            gauge_values[name] = None
+    return {"counters": counters, "timings": timings, "gauges": gauge_values}
@@ -0,0 +1,70 @@
+import logging
+import os
+import time
+
+import PyPDF2
+
+logger = logging.getLogger(__name__)
+
+# The prompts only ever see the first PDF_CHAR_BUDGET characters of a document
+PDF_CHAR_BUDGET = int(os.getenv('PDF_CHAR_BUDGET', 1000))
+PDF_MAX_PAGES = int(os.getenv('PDF_MAX_PAGES', 20))
+PDF_TIME_BUDGET = float(os.getenv('PDF_TIME_BUDGET', 3.0))
+# How deep to follow Form XObjects nested inside each other when looking for fonts
+XOBJECT_DEPTH = 4
+
+
+def _has_text(page):
+    """False for pages without fonts (scans/photos), which extract_text() would only waste time on."""
+    return _uses_fonts(page.get('/Resources'))
+
+
+def _uses_fonts(resources, depth=0):
+    """True if resources, or a Form XObject they draw (text can live only there), have a font."""
+    if resources is None:
+        return False
+    resources = resources.get_object()
+    fonts = resources.get('/Font')
+    if fonts is not None and len(fonts.get_object()) > 0:
+        return True
+    xobjects = resources.get('/XObject')
+    if xobjects is None or depth >= XOBJECT_DEPTH:
+        return False
+    for xobject in xobjects.get_object().values():
+        xobject = xobject.get_object()
+        if xobject.get('/Subtype') == '/Form' and _uses_fonts(xobject.get('/Resources'), depth + 1):
+            return True
+    return False
+
+
+def iter_pages(stream, max_pages=PDF_MAX_PAGES, time_budget=PDF_TIME_BUDGET):
+    """Yield the text of each page in order, skipping image-only pages.
+
+    Stops after extracting max_pages pages or once time_budget seconds have been spent.
+    """
+    started = time.monotonic()
+    reader = PyPDF2.PdfReader(stream, strict=False)
+    extracted = 0
+    for number, page in enumerate(reader.pages):
+        if extracted >= max_pages:
+            break
+        if time.monotonic() - started > time_budget:
+            logger.warning(f"PDF text extraction stopped at page {number}: time budget of {time_budget}s spent")
+            break
+        if not _has_text(page):
+            continue
+        extracted += 1
+        text = page.extract_text()
+        if text:
+            yield text
+
+
+def extract_text(stream, char_budget=PDF_CHAR_BUDGET, max_pages=PDF_MAX_PAGES, time_budget=PDF_TIME_BUDGET):
+    """Text of the leading pages, parsing only as many as needed to fill char_budget characters."""
+    parts, length = [], 0
+    for text in iter_pages(stream, max_pages=max_pages, time_budget=time_budget):
+        parts.append(text)
+        length += len(text)
+        if length >= char_budget:
+            break
+    return ''.join(parts)[:char_budget]
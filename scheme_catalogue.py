@@ -0,0 +1,388 @@
+"""Government scheme and insurance catalogue for /find_schemes and /find_insurance.
+
+National schemes are curated below (plus any in SCHEME_CATALOGUE_PATH, a JSON list in
+the same shape); state and district schemes the LLM suggests for a district are written
+back to users.db and served from then on. An in-memory inverted index maps kind:,
+state:, district:, category: and keyword terms (including the Hindi and Kannada names)
+to scheme ids, so a lookup is a few set intersections.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+
+import db
+
+logger = logging.getLogger(__name__)
+
+SCHEME_CATALOGUE_PATH = os.getenv('SCHEME_CATALOGUE_PATH', 'data/schemes.json')
+# How long a district's LLM enrichment counts before it is asked for again
+SCHEME_ENRICH_SECONDS = int(os.getenv('SCHEME_ENRICH_SECONDS', 30 * 24 * 3600))
+SCHEME_FIELDS = ['name', 'description', 'eligibility', 'link', 'states', 'districts', 'launch_date']
+
+CURATED_SCHEMES = [
+    {
+        "kind": "scheme",
+        "name": "MGNREGA",
+        "aliases": ["Mahatma Gandhi National Rural Employment Guarantee Act", "NREGA"],
+        "names": {"hi": "महात्मा गांधी राष्ट्रीय ग्रामीण रोजगार गारंटी योजना",
+                  "kn": "ಮಹಾತ್ಮ ಗಾಂಧಿ ರಾಷ್ಟ್ರೀಯ ಗ್ರಾಮೀಣ ಉದ್ಯೋಗ ಖಾತರಿ ಯೋಜನೆ"},
+        "description": "Guarantees 100 days of wage employment per year to rural households for unskilled manual work.",
+        "eligibility": "Rural households whose adult members are willing to do unskilled manual work.",
+        "link": "https://nrega.nic.in",
+        "launch_date": "2006-02-02",
+        "categories": ["employment", "rural"],
+        "keywords": ["job card", "wages", "work"]
+    },
+    {
+        "kind": "scheme",
+        "name": "Pradhan Mantri Mudra Yojana (PMMY)",
+        "aliases": ["PMMY", "Mudra Loan"],
+        "names": {"hi": "प्रधानमंत्री मुद्रा योजना", "kn": "ಪ್ರಧಾನ ಮಂತ್ರಿ ಮುದ್ರಾ ಯೋಜನೆ"},
+        "description": "Collateral-free loans up to ₹10 lakh (Shishu, Kishore and Tarun) through banks, MFIs and NBFCs "
+                       "for non-farm micro and small enterprises.",
+        "eligibility": "Individuals, proprietors and small businesses in manufacturing, trading or services.",
+        "link": "https://www.mudra.org.in",
+        "launch_date": "2015-04-08",
+        "categories": ["credit", "business"],
+        "keywords": ["loan", "microloan", "shishu", "kishore", "tarun", "self employment"]
+    },
+    {
+        "kind": "scheme",
+        "name": "PM-KISAN",
+        "aliases": ["Pradhan Mantri Kisan Samman Nidhi"],
+        "names": {"hi": "प्रधानमंत्री किसान सम्मान निधि", "kn": "ಪ್ರಧಾನ ಮಂತ್ರಿ ಕಿಸಾನ್ ಸಮ್ಮಾನ್ ನಿಧಿ"},
+        "description": "Income support of ₹6,000 a year paid in three instalments directly to farmer families' bank accounts.",
+        "eligibility": "Landholding farmer families, subject to the scheme's exclusion criteria.",
+        "link": "https://pmkisan.gov.in",
+        "launch_date": "2019-02-24",
+        "categories": ["agriculture", "income support"],
+        "keywords": ["farmer", "kisan", "direct benefit transfer"]
+    },
+    {
+        "kind": "scheme",
+        "name": "Pradhan Mantri Awaas Yojana - Gramin (PMAY-G)",
+        "aliases": ["PMAY-G", "PMAY Gramin"],
+        "names": {"hi": "प्रधानमंत्री आवास योजना - ग्रामीण", "kn": "ಪ್ರಧಾನ ಮಂತ್ರಿ ಆವಾಸ್ ಯೋಜನೆ - ಗ್ರಾಮೀಣ"},
+        "description": "Financial assistance to build pucca houses with basic amenities for rural households.",
+        "eligibility": "Houseless rural households and those living in kutcha or dilapidated houses, as per SECC data.",
+        "link": "https://pmayg.nic.in",
+        "launch_date": "2016-11-20",
+        "categories": ["housing", "rural"],
+        "keywords": ["house", "home", "awas"]
+    },
+    {
+        "kind": "scheme",
+        "name": "Pradhan Mantri Jan Dhan Yojana (PMJDY)",
+        "aliases": ["PMJDY", "Jan Dhan"],
+        "names": {"hi": "प्रधानमंत्री जन धन योजना", "kn": "ಪ್ರಧಾನ ಮಂತ್ರಿ ಜನ ಧನ ಯೋಜನೆ"},
+        "description": "Zero-balance basic savings bank accounts with a RuPay debit card, accident cover and an overdraft facility.",
+        "eligibility": "Any Indian citizen aged 10 or above without a bank account.",
+        "link": "https://pmjdy.gov.in",
+        "launch_date": "2014-08-28",
+        "categories": ["banking", "financial inclusion"],
+        "keywords": ["bank account", "savings", "rupay", "overdraft"]
+    },
+    {
+        "kind": "scheme",
+        "name": "Stand-Up India",
+        "aliases": ["Standup India"],
+        "names": {"hi": "स्टैंड-अप इंडिया", "kn": "ಸ್ಟ್ಯಾಂಡ್-ಅಪ್ ಇಂಡಿಯಾ"},
+        "description": "Bank loans between ₹10 lakh and ₹1 crore for setting up a new (greenfield) enterprise.",
+        "eligibility": "SC/ST and women entrepreneurs aged 18 or above.",
+        "link": "https://www.standupmitra.in",
+        "launch_date": "2016-04-05",
+        "categories": ["credit", "business", "women"],
+        "keywords": ["loan", "entrepreneur", "sc", "st"]
+    },
+    {
+        "kind": "scheme",
+        "name": "PM SVANidhi",
+        "aliases": ["PM Street Vendor's AtmaNirbhar Nidhi"],
+        "names": {"hi": "पीएम स्वनिधि", "kn": "ಪಿಎಂ ಸ್ವನಿಧಿ"},
+        "description": "Collateral-free working capital loans for street vendors, with interest subsidy and digital payment cashback.",
+        "eligibility": "Street vendors with a certificate of vending or recommendation from the urban local body.",
+        "link": "https://pmsvanidhi.mohua.gov.in",
+        "launch_date": "2020-06-01",
+        "categories": ["credit", "business", "urban"],
+        "keywords": ["loan", "street vendor", "working capital"]
+    },
+    {
+        "kind": "scheme",
+        "name": "Pradhan Mantri Ujjwala Yojana (PMUY)",
+        "aliases": ["PMUY", "Ujjwala"],
+        "names": {"hi": "प्रधानमंत्री उज्ज्वला योजना", "kn": "ಪ್ರಧಾನ ಮಂತ್ರಿ ಉಜ್ವಲ ಯೋಜನೆ"},
+        "description": "Deposit-free LPG connections for women from poor households.",
+        "eligibility": "Adult women from poor households without an LPG connection.",
+        "link": "https://www.pmuy.gov.in",
+        "launch_date": "2016-05-01",
+        "categories": ["energy", "women"],
+        "keywords": ["lpg", "gas connection", "cooking"]
+    },
+    {
+        "kind": "scheme",
+        "name": "Atal Pension Yojana (APY)",
+        "aliases": ["APY"],
+        "names": {"hi": "अटल पेंशन योजना", "kn": "ಅಟಲ್ ಪಿಂಚಣಿ ಯೋಜನೆ"},
+        "description": "Guaranteed monthly pension of ₹1,000 to ₹5,000 from age 60, based on the contribution chosen.",
+        "eligibility": "Bank account holders aged 18 to 40 who are not income tax payers.",
+        "link": "https://www.npscra.nsdl.co.in/scheme-details.php",
+        "launch_date": "2015-05-09",
+        "categories": ["pension", "social security"],
+        "keywords": ["old age", "retirement", "unorganised sector"]
+    },
+    {
+        "kind": "scheme",
+        "name": "Sukanya Samriddhi Yojana",
+        "aliases": ["SSY", "Sukanya Samriddhi Account"],
+        "names": {"hi": "सुकन्या समृद्धि योजना", "kn": "ಸುಕನ್ಯಾ ಸಮೃದ್ಧಿ ಯೋಜನೆ"},
+        "description": "Small savings account for a girl child with a government-set interest rate and tax benefits.",
+        "eligibility": "Parents or guardians of a girl child below 10 years of age.",
+        "link": "https://www.indiapost.gov.in",
+        "launch_date": "2015-01-22",
+        "categories": ["savings", "women"],
+        "keywords": ["girl child", "daughter", "education"]
+    },
+    {
+        "kind": "insurance",
+        "name": "Pradhan Mantri Fasal Bima Yojana (PMFBY)",
+        "aliases": ["PMFBY", "Pradhan Mantri Fasal Bima Yojana"],
+        "names": {"hi": "प्रधानमंत्री फसल बीमा योजना", "kn": "ಪ್ರಧಾನ ಮಂತ್ರಿ ಫಸಲ್ ಬಿಮಾ ಯೋಜನೆ"},
+        "description": "Crop insurance against losses from natural calamities, pests and diseases at low farmer premiums.",
+        "eligibility": "Farmers, including sharecroppers and tenant farmers, growing notified crops in notified areas.",
+        "link": "https://pmfby.gov.in",
+        "launch_date": "2016-01-13",
+        "categories": ["crop", "agriculture"],
+        "keywords": ["farmer", "crop loss", "drought", "flood", "fasal"]
+    },
+    {
+        "kind": "insurance",
+        "name": "Pradhan Mantri Jeevan Jyoti Bima Yojana (PMJJBY)",
+        "aliases": ["PMJJBY"],
+        "names": {"hi": "प्रधानमंत्री जीवन ज्योति बीमा योजना", "kn": "ಪ್ರಧಾನ ಮಂತ್ರಿ ಜೀವನ ಜ್ಯೋತಿ ಬಿಮಾ ಯೋಜನೆ"},
+        "description": "One-year renewable life cover of ₹2 lakh for death due to any cause, paid by auto-debit from a bank account.",
+        "eligibility": "Bank or post office account holders aged 18 to 50.",
+        "link": "https://jansuraksha.gov.in",
+        "launch_date": "2015-05-09",
+        "categories": ["life"],
+        "keywords": ["death", "term insurance", "jan suraksha"]
+    },
+    {
+        "kind": "insurance",
+        "name": "Pradhan Mantri Suraksha Bima Yojana (PMSBY)",
+        "aliases": ["PMSBY"],
+        "names": {"hi": "प्रधानमंत्री सुरक्षा बीमा योजना", "kn": "ಪ್ರಧಾನ ಮಂತ್ರಿ ಸುರಕ್ಷಾ ಬಿಮಾ ಯೋಜನೆ"},
+        "description": "One-year renewable accident cover of ₹2 lakh for accidental death or full disability.",
+        "eligibility": "Bank or post office account holders aged 18 to 70.",
+        "link": "https://jansuraksha.gov.in",
+        "launch_date": "2015-05-09",
+        "categories": ["accident"],
+        "keywords": ["disability", "accidental death", "jan suraksha"]
+    },
+    {
+        "kind": "insurance",
+        "name": "Ayushman Bharat PM-JAY",
+        "aliases": ["PM-JAY", "PMJAY", "Ayushman Bharat", "Pradhan Mantri Jan Arogya Yojana"],
+        "names": {"hi": "आयुष्मान भारत प्रधानमंत्री जन आरोग्य योजना", "kn": "ಆಯುಷ್ಮಾನ್ ಭಾರತ್ ಪ್ರಧಾನ ಮಂತ್ರಿ ಜನ ಆರೋಗ್ಯ ಯೋಜನೆ"},
+        "description": "Health cover of ₹5 lakh per family per year for secondary and tertiary hospitalisation at empanelled hospitals.",
+        "eligibility": "Poor and vulnerable families identified from SECC data, and others as notified.",
+        "link": "https://pmjay.gov.in",
+        "launch_date": "2018-09-23",
+        "categories": ["health"],
+        "keywords": ["hospital", "medical", "treatment", "arogya"]
+    },
+]
+
+_SPLIT = re.compile(r"[\s.,;:!?()\[\]/&'\"’\-–—]+")
+_STOPWORDS = {'a', 'an', 'and', 'as', 'by', 'for', 'from', 'in', 'of', 'on', 'or', 'per', 'the', 'to', 'with',
+              'scheme', 'yojana'}
+
+
+def _normalize(text):
+    return re.sub(r'\s+', ' ', str(text or '')).strip().lower()
+
+
+def scheme_key(name):
+    return ''.join(_SPLIT.split(_normalize(name)))
+
+
+def _words(text):
+    return {word for word in _SPLIT.split(_normalize(text)) if len(word) > 1 and word not in _STOPWORDS}
+
+
+def _as_list(value):
+    if isinstance(value, str):
+        return [value]
+    return list(value) if isinstance(value, (list, tuple)) else []
+
+
+class SchemeCatalogue:
+    """Schemes plus an inverted index from terms to positions in self.schemes.
+
+    Posting sets are frozensets that are replaced, never changed in place, so search()
+    can run while sync() indexes new schemes in another thread.
+    """
+
+    def __init__(self):
+        self.schemes = []
+        self.postings = {}
+        self.by_key = {}
+        self.last_row_id = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.schemes)
+
+    def add(self, scheme):
+        """Index a scheme; returns False for a name or alias already in the catalogue."""
+        return self.add_all([scheme]) == 1
+
+    def add_all(self, schemes):
+        """Index schemes, skipping names or aliases already in the catalogue; returns how
+        many were added. Each posting set touched is swapped for a new one once, at the end."""
+        added = defaultdict(set)
+        count = 0
+        for scheme in schemes:
+            indexed = self._append(scheme)
+            if indexed is None:
+                continue
+            position, terms = indexed
+            for term in terms:
+                added[term].add(position)
+            count += 1
+        for term, positions in added.items():
+            self.postings[term] = self.postings.get(term, frozenset()) | positions
+        return count
+
+    def _append(self, scheme):
+        """(position, index terms) of a newly appended scheme, or None for a duplicate."""
+        kind = scheme.get('kind', 'scheme')
+        keys = {scheme_key(name) for name in [scheme['name']] + _as_list(scheme.get('aliases'))}
+        if any((kind, key) in self.by_key for key in keys):
+            return None
+        position = len(self.schemes)
+        self.schemes.append(scheme)
+        for key in keys:
+            self.by_key[(kind, key)] = position
+
+        states = [_normalize(s) for s in _as_list(scheme.get('states')) or ['All']]
+        districts = [_normalize(d) for d in _as_list(scheme.get('districts')) or ['All']]
+        terms = {f"kind:{kind}"}
+        terms |= {f"state:{s}" for s in states}
+        terms |= {f"district:{d}" for d in districts}
+        terms |= {f"category:{_normalize(c)}" for c in _as_list(scheme.get('categories'))}
+        text = [scheme['name'], scheme.get('description', ''), scheme.get('eligibility', '')]
+        text += _as_list(scheme.get('aliases')) + _as_list(scheme.get('keywords'))
+        text += [_normalize(c) for c in _as_list(scheme.get('categories'))]
+        text += list((scheme.get('names') or {}).values())
+        terms |= {f"word:{word}" for part in text for word in _words(part)}
+        return position, terms
+
+    def search(self, kind, district, state, query=None, category=None, language=None):
+        """Schemes of a kind that apply in the district: national, state-wide and district ones.
+
+        query narrows to schemes sharing a word with it (best overlap first); results are
+        otherwise newest first, like the LLM lists used to be.
+        """
+        state, district = _normalize(state), _normalize(district)
+        found = self.postings.get(f"kind:{kind}", set())
+        found = found & (self.postings.get('state:all', set()) | self.postings.get(f"state:{state}", set()))
+        found = found & (self.postings.get('district:all', set()) | self.postings.get(f"district:{district}", set()))
+        if category:
+            found = found & self.postings.get(f"category:{_normalize(category)}", set())
+
+        scores = defaultdict(int)
+        if query:
+            for word in _words(query):
+                for position in self.postings.get(f"word:{word}", set()) & found:
+                    scores[position] += 1
+            found = set(scores)
+
+        positions = sorted(found, key=lambda p: self.schemes[p].get('launch_date', ''), reverse=True)
+        positions.sort(key=lambda p: scores[p], reverse=True)
+        return [self.to_result(self.schemes[p], language) for p in positions]
+
+    def to_result(self, scheme, language=None):
+        result = {field: scheme.get(field) for field in SCHEME_FIELDS}
+        result['states'] = _as_list(scheme.get('states')) or ['All']
+        result['districts'] = _as_list(scheme.get('districts')) or ['All']
+        local_name = (scheme.get('names') or {}).get(language)
+        if local_name:
+            result['local_name'] = local_name
+        result['source'] = scheme.get('source', 'curated')
+        return result
+
+    def sync(self):
+        """Index schemes written back since the last sync, by this or another process."""
+        rows = db.query(db.SELECT_SCHEMES_SINCE, (self.last_row_id,))
+        with self.lock:
+            rows = [(row_id, data) for row_id, data in rows if row_id > self.last_row_id]
+            if rows:
+                self.add_all(json.loads(data) for _, data in rows)
+                self.last_row_id = rows[-1][0]
+
+
+def _load_curated(catalogue):
+    catalogue.add_all(dict(scheme, states=['All'], districts=['All']) for scheme in CURATED_SCHEMES)
+    if os.path.exists(SCHEME_CATALOGUE_PATH):
+        try:
+            with open(SCHEME_CATALOGUE_PATH, encoding='utf-8') as f:
+                extra = json.load(f)
+            added = catalogue.add_all(scheme for scheme in extra if valid_scheme(scheme))
+            logger.info(f"Loaded {added} schemes from {SCHEME_CATALOGUE_PATH}")
+        except Exception as e:
+            logger.error(f"Failed to load scheme catalogue {SCHEME_CATALOGUE_PATH}: {e}")
+
+
+_catalogue = None
+_catalogue_lock = threading.Lock()
+
+
+def get_catalogue():
+    """The catalogue, built on first use and kept in sync with written-back schemes."""
+    global _catalogue
+    with _catalogue_lock:
+        if _catalogue is None:
+            catalogue = SchemeCatalogue()
+            _load_curated(catalogue)
+            _catalogue = catalogue
+    _catalogue.sync()
+    return _catalogue
+
+
+def valid_scheme(scheme):
+    return isinstance(scheme, dict) and all(field in scheme for field in SCHEME_FIELDS)
+
+
+def needs_enrichment(kind, district, state):
+    row = db.query_one(db.SELECT_SCHEME_COVERAGE, (kind, f"{_normalize(district)}|{_normalize(state)}"))
+    return row is None or time.time() - row[0] > SCHEME_ENRICH_SECONDS
+
+
+def write_back(kind, district, state, schemes):
+    """Store the LLM's schemes for a district and mark the district as enriched.
+
+    Only state and district schemes are kept: national ones come from the curated list,
+    which the LLM tends to repeat under other names. Returns how many were added.
+    """
+    catalogue = get_catalogue()
+    rows = []
+    for scheme in schemes:
+        if not valid_scheme(scheme):
+            continue
+        scheme = dict({field: scheme[field] for field in SCHEME_FIELDS}, kind=kind, source='llm')
+        if 'all' in [_normalize(s) for s in _as_list(scheme['states'])]:
+            continue
+        if (kind, scheme_key(scheme['name'])) not in catalogue.by_key:
+            rows.append((kind, scheme_key(scheme['name']), json.dumps(scheme), time.time()))
+
+    def store(conn):
+        conn.executemany(db.INSERT_SCHEME, rows)
+        conn.execute(db.UPSERT_SCHEME_COVERAGE, (kind, f"{_normalize(district)}|{_normalize(state)}", time.time()))
+
+    db.transaction(store)
+    catalogue.sync()
+    return len(rows)
@@ -0,0 +1,328 @@
+"""Parsing and validation of JSON completions.
+
+parse(content, schema) accepts what Gemini actually returns: ```json fences, a sentence
+before the JSON, and output cut off at max_output_tokens. A truncated completion is
+closed at its last complete value, so a long list keeps every finished item instead of
+failing the request or costing another call. The value is then checked against a
+declarative schema (a small JSON Schema subset): a bad item in a list is dropped and a
+missing or invalid field with a default gets the default.
+
+JsonStream does the same for a completion arriving in chunks; partial_events() turns a
+gateway.stream_flow() into 'partial' results for the streaming endpoints.
+"""
+import copy
+import json
+import logging
+import re
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+_FENCE = re.compile(r'^```(?:json)?\s*|\s*```$')
+_CLOSERS = {'{': '}', '[': ']'}
+
+
+class SchemaError(ValueError):
+    pass
+
+
+class JsonStream:
+    """Incremental scanner over a JSON document arriving in chunks.
+
+    Keeps nesting and string state between feed() calls, so each character is scanned
+    once, and remembers the last offset where the document can be cut and closed.
+    Text before the first { or [ (fences, prose) and after the root value is ignored.
+    """
+
+    def __init__(self):
+        self.text = ''
+        self.pos = 0
+        self.start = None
+        self.end = None
+        self.stack = []
+        self.in_string = False
+        self.escape = False
+        self.cut = None
+
+    @property
+    def complete(self):
+        return self.end is not None
+
+    def _mark(self, offset):
+        self.cut = (offset, ''.join(_CLOSERS[b] for b in reversed(self.stack)))
+
+    def feed(self, chunk):
+        """Scan more text; True if a larger prefix of the document is now usable."""
+        if self.end is not None:
+            return False
+        before = self.cut
+        self.text += chunk
+        text = self.text
+        for i in range(self.pos, len(text)):
+            c = text[i]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif c == '\\':
+                    self.escape = True
+                elif c == '"':
+                    self.in_string = False
+            elif self.start is None:
+                if c in '{[':
+                    self.start = i
+                    self.stack.append(c)
+                    self._mark(i + 1)
+            elif c == '"':
+                self.in_string = True
+            elif c in '{[':
+                self.stack.append(c)
+                self._mark(i + 1)
+            elif c in '}]':
+                self.stack.pop()
+                if not self.stack:
+                    self.end = i + 1
+                    self.cut = (i + 1, '')
+                    break
+                self._mark(i + 1)
+            elif c == ',':
+                self._mark(i)
+        self.pos = len(text) if self.end is None else self.end
+        return self.cut != before
+
+    def value(self):
+        """The document so far, closed at the last complete value; None if nothing yet."""
+        if self.cut is None:
+            return None
+        offset, closers = self.cut
+        try:
+            return json.loads(self.text[self.start:offset] + closers)
+        except ValueError:
+            return None
+
+
+def loads(content):
+    """(value, complete) for a JSON completion, recovering a truncated one.
+
+    Raises ValueError when the completion holds no usable JSON.
+    """
+    text = _FENCE.sub('', content.strip()).strip()
+    try:
+        return json.loads(text), True
+    except ValueError:
+        pass
+    stream = JsonStream()
+    stream.feed(content)
+    value = stream.value()
+    if value is None:
+        raise ValueError("No JSON value in completion")
+    return value, stream.complete
+
+
+def _number(value, path):
+    if isinstance(value, bool):
+        raise SchemaError(f"{path}: expected a number")
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        try:
+            return float(value.replace(',', '').replace('₹', '').strip())
+        except ValueError:
+            pass
+    raise SchemaError(f"{path}: expected a number")
+
+
+def validate(value, schema, partial=False):
+    """Return value checked against schema, or raise SchemaError.
+
+    partial=True accepts a root object that has not got as far as some required fields
+    yet (a truncated or still streaming result): missing arrays become [], other fields
+    are left out, and dropped items are not logged.
+    """
+    return _validate(value, schema, '$', partial, not partial)
+
+
+def _validate(value, schema, path, partial, warn):
+    kind = schema.get('type')
+    if kind == 'object':
+        if not isinstance(value, dict):
+            raise SchemaError(f"{path}: expected an object")
+        result = dict(value)
+        required = schema.get('required', ())
+        properties = schema.get('properties', {})
+        for name in list(properties) + [name for name in required if name not in properties]:
+            field = properties.get(name, {})
+            if name in value:
+                try:
+                    result[name] = _validate(value[name], field, f"{path}.{name}", False, warn)
+                    continue
+                except SchemaError as e:
+                    if 'default' not in field and name in required:
+                        raise
+                    if warn:
+                        logger.warning(str(e))
+                    del result[name]
+            if 'default' in field:
+                result[name] = copy.deepcopy(field['default'])
+            elif name in required:
+                if not partial:
+                    raise SchemaError(f"{path}: missing field '{name}'")
+                if field.get('type') == 'array':
+                    result[name] = []
+        return result
+    if kind == 'array':
+        if not isinstance(value, list):
+            raise SchemaError(f"{path}: expected an array")
+        items = schema.get('items', {})
+        result = []
+        for i, item in enumerate(value):
+            try:
+                result.append(_validate(item, items, f"{path}[{i}]", False, warn))
+            except SchemaError as e:
+                if warn:
+                    logger.warning(f"Dropping invalid item: {e}")
+        return result
+    if kind == 'string':
+        if not isinstance(value, str):
+            raise SchemaError(f"{path}: expected a string")
+        if 'enum' in schema:
+            value = value.strip().lower()
+            if value not in schema['enum']:
+                raise SchemaError(f"{path}: '{value}' is not one of {schema['enum']}")
+        return value
+    if kind == 'number':
+        return _number(value, path)
+    return value
+
+
+def parse(content, schema):
+    """Validated value of a JSON completion; raises ValueError if it is unusable.
+
+    A truncated completion is validated as partial, keeping what was finished, but it
+    must still have every required field other than arrays.
+    """
+    value, complete = loads(content)
+    if not complete:
+        metrics.incr('llm_json_truncated')
+        logger.warning(f"Recovered truncated JSON completion ({len(content)} chars)")
+    result = validate(value, schema, partial=not complete)
+    if not complete and isinstance(result, dict):
+        missing = [name for name in schema.get('required', ()) if name not in result]
+        if missing:
+            raise SchemaError(f"$: completion truncated before field '{missing[0]}'")
+    return result
+
+
+def partial_events(events, schema):
+    """Replace the 'token' events of gateway.stream_flow() with ('partial', value) events
+    carrying the validated result so far, each time it grows."""
+    stream, last = JsonStream(), None
+    for event, data in events:
+        if event != 'token':
+            yield event, data
+        elif stream.feed(data):
+            partial = _partial(stream, schema)
+            if partial is not None and partial != last:
+                last = partial
+                yield 'partial', partial
+
+
+async def apartial_events(events, schema):
+    stream, last = JsonStream(), None
+    async for event, data in events:
+        if event != 'token':
+            yield event, data
+        elif stream.feed(data):
+            partial = _partial(stream, schema)
+            if partial is not None and partial != last:
+                last = partial
+                yield 'partial', partial
+
+
+def _partial(stream, schema):
+    value = stream.value()
+    if value is None:
+        return None
+    try:
+        return validate(value, schema, partial=True)
+    except SchemaError:
+        return None
+
+
+# Response schemas of the LLM-backed routes
+ELIGIBILITY = {
+    "type": "object",
+    "required": ["status", "reason"],
+    "properties": {
+        "status": {"type": "string", "enum": ["approved", "pending", "rejected"]},
+        "reason": {"type": "string"}
+    }
+}
+
+LOCKERS = {
+    "type": "object",
+    "required": ["banks", "center"],
+    "properties": {
+        "banks": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["name", "address", "lat", "lng"],
+                "properties": {"lat": {"type": "number"}, "lng": {"type": "number"}}
+            }
+        },
+        "center": {
+            "type": "object",
+            "required": ["lat", "lng"],
+            "properties": {"lat": {"type": "number"}, "lng": {"type": "number"}}
+        }
+    }
+}
+
+SCHEMES = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "required": ["name", "description", "eligibility", "link", "states", "districts", "launch_date"],
+        "properties": {"name": {"type": "string"}, "launch_date": {"type": "string"}}
+    }
+}
+
+WEATHER = {
+    "type": "object",
+    "required": ["daily_forecast", "weekly_forecast"],
+    "properties": {
+        "daily_forecast": {
+            "type": "array",
+            "items": {"type": "object", "required": ["date", "condition", "temperature", "humidity", "icon"]}
+        },
+        "weekly_forecast": {
+            "type": "array",
+            "items": {"type": "object", "required": ["date", "condition", "min_temp", "max_temp", "icon"]}
+        },
+        "agricultural_tips": {"type": "array", "default": ["No agricultural tips available."]},
+        "weather_alerts": {"type": "string", "default": "No weather alerts available."}
+    }
+}
+
+DOCUMENT_ANALYSIS_LANGUAGE = {
+    "type": "object",
+    "required": ["summary"],
+    "properties": {
+        "summary": {"type": "string"},
+        "required_info": {"type": "array", "items": {"type": "string"}, "default": []},
+        "instructions": {"type": "array", "items": {"type": "string"}, "default": []},
+        "notes": {"type": "string", "default": ""}
+    }
+}
+
+DOCUMENT_ANALYSIS = {
+    "type": "object",
+    "required": ["en", "hi", "kn"],
+    "properties": {lang: DOCUMENT_ANALYSIS_LANGUAGE for lang in ('en', 'hi', 'kn')}
+}
+
+BILL_AMOUNT = {
+    "type": "object",
+    "properties": {"amount": {"type": "number", "default": 0.0}}
+}
@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the top of the repo and import each other as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+
+
+@pytest.fixture
+def users_db(tmp_path, monkeypatch):
+    """A fresh, migrated users.db in tmp_path, with db's pool pointed at it."""
+    monkeypatch.setattr(db, 'pool', db.ConnectionPool(str(tmp_path / 'users.db')))
+    db.init_db()
+    return db
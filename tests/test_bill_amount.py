@@ -0,0 +1,44 @@
+"""Labelled bill texts: the rules must read the amount correctly where they are confident
+("rules": true) and defer to Gemini everywhere else. bench_bill_amount.py reports
+accuracy and throughput over the same fixtures."""
+import json
+import os
+
+import pytest
+
+import bill_amount
+
+with open(os.path.join(os.path.dirname(__file__), 'fixtures', 'bill_texts.json'), encoding='utf-8') as f:
+    FIXTURES = json.load(f)
+
+
+def _rule_hit(text):
+    amount, confidence, _ = bill_amount.extract_amount(text)
+    return amount if amount is not None and confidence >= bill_amount.BILL_RULES_MIN_CONFIDENCE else None
+
+
+@pytest.mark.parametrize('fixture', [f for f in FIXTURES if f['rules']], ids=lambda f: f['name'])
+def test_rules_read_the_labelled_amount(fixture):
+    assert _rule_hit(fixture['text']) == fixture['amount']
+
+
+@pytest.mark.parametrize('fixture', [f for f in FIXTURES if not f['rules']], ids=lambda f: f['name'])
+def test_low_confidence_falls_back_to_gemini(fixture):
+    assert _rule_hit(fixture['text']) is None
+
+
+@pytest.mark.parametrize('text, layout', [
+    ("BESCOM bill", 'bescom'),
+    ("MAHAVITARAN", 'msedcl'),
+    ("BWSSB water charges", 'water'),
+    ("Reliance Jio", 'telecom'),
+    ("Indane cash memo", 'lpg'),
+    ("Kirana store", None),
+])
+def test_detect_layout(text, layout):
+    assert bill_amount.detect_layout(text) == layout
+
+
+def test_amounts_out_of_range_are_ignored():
+    assert bill_amount.extract_amount("Total Amount Payable: Rs. 0.00") == (None, 0.0, None)
+    assert bill_amount.extract_amount("Total Amount Payable: Rs. 99,999,999") == (None, 0.0, None)
@@ -0,0 +1,34 @@
+import json
+
+import bill_analytics
+import bill_cache
+
+
+def _legacy_bill(users_db, user_id, bill_type, amount, bill_date):
+    # Written as older code did, without insert_bill()'s date padding
+    users_db.execute(users_db.INSERT_BILL, (user_id, bill_type, amount, bill_date, None))
+
+
+def test_precompute_matches_the_live_analysis(users_db):
+    users_db.add_bill(1, 'water', 100.0, '2024-01-20')
+    users_db.add_bill(1, 'water', 50.0, '2024-02-03')
+    _legacy_bill(users_db, 1, 'water', 70.0, '2024-1-5')
+    users_db.add_bill(2, 'gas', 900.0, '2024-03-01')
+    _legacy_bill(users_db, None, 'gas', 10.0, '2024-03-01')
+    _legacy_bill(users_db, 'abc', 'gas', 10.0, '2024-03-01')
+
+    assert bill_cache.precompute_range(1, 10) == 2
+
+    for user_id in (1, 2):
+        rows = users_db.query(users_db.SELECT_USER_BILLS, (user_id,))
+        live = bill_cache.build_analysis(*bill_analytics.to_arrays(rows))
+        assert bill_cache.get_cached(user_id) == json.loads(json.dumps(live))
+    assert bill_cache.get_cached(1)['by_type']['water']['peak_months'][0] == "2024-01 (₹170.00)"
+
+
+def test_precompute_all_skips_non_integer_user_ids(users_db):
+    users_db.add_bill(3, 'water', 100.0, '2024-01-20')
+    _legacy_bill(users_db, 'abc', 'gas', 10.0, '2024-03-01')
+    users, _ = bill_cache.precompute_all(workers=1)
+    assert users == 1
+    assert bill_cache.get_cached(3)['total_bills'] == 1
@@ -0,0 +1,44 @@
+import pytest
+
+import bill_import
+
+
+def test_validate_bill():
+    assert bill_import.validate_bill({'bill_type': 'Electricity', 'amount': '120.5', 'bill_date': '2024-1-5'}) == \
+        (1, 'electricity', 120.5, '2024-01-05')
+    assert bill_import.validate_bill({'amount': 10, 'bill_date': '2024-02-01', 'user_id': '7'}) == \
+        (7, 'other', 10.0, '2024-02-01')
+
+
+@pytest.mark.parametrize('row, error', [
+    ({'amount': 'nan', 'bill_date': '2024-01-01'}, "Invalid amount"),
+    ({'amount': 'inf', 'bill_date': '2024-01-01'}, "Invalid amount"),
+    ({'amount': '-Infinity', 'bill_date': '2024-01-01'}, "Invalid amount"),
+    ({'amount': 'ten', 'bill_date': '2024-01-01'}, "Invalid amount"),
+    ({'amount': '0', 'bill_date': '2024-01-01'}, "Amount must be a positive number"),
+    ({'bill_type': 5, 'amount': '10', 'bill_date': '2024-01-01'}, "Invalid bill_type"),
+    ({'bill_type': ['water'], 'amount': '10', 'bill_date': '2024-01-01'}, "Invalid bill_type"),
+    ({'amount': '10', 'bill_date': '01/02/2024'}, "Invalid date format. Use YYYY-MM-DD."),
+    ({'amount': '10', 'bill_date': '2024-01-01', 'user_id': 'x'}, "Invalid user_id"),
+    ([1, 2], "Invalid record"),
+])
+def test_validate_bill_rejects(row, error):
+    with pytest.raises(ValueError, match=error):
+        bill_import.validate_bill(row)
+
+
+def test_import_reports_bad_rows_without_losing_the_batch(users_db):
+    records = [
+        {'bill_type': 'water', 'amount': '10', 'bill_date': '2024-01-01'},
+        {'bill_type': 'water', 'amount': 'nan', 'bill_date': '2024-01-02'},
+        {'bill_type': 5, 'amount': '10', 'bill_date': '2024-01-03'},
+        {'bill_type': 'water', 'amount': 'inf', 'bill_date': '2024-01-04'},
+        {'bill_type': 'water', 'amount': '20', 'bill_date': '2024-1-5'},
+    ]
+    result = bill_import.import_bills(records, batch_size=10)
+    assert (result['imported'], result['failed']) == (2, 3)
+    assert result['errors'] == [{'row': 2, 'error': "Invalid amount"},
+                                {'row': 3, 'error': "Invalid bill_type"},
+                                {'row': 4, 'error': "Invalid amount"}]
+    assert users_db.query('SELECT amount, bill_date FROM bills ORDER BY id') == [(10.0, '2024-01-01'), (20.0, '2024-01-05')]
+    assert users_db.query('SELECT month, total, bill_count FROM bill_monthly_totals') == [('2024-01', 30.0, 2)]
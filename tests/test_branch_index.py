@@ -0,0 +1,42 @@
+import threading
+import time
+
+import branch_index
+
+
+def test_concurrent_first_requests_share_one_load(tmp_path, monkeypatch):
+    path = tmp_path / 'branches.csv'
+    path.write_text("BANK,BRANCH,CITY,STATE,LATITUDE,LONGITUDE,LOCKER\n"
+                    "SBI,Main,Pune,Maharashtra,18.52,73.85,yes\n", encoding='utf-8')
+    monkeypatch.setattr(branch_index, 'BRANCH_DIRECTORY_PATH', str(path))
+    monkeypatch.setattr(branch_index, '_index', None)
+    monkeypatch.setattr(branch_index, '_loaded', False)
+
+    load = branch_index.BranchIndex.load
+    loads = []
+
+    def slow_load(*args, **kwargs):
+        loads.append(1)
+        time.sleep(0.05)
+        return load(*args, **kwargs)
+
+    monkeypatch.setattr(branch_index.BranchIndex, 'load', slow_load)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(branch_index.get_index())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(loads) == 1
+    assert len(results) == 8
+    assert all(index is results[0] and len(index) == 1 for index in results)
+
+
+def test_missing_directory_is_loaded_once_as_none(tmp_path, monkeypatch):
+    monkeypatch.setattr(branch_index, 'BRANCH_DIRECTORY_PATH', str(tmp_path / 'missing.csv'))
+    monkeypatch.setattr(branch_index, '_index', None)
+    monkeypatch.setattr(branch_index, '_loaded', False)
+
+    assert branch_index.get_index() is None
+    assert branch_index._loaded
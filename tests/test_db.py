@@ -0,0 +1,30 @@
+import db
+
+
+def test_normalize_bill_date():
+    assert db.normalize_bill_date('2024-01-05') == '2024-01-05'
+    assert db.normalize_bill_date('2024-1-5') == '2024-01-05'
+
+
+def test_insert_bills_pads_dates_into_month_keys(users_db):
+    users_db.transaction(lambda conn: db.insert_bills(conn, [(1, 'Water', 10.0, '2024-1-5'), (1, 'water', 5.0, '2024-01-31')]))
+    assert users_db.query('SELECT bill_date FROM bills ORDER BY id') == [('2024-01-05',), ('2024-01-31',)]
+    assert users_db.query('SELECT month, total, bill_count, max_amount FROM bill_monthly_totals') == \
+        [('2024-01', 15.0, 2, 10.0)]
+
+
+def test_bill_dates_migration_pads_stored_dates(users_db):
+    users_db.add_bill(1, 'water', 10.0, '2024-01-20')
+    # Rows written before insert_bill() padded dates
+    users_db.execute(db.INSERT_BILL, (1, 'water', 5.0, '2024-1-5', None))
+    users_db.execute(db.INSERT_BILL, (2, 'gas', 7.0, 'someday', None))
+    version = users_db.query_one(db.SELECT_BILL_VERSION, (1,))[0]
+    users_db.execute(f'PRAGMA user_version = {len(db.MIGRATIONS) - 1}')
+
+    db.migrate()
+
+    assert users_db.query_one('PRAGMA user_version')[0] == len(db.MIGRATIONS)
+    assert users_db.query('SELECT bill_date FROM bills ORDER BY id') == [('2024-01-20',), ('2024-01-05',), ('someday',)]
+    assert users_db.query("SELECT month, total FROM bill_monthly_totals WHERE user_id = 1") == [('2024-01', 15.0)]
+    # The user's cached dashboards are invalidated
+    assert users_db.query_one(db.SELECT_BILL_VERSION, (1,))[0] == version + 1
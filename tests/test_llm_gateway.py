@@ -0,0 +1,43 @@
+from langchain_core.messages import AIMessage
+
+import structured_output
+from llm_gateway import LLMGateway, MemoryCache, parses_as
+
+
+class FakeLLM:
+    def __init__(self, content):
+        self.content = content
+        self.calls = 0
+
+    def invoke(self, prompt):
+        self.calls += 1
+        return AIMessage(content=self.content)
+
+
+def _calls_for_two_requests(content, schema):
+    llm = FakeLLM(content)
+    gateway = LLMGateway(llm, MemoryCache())
+    for _ in range(2):
+        gateway.invoke('Check eligibility', cacheable=parses_as(schema))
+    return llm.calls
+
+
+def test_valid_completion_is_cached():
+    content = '```json\n{"status": "approved", "reason": "Documents complete"}\n```'
+    assert _calls_for_two_requests(content, structured_output.ELIGIBILITY) == 1
+
+
+def test_completion_failing_the_schema_is_not_cached():
+    content = '{"status": "maybe", "reason": "Unclear"}'
+    assert _calls_for_two_requests(content, structured_output.ELIGIBILITY) == 2
+
+
+def test_truncated_completion_is_not_cached():
+    content = '{"status": "approved", "reason": "Documents comp'
+    assert _calls_for_two_requests(content, structured_output.ELIGIBILITY) == 2
+
+
+def test_predicate_rejects_non_json():
+    cacheable = parses_as(structured_output.BILL_AMOUNT)
+    assert not cacheable('The amount is 450 rupees')
+    assert cacheable('{"amount": 450.0}')
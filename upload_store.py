@@ -0,0 +1,92 @@
+"""Content-addressed store for uploaded files.
+
+Files live under UPLOAD_STORE_DIR/<aa>/<bb>/<sha256>.<ext>, so a re-upload of the same
+bill is written to disk once. Text extracted from a file and the results derived from
+it (bill amount, document analysis) are cached in users.db by content hash, so a
+repeat upload costs one hash and one lookup instead of a parse and a Gemini call.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+
+import db
+import metrics
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_STORE_DIR = os.getenv('UPLOAD_STORE_DIR', 'uploads/store')
+CHUNK_SIZE = 1024 * 1024
+
+
+def _extension(filename):
+    return filename.rsplit('.', 1)[-1].lower() if '.' in filename else 'bin'
+
+
+def content_hash(file):
+    """SHA-256 of an uploaded file's stream; the stream is rewound afterwards."""
+    stream = file.stream
+    stream.seek(0)
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+def path_for(digest, filename):
+    return os.path.join(UPLOAD_STORE_DIR, digest[:2], digest[2:4], f"{digest}.{_extension(filename)}")
+
+
+def save(file):
+    """Store an upload by content and return (digest, path); identical files share one copy."""
+    digest = content_hash(file)
+    path = path_for(digest, file.filename)
+    if os.path.exists(path):
+        metrics.incr('upload_dedup_hits')
+        metrics.incr('upload_dedup_bytes_saved', os.path.getsize(path))
+        return digest, path
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    # Write to a temp file and rename so concurrent uploads of the same file never see a partial copy
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            file.stream.seek(0)
+            for chunk in iter(lambda: file.stream.read(CHUNK_SIZE), b''):
+                out.write(chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    file.stream.seek(0)
+    return digest, path
+
+
+def get_result(digest, kind):
+    row = db.query_one(db.SELECT_UPLOAD_RESULT, (digest, kind))
+    return json.loads(row[0]) if row else None
+
+
+def put_result(digest, kind, value):
+    db.execute(db.UPSERT_UPLOAD_RESULT, (digest, kind, json.dumps(value), time.time()))
+
+
+def cached_text(digest, extract):
+    """Extracted text for a file, running extract() only the first time its content is seen."""
+    text = get_result(digest, 'text')
+    if text is None:
+        text = extract()
+        put_result(digest, 'text', text)
+    return text
+
+
+def cached_llm_result(digest, kind):
+    """A stored result that stands in for a model call, counted as an avoided call."""
+    result = get_result(digest, kind)
+    if result is not None:
+        metrics.incr('upload_llm_calls_avoided')
+    return result
@@ -0,0 +1,192 @@
+"""District-keyed weather advisories, refreshed in the background.
+
+Every farmer in a district is served the same advisory from memory (backed by
+users.db). A scheduler thread finds advisories older than WEATHER_REFRESH_SECONDS for
+districts requested in the last WEATHER_ACTIVE_SECONDS and, on start, the most
+requested districts plus WEATHER_WARM_DISTRICTS ("District:State;District:State").
+It submits a refresh_weather job for each, so with several worker processes the job
+queue's dedup makes sure a district is regenerated once, not once per process.
+
+An advisory's forecast starts the day after it was generated, so it is only served
+until the next midnight (and never past WEATHER_MAX_AGE); from then on it is due.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+import db
+import jobs
+import metrics
+
+logger = logging.getLogger(__name__)
+
+WEATHER_REFRESH_SECONDS = int(os.getenv('WEATHER_REFRESH_SECONDS', 3 * 3600))
+WEATHER_MAX_AGE = int(os.getenv('WEATHER_MAX_AGE', 24 * 3600))
+WEATHER_ACTIVE_SECONDS = int(os.getenv('WEATHER_ACTIVE_SECONDS', 3 * 24 * 3600))
+WEATHER_WARM_TOP_N = int(os.getenv('WEATHER_WARM_TOP_N', 20))
+WEATHER_WARM_DISTRICTS = os.getenv('WEATHER_WARM_DISTRICTS', '')
+WEATHER_REFRESH_BATCH = int(os.getenv('WEATHER_REFRESH_BATCH', 50))
+SCHEDULER_TICK = 60
+
+_lock = threading.Lock()
+_memory = {}
+_pending_requests = Counter()
+_wakeup = threading.Event()
+_scheduler = None
+
+
+def district_key(district, state):
+    return f"{' '.join(district.split()).lower()}|{' '.join(state.split()).lower()}"
+
+
+def get(district, state):
+    """(advisory, generated_at) for the district, or None if it was never generated."""
+    key = district_key(district, state)
+    entry = _memory.get(key)
+    if entry is not None and entry[1] >= _stale_before(time.time()):
+        return entry
+    # Another process's scheduler may have refreshed it since we cached it
+    row = db.query_one(db.SELECT_WEATHER_ADVISORY, (key,))
+    if row is None or row[0] is None:
+        return entry
+    entry = (json.loads(row[0]), row[1])
+    _memory[key] = entry
+    return entry
+
+
+def store(district, state, advisory):
+    key = district_key(district, state)
+    generated_at = time.time()
+    db.execute(db.UPSERT_WEATHER_ADVISORY, (key, district, state, json.dumps(advisory), generated_at))
+    _memory[key] = (advisory, generated_at)
+    return generated_at
+
+
+def record_request(district, state):
+    """Count a request; counts are written by the scheduler so reads stay in memory."""
+    with _lock:
+        _pending_requests[(district_key(district, state), district, state)] += 1
+
+
+def refresh_soon():
+    _wakeup.set()
+
+
+def expires_at(generated_at):
+    """When an advisory generated at generated_at stops being servable."""
+    day = datetime.fromtimestamp(generated_at).replace(hour=0, minute=0, second=0, microsecond=0)
+    return min((day + timedelta(days=1)).timestamp(), generated_at + WEATHER_MAX_AGE)
+
+
+def _stale_before(now):
+    """Advisories generated before this are due for a refresh."""
+    midnight = datetime.fromtimestamp(now).replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+    return max(now - WEATHER_REFRESH_SECONDS, midnight, now - WEATHER_MAX_AGE)
+
+
+def servable(district, state):
+    """The cached (advisory, generated_at) until expires_at(), else None.
+
+    An entry past WEATHER_REFRESH_SECONDS is still served but wakes the scheduler.
+    """
+    entry = get(district, state)
+    if entry is None:
+        return None
+    now = time.time()
+    if now >= expires_at(entry[1]):
+        return None
+    age = now - entry[1]
+    if age >= WEATHER_REFRESH_SECONDS:
+        refresh_soon()
+    return entry
+
+
+def with_meta(advisory, generated_at, district, state):
+    now = time.time()
+    age = max(0, int(now - generated_at))
+    refresh_at = min(generated_at + WEATHER_REFRESH_SECONDS, expires_at(generated_at))
+    return dict(advisory, advisory_meta={
+        "district": district,
+        "state": state,
+        "generated_at": datetime.fromtimestamp(generated_at).isoformat(timespec='seconds'),
+        "age_seconds": age,
+        "stale": now >= refresh_at,
+        "next_refresh_in": max(0, int(refresh_at - now))
+    })
+
+
+def _flush_requests():
+    with _lock:
+        pending = list(_pending_requests.items())
+        _pending_requests.clear()
+    if pending:
+        now = time.time()
+        rows = [(key, district, state, count, now) for (key, district, state), count in pending]
+        db.transaction(lambda conn: conn.executemany(db.UPSERT_WEATHER_REQUESTS, rows))
+
+
+def _warm_list():
+    districts = []
+    for item in WEATHER_WARM_DISTRICTS.split(';'):
+        if ':' in item:
+            district, state = item.split(':', 1)
+            districts.append((district.strip().title(), state.strip().title()))
+    districts += [(d, s) for d, s in db.query(db.SELECT_POPULAR_DISTRICTS, (WEATHER_WARM_TOP_N,))]
+    return districts
+
+
+def _refresh_job(refresh, payload):
+    district, state = payload['district'], payload['state']
+    entry = get(district, state)
+    if entry is not None and entry[1] >= _stale_before(time.time()):
+        # Refreshed by an earlier job since this one was queued
+        return {"district": district, "state": state, "skipped": True}, 200
+    result, status = refresh(district, state)
+    if status == 200:
+        metrics.incr('weather_refreshes')
+    else:
+        metrics.incr('weather_refresh_failures')
+        logger.warning(f"Weather refresh for {district}, {state} returned {status}: {result.get('error')}")
+    return result, status
+
+
+def _refresh(districts):
+    for district, state in districts:
+        jobs.submit('refresh_weather', {"district": district, "state": state})
+
+
+def _run():
+    # Cold start: make sure the busiest districts are served from cache straight away
+    try:
+        stale_before = _stale_before(time.time())
+        _refresh([(d, s) for d, s in dict.fromkeys(_warm_list()) if (get(d, s) or (None, 0))[1] < stale_before])
+    except Exception as e:
+        logger.error(f"Weather cold-start fill failed: {e}")
+
+    while True:
+        _wakeup.wait(SCHEDULER_TICK)
+        _wakeup.clear()
+        try:
+            _flush_requests()
+            now = time.time()
+            due = db.query(db.SELECT_DUE_DISTRICTS, (now - WEATHER_ACTIVE_SECONDS, _stale_before(now),
+                                                     WEATHER_REFRESH_BATCH))
+            _refresh(due)
+        except Exception as e:
+            logger.error(f"Weather refresh cycle failed: {e}")
+
+
+def start(refresh):
+    """Register the refresh_weather job and start the scheduler once per process.
+
+    refresh(district, state) -> (payload, status) regenerates one advisory.
+    """
+    global _scheduler
+    jobs.register('refresh_weather', lambda payload: _refresh_job(refresh, payload))
+    if _scheduler is None:
+        _scheduler = threading.Thread(target=_run, name='weather-refresh', daemon=True)
+        _scheduler.start()